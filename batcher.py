@@ -0,0 +1,86 @@
+import time
+import threading
+
+
+class EmbeddingBatcher:
+    """
+    Micro-batching scheduler for face embeddings.
+
+    Face crops are submitted with a tag (e.g. their box) and collected
+    across the current frame, and optionally the next few frames, into a
+    single embeddings() call. A batch is flushed when it reaches
+    `max_batch_size` crops, spans `max_frames` frames, or its oldest crop
+    has waited `max_delay` seconds, whichever comes first.
+
+    A batcher may be shared by several threads (one per camera); the
+    embedder is then still called by one thread at a time.
+    """
+
+    def __init__(self, embedder, max_batch_size=32, max_frames=1, max_delay=0.05):
+        self.embedder = embedder
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_frames = max(1, max_frames)
+        self.max_delay = max_delay
+
+        self.pending = []          # [(crop, tag)]
+        self.pending_frames = 0
+        self.oldest = None         # submit time of the oldest pending crop
+
+        # Counters for the end-of-session report
+        self.calls = 0
+        self.crops = 0
+
+        self._lock = threading.Lock()
+        self._embed_lock = threading.Lock()
+
+    def submit(self, crop, tag):
+        """Queue one RGB face crop; its embedding is returned with `tag`"""
+        with self._lock:
+            if not self.pending:
+                self.oldest = time.time()
+            self.pending.append((crop, tag))
+
+    def end_frame(self):
+        """Mark the end of a frame's submissions"""
+        with self._lock:
+            if self.pending:
+                self.pending_frames += 1
+
+    def due(self, now=None):
+        """True if the pending crops should be embedded now"""
+        if not self.pending:
+            return False
+        now = time.time() if now is None else now
+        return (len(self.pending) >= self.max_batch_size
+                or self.pending_frames >= self.max_frames
+                or now - self.oldest >= self.max_delay)
+
+    def poll(self, now=None):
+        """Flush if a batch is due, returning [(tag, embedding)], else []"""
+        return self.flush() if self.due(now) else []
+
+    def flush(self):
+        """
+        Embed all pending crops, at most `max_batch_size` per call, and
+        return [(tag, embedding)] in submission order.
+        """
+        with self._lock:
+            pending, self.pending = self.pending, []
+            self.pending_frames = 0
+            self.oldest = None
+
+        results = []
+        for start in range(0, len(pending), self.max_batch_size):
+            chunk = pending[start:start + self.max_batch_size]
+            with self._embed_lock:
+                embeddings = self.embedder.embeddings([crop for crop, _ in chunk])
+                self.calls += 1
+                self.crops += len(chunk)
+            if embeddings is None or len(embeddings) != len(chunk):
+                raise ValueError(f"Embedder returned no result for a batch of {len(chunk)} faces")
+            results.extend((tag, emb) for (_, tag), emb in zip(chunk, embeddings))
+        return results
+
+    @property
+    def mean_batch_size(self):
+        return self.crops / self.calls if self.calls else 0.0
@@ -0,0 +1,319 @@
+import os
+import sys
+import glob
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import subprocess
+import cv2
+import numpy as np
+from embedders import FACENET_INPUT_SIZE, create_embedder
+from gallery import l2_normalize, load_gallery, save_gallery
+from matcher import GalleryMatcher
+from ivf import IVF_MIN_ROWS, IVFIndex, index_path
+from ledger import AttendanceLedger, CSV_HEADER, read_attendance
+from sources import IMAGE_EXTENSIONS, open_source
+from train_model import collect_samples, embed_samples
+from recognize import FaceRecognizer, RecognitionSession, match_labels
+
+# Metrics where a larger value is better; every other timed metric is a duration
+HIGHER_IS_BETTER = ("images_per_sec", "queries_per_sec", "rows_per_sec", "frames_per_sec")
+
+
+def synthetic_label_map(students):
+    return {f"{i:06d}_Student{i}": i for i in range(students)}
+
+
+def synthetic_embeddings(students, per_student=2, dim=512, spread=0.35, seed=0, block=65536):
+    """
+    Gallery-like embeddings: one random unit centre per student and
+    `per_student` noisy rows around it, all L2-normalized.
+    """
+    rng = np.random.default_rng(seed)
+    labels = np.repeat(np.arange(students, dtype=np.int32), per_student)
+    embeddings = np.empty((len(labels), dim), dtype=np.float32)
+    for start in range(0, students, block):
+        centres = l2_normalize(rng.standard_normal((min(block, students - start), dim)))
+        rows = np.repeat(centres, per_student, axis=0)
+        rows += spread / np.sqrt(dim) * rng.standard_normal(rows.shape).astype(np.float32)
+        embeddings[start * per_student:start * per_student + len(rows)] = l2_normalize(rows)
+    return embeddings, labels
+
+
+def synthetic_student_images(root, students, per_student=5, size=FACENET_INPUT_SIZE, seed=0):
+    """
+    Write '<enroll>_<name>/<n>.jpg' folders of face-sized images: a smooth
+    random pattern per student with a little per-image noise and shift.
+    """
+    rng = np.random.default_rng(seed)
+    for i in range(students):
+        folder = os.path.join(root, f"{i:06d}_Student{i}")
+        os.makedirs(folder, exist_ok=True)
+        base = cv2.resize(rng.integers(0, 256, (8, 8, 3), dtype=np.uint8), (size, size),
+                          interpolation=cv2.INTER_CUBIC).astype(np.int16)
+        for n in range(per_student):
+            img = np.roll(base, rng.integers(-4, 5, 2), axis=(0, 1)) + rng.integers(-12, 13, base.shape)
+            cv2.imwrite(os.path.join(folder, f"{n}.jpg"), np.clip(img, 0, 255).astype(np.uint8))
+
+
+def synthetic_attendance(root, days, per_day, students, seed=0):
+    """Write `days` attendance CSVs with `per_day` rows each"""
+    rng = np.random.default_rng(seed)
+    os.makedirs(root, exist_ok=True)
+    for day in range(days):
+        date = f"2025-{1 + day // 28 % 12:02d}-{1 + day % 28:02d}"
+        with open(os.path.join(root, f"attendance_{date}_{day // 336}.csv"), "w", newline="") as f:
+            f.write(",".join(CSV_HEADER) + "\n")
+            for i in rng.choice(students, min(per_day, students), replace=False):
+                f.write(f"{date},09:{rng.integers(60):02d}:{rng.integers(60):02d},{i:06d},Student{i}\n")
+
+
+def timed(func, *args, repeat=1, **kwargs):
+    """Best wall time of `repeat` calls, and the last result"""
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def bench_extraction(workdir, students, per_student, embedder, batch_size=32, workers=4):
+    """train_model's extraction: decode and embed every registered image"""
+    root = os.path.join(workdir, "student_images")
+    synthetic_student_images(root, students, per_student)
+    _, samples = collect_samples(root)
+    seconds, results = timed(embed_samples, create_embedder(embedder), samples,
+                             batch_size=batch_size, workers=workers)
+    shutil.rmtree(root)
+    return {"benchmark": "extraction", "students": students, "images": len(results),
+            "seconds": seconds, "images_per_sec": len(results) / max(seconds, 1e-9)}
+
+
+def bench_gallery(workdir, students, per_student, queries=256, batch=8, repeat=3, seed=0):
+    """Gallery loading and batched matching throughput (exact, and IVF when large enough)"""
+    embeddings, labels = synthetic_embeddings(students, per_student, seed=seed)
+    path = os.path.join(workdir, f"gallery_{students}.bin")
+    save_gallery(path, embeddings, labels, synthetic_label_map(students), metadata={"embedder": "stub"})
+
+    load_mmap, gallery = timed(load_gallery, path, repeat=repeat)
+    load_copy, _ = timed(load_gallery, path, mmap=False, repeat=repeat)
+    results = [{"benchmark": "gallery_load", "students": students, "rows": len(gallery),
+                "mmap_seconds": load_mmap, "copy_seconds": load_copy,
+                "rows_per_sec": len(gallery) / max(load_copy, 1e-9)}]
+
+    rng = np.random.default_rng(seed + 1)
+    q = embeddings[rng.choice(len(embeddings), queries)]
+    q = l2_normalize(q + 0.1 / np.sqrt(q.shape[1]) * rng.standard_normal(q.shape).astype(np.float32))
+    label_names = gallery.label_names
+
+    def match_all(matcher):
+        return [match_labels(matcher, label_names, q[i:i + batch]) for i in range(0, len(q), batch)]
+
+    matchers = {"exact": GalleryMatcher.from_gallery(gallery, k=3)}
+    if len(gallery) >= IVF_MIN_ROWS:
+        build_seconds, index = timed(IVFIndex.build, gallery.embeddings, gallery.labels)
+        index.save(index_path(path))
+        results.append({"benchmark": "ivf_build", "students": students, "rows": len(gallery),
+                        "seconds": build_seconds, "n_lists": index.n_lists})
+        matchers["ivf"] = GalleryMatcher.from_gallery(gallery, k=3, index=index)
+
+    for name, matcher in matchers.items():
+        seconds, _ = timed(match_all, matcher, repeat=repeat)
+        results.append({"benchmark": "match", "search": name, "students": students, "rows": len(gallery),
+                        "batch": batch, "queries": len(q), "ms_per_query": seconds * 1000 / len(q),
+                        "queries_per_sec": len(q) / max(seconds, 1e-9)})
+    for p in (path, index_path(path)):
+        if os.path.exists(p):
+            os.remove(p)
+    return results
+
+
+def bench_attendance(workdir, days, per_day, students, repeat=3):
+    """Loading every attendance CSV the way records.py does"""
+    root = os.path.join(workdir, "attendance")
+    synthetic_attendance(root, days, per_day, students)
+    files = sorted(glob.glob(os.path.join(root, "attendance_*.csv")))
+    label_map = {int(v): k for k, v in synthetic_label_map(students).items()}
+    seconds, rows = timed(lambda: [row for f in files for row in read_attendance(f, label_map)], repeat=repeat)
+    shutil.rmtree(root)
+    return {"benchmark": "attendance_load", "files": len(files), "rows": len(rows), "seconds": seconds,
+            "rows_per_sec": len(rows) / max(seconds, 1e-9)}
+
+
+def tiled_frames(root, count=60, faces=3, seed=0):
+    """Classroom-like frames: registered face crops pasted side by side on a gray background"""
+    paths = sorted(p for p in glob.glob(os.path.join(root, "*", "*")) if p.lower().endswith(IMAGE_EXTENSIONS))
+    crops = [img for img in (cv2.imread(p) for p in paths[::max(1, len(paths) // 200)]) if img is not None]
+    if not crops:
+        return []
+    rng = np.random.default_rng(seed)
+    chosen = [cv2.resize(crops[i], (160, 160)) for i in rng.choice(len(crops), min(faces, len(crops)), replace=False)]
+    frames = []
+    for n in range(count):
+        frame = np.full((480, 640, 3), 96, dtype=np.uint8)
+        for i, crop in enumerate(chosen):
+            x, y = 40 + i * 200 + n % 5, 150 + n % 3
+            frame[y:y + 160, x:x + 160] = crop
+        frames.append(frame)
+    return frames
+
+
+def bench_frames(workdir, frames, students, per_student, embedder, detector="haar", label=""):
+    """End-to-end process_frame() over frames against a synthetic gallery"""
+    embeddings, labels = synthetic_embeddings(students, per_student)
+    path = os.path.join(workdir, "frames_gallery.bin")
+    save_gallery(path, embeddings, labels, synthetic_label_map(students), metadata={"embedder": embedder})
+    recognizer = FaceRecognizer(path, embedder)
+    with AttendanceLedger(os.path.join(workdir, "frames_attendance.csv")) as ledger:
+        session = RecognitionSession(recognizer, ledger, detector=detector)
+        session.process_frame(frames[0], 0.0)  # Warm-up
+        start = time.perf_counter()
+        for n, frame in enumerate(frames[1:], 1):
+            session.process_frame(frame, n / 25.0)
+        session.finish(len(frames) / 25.0)
+        seconds = time.perf_counter() - start
+    os.remove(path)
+    return {"benchmark": "frames", "frames_from": label, "students": students, "frames": len(frames) - 1,
+            "embedded": session.batcher.crops, "ms_per_frame": seconds * 1000 / max(1, len(frames) - 1),
+            "frames_per_sec": (len(frames) - 1) / max(seconds, 1e-9)}
+
+
+def environment():
+    """What the numbers were measured on"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {"time": time.strftime("%Y-%m-%d %H:%M:%S"), "commit": commit, "python": platform.python_version(),
+            "platform": platform.platform(), "cpus": os.cpu_count(), "numpy": np.__version__,
+            "opencv": cv2.__version__}
+
+
+def run(sizes=(100, 1000, 10000), per_student=2, image_students=100, images_per_student=5,
+        attendance_days=60, attendance_rows=200, frames_path=None, student_images="student_images",
+        embedder="stub", workdir=None, seed=0):
+    """Run every benchmark; returns {"environment": ..., "results": [...]}"""
+    own_dir = workdir is None
+    workdir = workdir or tempfile.mkdtemp(prefix="attendance_bench_")
+    os.makedirs(workdir, exist_ok=True)
+    results = []
+    try:
+        print(f"🏭 Extraction: {image_students} students x {images_per_student} images ({embedder})")
+        results.append(bench_extraction(workdir, image_students, images_per_student, embedder))
+
+        for students in sizes:
+            print(f"🗄️ Gallery: {students} students x {per_student} embeddings")
+            results.extend(bench_gallery(workdir, students, per_student, seed=seed))
+
+        print(f"📄 Attendance: {attendance_days} CSVs x {attendance_rows} rows")
+        results.append(bench_attendance(workdir, attendance_days, attendance_rows, max(sizes)))
+
+        if frames_path:
+            source = open_source(frames_path)
+            frames = []
+            while len(frames) < 300:
+                ret, frame, _ = source.read()
+                if not ret:
+                    break
+                frames.append(frame)
+            source.release()
+            label = frames_path
+        else:
+            frames, label = tiled_frames(student_images), f"tiled {student_images}"
+        if len(frames) > 1:
+            print(f"🎞️ Frames: {len(frames)} from {label}")
+            results.append(bench_frames(workdir, frames, min(sizes), per_student, embedder, label=label))
+        else:
+            print("⚠️ Skipping the frame benchmark: no --frames and no registered images to tile")
+    finally:
+        if own_dir:
+            shutil.rmtree(workdir, ignore_errors=True)
+    return {"environment": environment(), "results": results}
+
+
+def result_key(result):
+    """Identity of a result across runs: its benchmark and size parameters"""
+    return tuple((k, result[k]) for k in ("benchmark", "search", "students", "frames_from") if k in result)
+
+
+def compare(baseline, current, tolerance=0.2):
+    """
+    Regressions of `current` against `baseline` results: throughput lower,
+    or time per item higher, by more than `tolerance`.
+    """
+    before = {result_key(r): r for r in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        old = before.get(result_key(result))
+        if old is None:
+            continue
+        for metric in HIGHER_IS_BETTER + ("ms_per_query", "ms_per_frame"):
+            if metric in result and old.get(metric):
+                change = result[metric] / old[metric] - 1
+                worse = -change if metric in HIGHER_IS_BETTER else change
+                if worse > tolerance:
+                    regressions.append({"key": dict(result_key(result)), "metric": metric,
+                                        "baseline": old[metric], "current": result[metric], "change": change})
+    return regressions
+
+
+def format_result(r):
+    name = r["benchmark"] + (f"[{r['search']}]" if "search" in r else "")
+    size = f"{r['students']} students" if "students" in r else f"{r['files']} files"
+    rates = [f"{r[m]:,.1f} {m.replace('_per_sec', '')}/s" for m in HIGHER_IS_BETTER if m in r]
+    latency = [f"{r[m]:.3f} {m.replace('_per_', '/')}" for m in ("ms_per_query", "ms_per_frame") if m in r]
+    return f"📏 {name:<18} {size:<18} " + "  ".join(rates + latency or [f"{r['seconds']:.2f}s"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reproducible benchmarks on synthetic data (no model or network needed)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000],
+                        help="Gallery sizes in students (e.g. 100 1000 10000 100000)")
+    parser.add_argument("--per-student", type=int, default=2, help="Embeddings per student in the galleries")
+    parser.add_argument("--image-students", type=int, default=100,
+                        help="Students in the synthetic image folders used to time extraction")
+    parser.add_argument("--images-per-student", type=int, default=5)
+    parser.add_argument("--attendance-days", type=int, default=60, help="Synthetic attendance CSVs to load")
+    parser.add_argument("--attendance-rows", type=int, default=200, help="Rows per attendance CSV")
+    parser.add_argument("--frames", default=None,
+                        help="Video file or folder of recorded frames for the end-to-end benchmark "
+                             "(default: registered images tiled into frames)")
+    parser.add_argument("--student-images", default="student_images", help="Folder of registered face images")
+    parser.add_argument("--embedder", default="stub",
+                        help="Embedding backend; 'stub' needs no model files, TensorFlow or network")
+    parser.add_argument("--workdir", default=None, help="Keep the synthetic data here instead of a temp folder")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", default=None, help="Write the results to this JSON file")
+    parser.add_argument("--compare", default=None, help="Baseline JSON from an earlier run to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Allowed slowdown against the baseline before it counts as a regression")
+    args = parser.parse_args()
+
+    report = run(sizes=args.sizes, per_student=args.per_student, image_students=args.image_students,
+                 images_per_student=args.images_per_student, attendance_days=args.attendance_days,
+                 attendance_rows=args.attendance_rows, frames_path=args.frames,
+                 student_images=args.student_images, embedder=args.embedder, workdir=args.workdir, seed=args.seed)
+    print()
+    for r in report["results"]:
+        print(format_result(r))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Results written to '{args.json}'")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, report, args.tolerance)
+        for r in regressions:
+            print(f"❌ Regression in {r['key']}: {r['metric']} {r['baseline']:.3f} -> {r['current']:.3f} "
+                  f"({r['change']:+.0%})")
+        if regressions:
+            sys.exit(1)
+        print(f"✅ No regressions beyond {args.tolerance:.0%} against '{args.compare}'")
@@ -0,0 +1,131 @@
+import os
+import glob
+import time
+import json
+import argparse
+import cv2
+import numpy as np
+from detectors import DETECTOR_BACKENDS, AdaptiveDetector, create_detector
+from tracker import iou_matrix
+from sources import IMAGE_EXTENSIONS, open_source
+
+
+def load_student_images(root="student_images", limit=None):
+    """Registered face crops; each one is known to contain exactly one face"""
+    paths = sorted(p for p in glob.glob(os.path.join(root, "*", "*"))
+                   if p.lower().endswith(IMAGE_EXTENSIONS))
+    images = []
+    for path in paths[:limit]:
+        img = cv2.imread(path)
+        if img is not None:
+            images.append(img)
+    return images
+
+
+def load_recorded_frames(path, limit=None):
+    """Frames from a video file or a directory of images"""
+    source = open_source(path)
+    frames = []
+    while not limit or len(frames) < limit:
+        ret, frame, _ = source.read()
+        if not ret:
+            break
+        frames.append(frame)
+    source.release()
+    return frames
+
+
+def time_detector(detector, images):
+    """Run the detector over all images; returns (boxes per image, ms per image)"""
+    detector.detect(images[0])  # Warm-up (lazy allocations, DNN graph setup)
+    start = time.perf_counter()
+    boxes = [detector.detect(img) for img in images]
+    elapsed = time.perf_counter() - start
+    return boxes, elapsed / len(images) * 1000
+
+
+def reference_recall(boxes, reference_boxes, iou_threshold=0.3):
+    """Fraction of reference boxes matched by a box with IoU >= iou_threshold"""
+    total = matched = 0
+    for found, expected in zip(boxes, reference_boxes):
+        total += len(expected)
+        if found and expected:
+            matched += int((iou_matrix(expected, found).max(axis=1) >= iou_threshold).sum())
+    return matched / total if total else float("nan")
+
+
+def build(backend, scale):
+    detector = create_detector(backend)
+    return AdaptiveDetector(detector, scale=scale, full_scan_interval=1) if scale != 1.0 else detector
+
+
+def benchmark(backends, scale=1.0, student_root="student_images", frames_path=None,
+              reference="dnn", limit=None):
+    """
+    Measure ms/frame and recall for each backend.
+
+    On the registered student images, recall is the share of images in
+    which at least one face was found. On recorded frames (no ground
+    truth), recall is measured against the boxes of the `reference`
+    backend.
+    """
+    results = []
+    detectors = {}
+    for backend in backends:
+        try:
+            detectors[backend] = build(backend, scale)
+        except Exception as e:
+            print(f"⚠️ Skipping '{backend}': {e}")
+
+    images = load_student_images(student_root, limit)
+    if images:
+        print(f"🖼️ {len(images)} registered images from '{student_root}'")
+        for backend, detector in detectors.items():
+            boxes, ms = time_detector(detector, images)
+            recall = float(np.mean([len(b) > 0 for b in boxes]))
+            results.append({"dataset": "student_images", "backend": backend, "scale": scale,
+                            "images": len(images), "ms_per_frame": ms, "recall": recall})
+
+    frames = load_recorded_frames(frames_path, limit) if frames_path else []
+    if frames:
+        print(f"🎞️ {len(frames)} recorded frames from '{frames_path}'")
+        found = {}
+        for backend, detector in detectors.items():
+            found[backend], ms = time_detector(detector, frames)
+            results.append({"dataset": "frames", "backend": backend, "scale": scale,
+                            "images": len(frames), "ms_per_frame": ms,
+                            "faces_per_frame": float(np.mean([len(b) for b in found[backend]]))})
+        if reference in found:
+            for result in results:
+                if result["dataset"] == "frames":
+                    result["recall_vs_" + reference] = reference_recall(found[result["backend"]], found[reference])
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare face detector backends on this machine")
+    parser.add_argument("--backends", nargs="+", choices=DETECTOR_BACKENDS, default=list(DETECTOR_BACKENDS))
+    parser.add_argument("--scale", type=float, default=1.0, help="Downscale factor applied before detection")
+    parser.add_argument("--student-images", default="student_images", help="Folder of registered face images")
+    parser.add_argument("--frames", default=None, help="Video file or folder of recorded classroom frames")
+    parser.add_argument("--reference", choices=DETECTOR_BACKENDS, default="dnn",
+                        help="Backend whose boxes count as ground truth on recorded frames")
+    parser.add_argument("--limit", type=int, default=None, help="Use at most this many images per dataset")
+    parser.add_argument("--json", default=None, help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = benchmark(args.backends, scale=args.scale, student_root=args.student_images,
+                        frames_path=args.frames, reference=args.reference, limit=args.limit)
+
+    for r in results:
+        extra = f"recall {r['recall']:.1%}" if "recall" in r else f"{r['faces_per_frame']:.2f} faces/frame"
+        ref_key = "recall_vs_" + args.reference
+        if ref_key in r:
+            extra += f", recall vs {args.reference} {r[ref_key]:.1%}"
+        print(f"📏 {r['dataset']:<15} {r['backend']:<5} {r['ms_per_frame']:7.2f} ms/frame  {extra}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"✅ Results written to '{args.json}'")
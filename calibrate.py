@@ -0,0 +1,271 @@
+import sys
+import json
+import time
+import argparse
+from collections import Counter
+import numpy as np
+from gallery import GALLERY_FILE, open_gallery, update_metadata
+
+# Pair histograms over cosine similarity, [-1, 1]; binning similarities
+# skips a square root per pair, and distance = sqrt(2 - 2 * similarity)
+HIST_BINS = 400
+
+# Thresholds that would accept fewer of the students' own photos than this
+# are not stored (usually duplicated or mislabelled student folders)
+MIN_TAR = 0.5
+
+
+def _distance(similarity):
+    return np.sqrt(np.clip(2.0 - 2.0 * similarity, 0.0, None))
+
+
+def _bin(sims):
+    return np.minimum(((sims + 1.0) * (HIST_BINS / 2)).astype(np.int32), HIST_BINS - 1)
+
+
+def scan_distances(embeddings, labels, rows=None, max_block_mb=256, impostor_samples=4096):
+    """
+    One blockwise pass over the gallery: for each query row (all rows, or
+    the given subset), the distance to the nearest *other* row of the same
+    student (genuine; inf for a student's only row) and to the nearest row
+    of another student (impostor) with that row's index (-1 if none),
+    plus similarity histograms of every
+    genuine pair and of impostor pairs (each query against about
+    `impostor_samples` evenly spaced rows; binning all N x N pairs would
+    cost more than the search itself).
+
+    Only a block of queries x a block of gallery rows of similarities is
+    held at a time (`max_block_mb`), never the full N x N matrix.
+    """
+    labels = np.asarray(labels, dtype=np.int32)
+    rows = np.arange(len(labels)) if rows is None else np.asarray(rows)
+    block_rows = 1024
+    block_cols = max(block_rows, max_block_mb * 1024 * 1024 // (block_rows * 4 * 4))
+
+    genuine = np.full(len(rows), np.inf, dtype=np.float32)
+    impostor = np.full(len(rows), np.inf, dtype=np.float32)
+    nearest_other = np.full(len(rows), -1, dtype=np.int64)
+    genuine_hist = np.zeros(HIST_BINS, dtype=np.int64)
+    impostor_hist = np.zeros(HIST_BINS, dtype=np.int64)
+    step = max(1, len(labels) // impostor_samples)
+
+    for qs in range(0, len(rows), block_rows):
+        q_idx = rows[qs:qs + block_rows]
+        queries = np.asarray(embeddings[q_idx], dtype=np.float32)
+        q_labels = labels[q_idx]
+        best_same = np.full(len(q_idx), -np.inf, dtype=np.float32)
+        best_other = np.full(len(q_idx), -np.inf, dtype=np.float32)
+        best_other_idx = np.full(len(q_idx), -1, dtype=np.int64)
+
+        for cs in range(0, len(labels), block_cols):
+            block = np.asarray(embeddings[cs:cs + block_cols], dtype=np.float32)
+            sims = queries @ block.T
+            same = q_labels[:, None] == labels[cs:cs + len(block)][None, :]
+
+            # A row is not its own match: drop the (query, itself) pairs
+            own = np.flatnonzero((q_idx >= cs) & (q_idx < cs + len(block)))
+            own_cols = q_idx[own] - cs
+            same[own, own_cols] = False
+            sims[own, own_cols] = -np.inf
+
+            # Genuine pairs are few: handle them sparsely, then mask them
+            # out so a plain row max finds the nearest impostor
+            r, c = np.nonzero(same)
+            genuine_sims = sims[r, c]
+            np.maximum.at(best_same, r, genuine_sims)
+            genuine_hist += np.bincount(_bin(genuine_sims), minlength=HIST_BINS)
+            sims[r, c] = -np.inf
+            cols = sims.argmax(axis=1)
+            block_best = sims[np.arange(len(sims)), cols]
+            better = block_best > best_other
+            best_other = np.where(better, block_best, best_other)
+            best_other_idx = np.where(better, cols + cs, best_other_idx)
+
+            sampled = sims[:, (-cs) % step::step]
+            sampled = sampled[np.isfinite(sampled)]
+            impostor_hist += np.bincount(_bin(sampled), minlength=HIST_BINS)
+
+        genuine[qs:qs + len(q_idx)] = np.where(np.isfinite(best_same), _distance(best_same), np.inf)
+        impostor[qs:qs + len(q_idx)] = np.where(np.isfinite(best_other), _distance(best_other), np.inf)
+        nearest_other[qs:qs + len(q_idx)] = best_other_idx
+    return genuine, impostor, nearest_other, genuine_hist, impostor_hist
+
+
+def histogram_percentiles(hist, qs=(1, 5, 50, 95, 99)):
+    """Approximate pair distance percentiles from a similarity histogram"""
+    total = hist.sum()
+    if total == 0:
+        return {}
+    # Distances grow as similarity falls, so walk the bins from the top
+    cdf = np.cumsum(hist[::-1]) / total
+    centres = (np.arange(HIST_BINS)[::-1] + 0.5) * 2 / HIST_BINS - 1.0
+    return {f"p{q}": float(_distance(centres[min(np.searchsorted(cdf, q / 100), HIST_BINS - 1)])) for q in qs}
+
+
+def global_threshold(genuine, impostor, far=0.01, criterion="far"):
+    """
+    Threshold on the distance to the nearest match: with 'far', the
+    distance below which only `far` of the nearest-impostor distances fall
+    (a face of someone else is rarely accepted); with 'eer', the point
+    where the false accept and false reject rates are equal.
+    """
+    genuine = genuine[np.isfinite(genuine)]
+    impostor = impostor[np.isfinite(impostor)]
+    if len(impostor) == 0:
+        raise ValueError("Calibration needs at least two registered students (no impostor distances)")
+    if criterion == "eer" and len(genuine) == 0:
+        raise ValueError("The 'eer' criterion needs students with at least two photos (no genuine distances)")
+    if criterion == "far":
+        return float(np.quantile(impostor, far))
+    candidates = np.linspace(0.0, 2.0, 2001)
+    far_curve = np.searchsorted(np.sort(impostor), candidates) / len(impostor)
+    frr_curve = 1.0 - np.searchsorted(np.sort(genuine), candidates) / len(genuine)
+    return float(candidates[np.argmin(np.abs(far_curve - frr_curve))])
+
+
+def per_student_thresholds(labels, genuine, impostor, threshold, max_adjust=0.25):
+    """
+    {label_id -> threshold}: the global threshold, loosened up to the
+    student's farthest own photo, but never beyond the nearest photo of
+    anyone else, so students with a look-alike get a stricter one. Kept
+    within `max_adjust` of the global threshold.
+    """
+    ids, inverse = np.unique(labels, return_inverse=True)
+    farthest_own = np.full(len(ids), -np.inf)
+    nearest_other = np.full(len(ids), np.inf)
+    np.maximum.at(farthest_own, inverse, np.where(np.isfinite(genuine), genuine, -np.inf))
+    np.minimum.at(nearest_other, inverse, impostor)
+
+    limits = np.clip(np.minimum(nearest_other, np.maximum(threshold, farthest_own)),
+                     threshold * (1 - max_adjust), threshold * (1 + max_adjust))
+    return {int(i): round(float(t), 4) for i, t in zip(ids, limits)}
+
+
+def confusable_pairs(query_labels, labels, genuine, impostor, nearest_other, label_names=None, top=10):
+    """
+    Pairs of students with photos closer to the other student than to any
+    of their own, most such photos first: [{"students": [a, b], "rows": n}].
+    `query_labels` belong to the scanned rows, `nearest_other` indexes `labels`.
+    """
+    label_names = label_names or {}
+    confused = np.flatnonzero(np.isfinite(genuine) & (impostor < genuine) & (nearest_other >= 0))
+    counts = Counter(tuple(sorted((int(query_labels[i]), int(labels[nearest_other[i]])))) for i in confused)
+    return [{"students": [label_names.get(a, str(a)), label_names.get(b, str(b))], "rows": n}
+            for (a, b), n in counts.most_common(top)]
+
+
+def calibrate(gallery_path=GALLERY_FILE, far=0.01, criterion="far", max_adjust=0.25, sample=None,
+              max_block_mb=256, per_student=True, seed=0, min_tar=MIN_TAR):
+    """
+    Analyse the gallery and return the thresholds plus a report of the
+    distributions. report["problem"] explains why the thresholds should not
+    be stored (their genuine accept rate is below `min_tar`), or is None.
+    Raises ValueError if the gallery cannot be calibrated at all.
+    """
+    gallery = open_gallery(gallery_path)
+    labels = np.asarray(gallery.labels, dtype=np.int32)
+    rows = None
+    if sample and sample < len(labels):
+        rows = np.sort(np.random.default_rng(seed).choice(len(labels), sample, replace=False))
+        per_student = False  # Needs every row of every student
+
+    start = time.time()
+    genuine, impostor, nearest_other, genuine_hist, impostor_hist = scan_distances(gallery.embeddings, labels, rows,
+                                                                                   max_block_mb)
+    elapsed = time.time() - start
+
+    threshold = global_threshold(genuine, impostor, far, criterion)
+    finite_genuine = genuine[np.isfinite(genuine)]
+    finite_impostor = impostor[np.isfinite(impostor)]
+    thresholds = {
+        "global": round(threshold, 4),
+        "criterion": criterion,
+        "far": float(np.mean(finite_impostor < threshold)),
+        "tar": float(np.mean(finite_genuine < threshold)) if len(finite_genuine) else None,
+        "rows": int(len(genuine)),
+        "calibrated_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    if per_student:
+        thresholds["per_student"] = per_student_thresholds(labels, genuine, impostor, threshold, max_adjust)
+
+    report = {
+        "gallery": gallery_path, "rows": len(labels), "students": gallery.class_count,
+        "queries": int(len(genuine)), "seconds": elapsed,
+        "genuine_pairs": int(genuine_hist.sum()), "impostor_pairs_sampled": int(impostor_hist.sum()),
+        "genuine_pair_distance": histogram_percentiles(genuine_hist),
+        "impostor_pair_distance": histogram_percentiles(impostor_hist),
+        "nearest_genuine": {f"p{q}": float(np.percentile(finite_genuine, q)) for q in (50, 95, 99)}
+                           if len(finite_genuine) else {},
+        "nearest_impostor": {f"p{q}": float(np.percentile(finite_impostor, q)) for q in (1, 5, 50)},
+        "confusable_pairs": confusable_pairs(labels if rows is None else labels[rows], labels, genuine, impostor,
+                                             nearest_other, gallery.label_names),
+        "problem": None,
+        "similarity_bins": np.linspace(-1.0, 1.0, HIST_BINS + 1).round(4).tolist(),
+        "genuine_histogram": genuine_hist.tolist(), "impostor_histogram": impostor_hist.tolist(),
+    }
+    if thresholds["tar"] is not None and thresholds["tar"] < min_tar:
+        report["problem"] = (f"at threshold {threshold:.3f} only {thresholds['tar']:.1%} of the students' own photos "
+                             f"would be accepted (minimum {min_tar:.0%}); check for duplicated or mislabelled "
+                             f"student folders")
+    return thresholds, report
+
+
+def format_problem(report):
+    """Lines explaining why calibrated thresholds were not stored"""
+    lines = [f"⚠️ Not storing the thresholds: {report['problem']}"]
+    lines += [f"   {pair['students'][0]} / {pair['students'][1]}: {pair['rows']} photos nearer the other student"
+              for pair in report["confusable_pairs"]]
+    return lines
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Calibrate the recognition threshold from the gallery's own distances")
+    parser.add_argument("--gallery", default=GALLERY_FILE, help="Gallery file to analyse and update")
+    parser.add_argument("--far", type=float, default=0.01,
+                        help="Target false accept rate: share of nearest-impostor distances under the threshold")
+    parser.add_argument("--criterion", choices=("far", "eer"), default="far",
+                        help="Pick the global threshold at --far, or at the equal error rate")
+    parser.add_argument("--max-adjust", type=float, default=0.25,
+                        help="Per-student thresholds stay within this fraction of the global one")
+    parser.add_argument("--no-per-student", action="store_true", help="Only store the global threshold")
+    parser.add_argument("--sample", type=int, default=None,
+                        help="Only use this many query rows (global threshold only; for very large galleries)")
+    parser.add_argument("--max-block-mb", type=int, default=256, help="Memory for one block of similarities")
+    parser.add_argument("--min-tar", type=float, default=MIN_TAR,
+                        help="Refuse to store thresholds accepting fewer of the students' own photos than this")
+    parser.add_argument("--dry-run", action="store_true", help="Print the thresholds without writing them")
+    parser.add_argument("--json", default=None, help="Also write the distributions and thresholds to this JSON file")
+    args = parser.parse_args()
+
+    try:
+        thresholds, report = calibrate(args.gallery, far=args.far, criterion=args.criterion,
+                                       max_adjust=args.max_adjust, sample=args.sample,
+                                       max_block_mb=args.max_block_mb, per_student=not args.no_per_student,
+                                       min_tar=args.min_tar)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    print(f"📐 {report['queries']} of {report['rows']} rows ({report['students']} students) scanned "
+          f"in {report['seconds']:.1f}s: {report['genuine_pairs']:,} genuine and "
+          f"{report['impostor_pairs_sampled']:,} sampled impostor pairs")
+    for name in ("nearest_genuine", "nearest_impostor", "genuine_pair_distance", "impostor_pair_distance"):
+        print(f"   {name:<22} " + "  ".join(f"{k} {v:.3f}" for k, v in report[name].items()))
+    tar = "n/a (one photo per student)" if thresholds["tar"] is None else f"{thresholds['tar']:.1%}"
+    print(f"🎯 Global threshold {thresholds['global']:.3f} ({thresholds['criterion']}): "
+          f"false accepts {thresholds['far']:.1%}, genuine accepts {tar}")
+    if "per_student" in thresholds:
+        values = np.array(list(thresholds["per_student"].values()))
+        print(f"👤 Per-student thresholds for {len(values)} students: "
+              f"min {values.min():.3f}, median {np.median(values):.3f}, max {values.max():.3f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"thresholds": thresholds, **report}, f, indent=2)
+        print(f"✅ Report written to '{args.json}'")
+    if report["problem"]:
+        print("\n".join(format_problem(report)))
+        sys.exit(1)
+    if not args.dry_run:
+        update_metadata(args.gallery, thresholds=thresholds)
+        print(f"✅ Thresholds saved in '{args.gallery}'; recognize.py uses them from the next start")
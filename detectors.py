@@ -0,0 +1,201 @@
+import os
+import cv2
+import numpy as np
+from tracker import iou_matrix
+from metrics import METRICS
+
+# Every backend exposes detect(image) -> [(x, y, w, h)] for a BGR (or, for
+# Haar and HOG, grayscale) image, so recognize.py, register.py and
+# benchmark_detectors.py can swap them freely.
+DETECTOR_BACKENDS = ("haar", "hog", "dnn")
+
+# OpenCV's ResNet-10 SSD face detector; both files must be downloaded locally
+DNN_PROTOTXT = os.path.join("models", "deploy.prototxt")
+DNN_WEIGHTS = os.path.join("models", "res10_300x300_ssd_iter_140000.caffemodel")
+
+
+class HaarDetector:
+    """OpenCV Haar cascade face detector"""
+
+    def __init__(self, cascade_path=None, scale_factor=1.2, min_neighbors=5, min_size=(30, 30)):
+        cascade_path = cascade_path or cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
+        self.cascade = cv2.CascadeClassifier(cascade_path)
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size = min_size
+
+    def detect(self, image):
+        """Return [(x, y, w, h)] for a BGR or grayscale image"""
+        with METRICS.timer("convert"):
+            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+        with METRICS.timer("cascade"):
+            faces = self.cascade.detectMultiScale(gray, scaleFactor=self.scale_factor,
+                                                  minNeighbors=self.min_neighbors, minSize=self.min_size)
+        return [tuple(int(v) for v in face) for face in faces]
+
+
+class HogDetector:
+    """dlib HOG + linear SVM frontal face detector (what register.py used)"""
+
+    def __init__(self, upsample=1):
+        try:
+            import dlib
+        except ImportError:
+            raise RuntimeError("The 'hog' detector needs dlib (pip install dlib)")
+        self.detector = dlib.get_frontal_face_detector()
+        self.upsample = upsample
+
+    def detect(self, image):
+        """Return [(x, y, w, h)] for a BGR or grayscale image"""
+        img = cv2.cvtColor(image, cv2.COLOR_BGR2RGB) if image.ndim == 3 else image
+        height, width = image.shape[:2]
+        boxes = []
+        for rect in self.detector(img, self.upsample):
+            x1, y1 = max(0, rect.left()), max(0, rect.top())
+            x2, y2 = min(width, rect.right()), min(height, rect.bottom())
+            if x2 > x1 and y2 > y1:
+                boxes.append((x1, y1, x2 - x1, y2 - y1))
+        return boxes
+
+
+class DnnDetector:
+    """OpenCV DNN (ResNet-10 SSD) face detector loaded from local model files"""
+
+    def __init__(self, prototxt=DNN_PROTOTXT, weights=DNN_WEIGHTS, confidence=0.5, input_size=300):
+        if not (os.path.exists(prototxt) and os.path.exists(weights)):
+            raise RuntimeError(f"The 'dnn' detector needs '{prototxt}' and '{weights}'")
+        self.net = cv2.dnn.readNetFromCaffe(prototxt, weights)
+        self.confidence = confidence
+        self.input_size = input_size
+
+    def detect(self, image):
+        """Return [(x, y, w, h)] for a BGR image"""
+        if image.ndim == 2:
+            image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+        height, width = image.shape[:2]
+        blob = cv2.dnn.blobFromImage(cv2.resize(image, (self.input_size, self.input_size)), 1.0,
+                                     (self.input_size, self.input_size), (104.0, 177.0, 123.0))
+        self.net.setInput(blob)
+        detections = self.net.forward()[0, 0]
+
+        detections = detections[detections[:, 2] >= self.confidence]
+        corners = detections[:, 3:7] * np.array([width, height, width, height])
+        boxes = []
+        for x1, y1, x2, y2 in corners.astype(int):
+            x1, y1 = max(0, x1), max(0, y1)
+            x2, y2 = min(width, x2), min(height, y2)
+            if x2 > x1 and y2 > y1:
+                boxes.append((int(x1), int(y1), int(x2 - x1), int(y2 - y1)))
+        return boxes
+
+
+def create_detector(backend="haar", **kwargs):
+    """Build a detector backend by name ('haar', 'hog' or 'dnn')"""
+    if backend == "haar":
+        return HaarDetector(**kwargs)
+    if backend == "hog":
+        return HogDetector(**kwargs)
+    if backend == "dnn":
+        return DnnDetector(**kwargs)
+    raise ValueError(f"Unknown detector backend '{backend}', use one of {DETECTOR_BACKENDS}")
+
+
+def _merge_regions(regions):
+    """Merge overlapping (x1, y1, x2, y2) rectangles until none overlap"""
+    regions = [list(r) for r in regions]
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(regions)):
+            for j in range(i + 1, len(regions)):
+                a, b = regions[i], regions[j]
+                if a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]:
+                    regions[i] = [min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])]
+                    del regions[j]
+                    merged = True
+                    break
+            if merged:
+                break
+    return regions
+
+
+def _dedupe(boxes, iou_threshold=0.5):
+    """Drop boxes that overlap an earlier box by more than iou_threshold"""
+    kept = []
+    for box in boxes:
+        if not kept or iou_matrix([box], kept).max() <= iou_threshold:
+            kept.append(box)
+    return kept
+
+
+class AdaptiveDetector:
+    """
+    Runs a detector on a downscaled copy of the frame and, between
+    periodic full-frame scans, only inside regions around the faces found
+    last time.
+
+    Boxes are always returned in full-resolution coordinates so callers
+    crop faces from the original frame. A full scan runs every
+    `full_scan_interval` frames (to catch newcomers) and whenever there
+    are no known faces to search around.
+    """
+
+    def __init__(self, detector, scale=0.5, roi_margin=0.5, full_scan_interval=10):
+        self.detector = detector
+        self.scale = scale
+        self.roi_margin = roi_margin
+        self.full_scan_interval = max(1, full_scan_interval)
+
+        self.last_boxes = []
+        self.frames_since_full = 0
+
+        # Counters for the end-of-session report
+        self.full_scans = 0
+        self.roi_scans = 0
+        self.pixels_scanned = 0
+        self.pixels_total = 0
+
+    def _detect_scaled(self, image):
+        """Detect on `image` resized by self.scale, boxes in `image` coordinates"""
+        if self.scale == 1.0:
+            small = image
+        else:
+            small = cv2.resize(image, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        self.pixels_scanned += small.shape[0] * small.shape[1]
+        return [tuple(int(round(v / self.scale)) for v in box) for box in self.detector.detect(small)]
+
+    def detect(self, frame):
+        """Return [(x, y, w, h)] in full-frame coordinates"""
+        with METRICS.timer("detect"):
+            return self._detect(frame)
+
+    def _detect(self, frame):
+        height, width = frame.shape[:2]
+        self.pixels_total += int(height * width * self.scale * self.scale)
+
+        if not self.last_boxes or self.frames_since_full >= self.full_scan_interval - 1:
+            boxes = self._detect_scaled(frame)
+            self.full_scans += 1
+            self.frames_since_full = 0
+        else:
+            regions = []
+            for (x, y, w, h) in self.last_boxes:
+                mx, my = int(w * self.roi_margin), int(h * self.roi_margin)
+                regions.append((max(0, x - mx), max(0, y - my),
+                                min(width, x + w + mx), min(height, y + h + my)))
+
+            boxes = []
+            for x1, y1, x2, y2 in _merge_regions(regions):
+                for (x, y, w, h) in self._detect_scaled(frame[y1:y2, x1:x2]):
+                    boxes.append((x + x1, y + y1, w, h))
+            boxes = _dedupe(boxes)
+            self.roi_scans += 1
+            self.frames_since_full += 1
+
+        self.last_boxes = boxes
+        return boxes
+
+    @property
+    def scanned_fraction(self):
+        """Pixels actually searched relative to scanning every downscaled frame in full"""
+        return self.pixels_scanned / self.pixels_total if self.pixels_total else 0.0
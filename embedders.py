@@ -0,0 +1,147 @@
+import os
+import cv2
+import numpy as np
+from gallery import l2_normalize
+
+# Every backend exposes embeddings(images) -> (n, dim) float32 L2-normalized
+# rows for a list of RGB face crops, and a `name` that is stored in the
+# gallery so recognition can warn when it is matched with another backend.
+# Backends are chosen with a spec string: "keras", "stub", or "tflite:<model>"
+# where <model> is a quantization name from TFLITE_MODELS or a file path.
+EMBEDDER_BACKENDS = ("keras", "tflite", "stub")
+
+# FaceNet resizes every crop to 160x160 float32 before the forward pass
+FACENET_INPUT_SIZE = 160
+
+# Default location of models written by export_embedder.py
+TFLITE_MODELS = {
+    "float16": os.path.join("models", "facenet_float16.tflite"),
+    "dynamic": os.path.join("models", "facenet_dynamic.tflite"),
+    "int8": os.path.join("models", "facenet_int8.tflite"),
+}
+
+
+def prepare_faces(images, size=FACENET_INPUT_SIZE):
+    """
+    Stack RGB crops into a (n, size, size, 3) float32 batch scaled to
+    [-1, 1], the same resize and fixed standardization keras-facenet
+    applies before its forward pass.
+    """
+    batch = np.stack([cv2.resize(np.asarray(img), (size, size)) for img in images]).astype(np.float32)
+    return (batch - 127.5) / 127.5
+
+
+class KerasEmbedder:
+    """The pretrained keras-facenet model on TensorFlow (the reference backend)"""
+
+    name = "keras"
+
+    def __init__(self):
+        try:
+            from keras_facenet import FaceNet
+        except ImportError:
+            raise RuntimeError("The 'keras' embedder needs keras-facenet and tensorflow")
+        self.model = FaceNet()
+
+    def embeddings(self, images):
+        return l2_normalize(self.model.embeddings(images))
+
+
+class TFLiteEmbedder:
+    """
+    FaceNet exported to TensorFlow Lite (see export_embedder.py), optionally
+    quantized to float16 or int8, run with the standalone tflite-runtime
+    interpreter when installed and tf.lite otherwise.
+    """
+
+    def __init__(self, model_path=TFLITE_MODELS["dynamic"], threads=None):
+        if not os.path.exists(model_path):
+            raise RuntimeError(f"The 'tflite' embedder needs '{model_path}' (run export_embedder.py)")
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            try:
+                from tensorflow.lite import Interpreter
+            except ImportError:
+                raise RuntimeError("The 'tflite' embedder needs tflite-runtime or tensorflow")
+        self.interpreter = Interpreter(model_path=model_path, num_threads=threads or os.cpu_count())
+        self.input = self.interpreter.get_input_details()[0]
+        self.output = self.interpreter.get_output_details()[0]
+        self.batch = None
+        self.name = "tflite:" + os.path.basename(model_path)
+
+    def _resize(self, n):
+        """Resize the input tensor to a batch of n (re-allocates only when n changes)"""
+        if n != self.batch:
+            self.interpreter.resize_tensor_input(self.input["index"], [n] + list(self.input["shape"][1:]))
+            self.interpreter.allocate_tensors()
+            self.input = self.interpreter.get_input_details()[0]
+            self.output = self.interpreter.get_output_details()[0]
+            self.batch = n
+
+    def embeddings(self, images):
+        batch = prepare_faces(images, int(self.input["shape"][1]))
+        self._resize(len(batch))
+
+        # Fully int8 models take quantized input and give quantized output
+        if self.input["dtype"] != np.float32:
+            scale, zero = self.input["quantization"]
+            batch = np.clip(np.round(batch / scale + zero), -128, 127).astype(self.input["dtype"])
+        self.interpreter.set_tensor(self.input["index"], batch)
+        self.interpreter.invoke()
+        out = self.interpreter.get_tensor(self.output["index"])
+        if self.output["dtype"] != np.float32:
+            scale, zero = self.output["quantization"]
+            out = (out.astype(np.float32) - zero) * scale
+        return l2_normalize(out)
+
+
+class StubEmbedder:
+    """
+    Deterministic stand-in for tests and benchmarks: a fixed random
+    projection of a small grayscale thumbnail. Similar crops get similar
+    embeddings, no model files or TensorFlow are needed.
+    """
+
+    def __init__(self, dim=512, seed=0, thumb=16):
+        rng = np.random.default_rng(seed)
+        self.projection = rng.standard_normal((thumb * thumb, dim)).astype(np.float32)
+        self.thumb = thumb
+        self.name = "stub"
+
+    def embeddings(self, images):
+        thumbs = np.stack([cv2.resize(cv2.cvtColor(np.asarray(img), cv2.COLOR_RGB2GRAY),
+                                      (self.thumb, self.thumb), interpolation=cv2.INTER_AREA)
+                           for img in images]).astype(np.float32).reshape(len(images), -1)
+        thumbs -= thumbs.mean(axis=1, keepdims=True)  # Ignore overall brightness
+        return l2_normalize(thumbs @ self.projection)
+
+
+def create_embedder(spec="keras", threads=None):
+    """
+    Build an embedder from a spec: 'keras', 'stub', 'tflite' (the dynamic
+    range model), 'tflite:float16', 'tflite:int8' or 'tflite:<path>'.
+    """
+    backend, _, model = spec.partition(":")
+    if backend == "keras":
+        return KerasEmbedder()
+    if backend == "tflite":
+        return TFLiteEmbedder(TFLITE_MODELS.get(model or "dynamic", model), threads=threads)
+    if backend == "stub":
+        return StubEmbedder()
+    raise ValueError(f"Unknown embedder backend '{backend}', use one of {EMBEDDER_BACKENDS}")
+
+
+def embedder_name(spec="keras"):
+    """The `name` create_embedder(spec) will have, without loading any model"""
+    backend, _, model = spec.partition(":")
+    if backend == "tflite":
+        return "tflite:" + os.path.basename(TFLITE_MODELS.get(model or "dynamic", model))
+    if backend in EMBEDDER_BACKENDS:
+        return backend
+    raise ValueError(f"Unknown embedder backend '{backend}', use one of {EMBEDDER_BACKENDS}")
+
+
+def embedder_family(name):
+    """'keras' and 'tflite:*' are the same network; 'stub' is not comparable to either"""
+    return "stub" if name.split(":")[0] == "stub" else "facenet"
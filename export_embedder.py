@@ -0,0 +1,70 @@
+import os
+import glob
+import argparse
+import numpy as np
+from PIL import Image
+from embedders import TFLITE_MODELS, prepare_faces
+from sources import IMAGE_EXTENSIONS
+
+
+def calibration_faces(root="student_images", limit=200):
+    """Registered face crops, spread across students, for int8 calibration"""
+    paths = sorted(p for p in glob.glob(os.path.join(root, "*", "*")) if p.lower().endswith(IMAGE_EXTENSIONS))
+    step = max(1, len(paths) // limit)
+    return [np.array(Image.open(p).convert("RGB")) for p in paths[::step][:limit]]
+
+
+def export_tflite(quantization="dynamic", output=None, calibration_root="student_images", calibration_size=200):
+    """
+    Convert the keras-facenet model to TensorFlow Lite.
+
+    'float16' halves the weights; 'dynamic' stores int8 weights and
+    quantizes activations on the fly; 'int8' also runs activations in int8,
+    calibrated on registered student images. Inputs and outputs stay
+    float32 so every variant is a drop-in replacement.
+    """
+    import tensorflow as tf
+    from keras_facenet import FaceNet
+
+    model = FaceNet().model
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+
+    if quantization == "float16":
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantization == "int8":
+        faces = calibration_faces(calibration_root, calibration_size)
+        if not faces:
+            raise RuntimeError(f"int8 calibration needs registered images in '{calibration_root}'")
+
+        def representative_dataset():
+            for face in faces:
+                yield [prepare_faces([face])]
+
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    elif quantization != "dynamic":
+        raise ValueError(f"Unknown quantization '{quantization}', use one of {tuple(TFLITE_MODELS)}")
+
+    output = output or TFLITE_MODELS[quantization]
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output + ".tmp", "wb") as f:
+        f.write(converter.convert())
+    os.replace(output + ".tmp", output)
+    return output
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export FaceNet to a quantized TensorFlow Lite model for CPU")
+    parser.add_argument("--quantization", choices=list(TFLITE_MODELS), default="dynamic",
+                        help="float16 weights, int8 weights (dynamic), or int8 weights and activations")
+    parser.add_argument("--output", default=None, help="Model file to write (default: models/facenet_<quantization>.tflite)")
+    parser.add_argument("--calibration-images", default="student_images",
+                        help="int8: folder of registered face images used for calibration")
+    parser.add_argument("--calibration-size", type=int, default=200,
+                        help="int8: number of calibration images")
+    args = parser.parse_args()
+
+    path = export_tflite(args.quantization, args.output, args.calibration_images, args.calibration_size)
+    print(f"✅ Exported '{path}' ({os.path.getsize(path) / 1e6:.1f} MB)")
+    print(f"   Check its drift with: python verify_embedders.py --candidates tflite:{path}")
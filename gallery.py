@@ -0,0 +1,338 @@
+import os
+import json
+import struct
+import argparse
+import numpy as np
+
+# Single-file embedding gallery written by train_model.py
+GALLERY_FILE = "faces_gallery.bin"
+
+# Compressed gallery with k prototypes per student (train_model.py --prototypes)
+PROTOTYPES_FILE = "faces_prototypes.bin"
+
+# Files written by older versions of train_model.py
+LEGACY_EMBEDDINGS_FILE = "faces_embeddings.npy"
+LEGACY_LABELS_FILE = "faces_labels.npy"
+LABEL_MAP_FILE = "label_map.json"
+
+# File layout:
+#   8 bytes   magic
+#   uint32    format version
+#   uint32    length of the JSON header
+#   JSON      header (dtype, count, dim, offsets, label table, metadata)
+#   padding   up to ALIGNMENT
+#   count x dim matrix of L2-normalized float32/float16 embeddings
+#   padding   up to ALIGNMENT
+#   count int32 labels
+MAGIC = b"FACEGAL\0"
+VERSION = 1
+ALIGNMENT = 64
+PREFIX = struct.Struct("<8sII")
+SUPPORTED_DTYPES = ("float32", "float16")
+
+
+class Gallery:
+    """Embedding matrix, label column and label table of a trained gallery"""
+
+    def __init__(self, embeddings, labels, label_map, metadata=None, path=None):
+        self.embeddings = embeddings  # (N, D), rows are L2-normalized
+        self.labels = labels          # (N,) int32
+        self.label_map = label_map    # {label_str -> int_id}
+        self.metadata = metadata or {}
+        self.path = path
+
+    def __len__(self):
+        return len(self.labels)
+
+    @property
+    def label_names(self):
+        """Reverse mapping {int_id -> label_str}"""
+        return {int(v): k for k, v in self.label_map.items()}
+
+    @property
+    def class_count(self):
+        return len(np.unique(self.labels))
+
+    def subset(self, label_ids):
+        """
+        In-memory gallery with only the rows of the given label IDs (e.g. a
+        section's roster); the rows are copied out of the memmap.
+        """
+        mask = np.isin(self.labels, np.asarray(label_ids, dtype=np.int32))
+        keep = {int(i) for i in label_ids}
+        label_map = {k: v for k, v in self.label_map.items() if v in keep}
+        return Gallery(np.array(self.embeddings[mask]), np.array(self.labels[mask]), label_map,
+                       dict(self.metadata, subset_of=self.path))
+
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def l2_normalize(embeddings):
+    """Scale each row to unit length (zero rows are left as they are)"""
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return embeddings / np.maximum(norms, 1e-12)
+
+
+def save_gallery(path, embeddings, labels, label_map, dtype="float32", metadata=None, normalize=True):
+    """
+    Write a gallery file atomically.
+
+    Embeddings are L2-normalized (unless `normalize` is False, for rows
+    that already are) and stored as one contiguous `dtype` matrix,
+    followed by an int32 label column, so readers can memory-map both
+    without copying.
+    """
+    if dtype not in SUPPORTED_DTYPES:
+        raise ValueError(f"Unsupported gallery dtype '{dtype}', use one of {SUPPORTED_DTYPES}")
+
+    embeddings = (l2_normalize(embeddings) if normalize else np.asarray(embeddings)).astype(dtype)
+    if embeddings.ndim != 2:
+        embeddings = embeddings.reshape(len(embeddings), -1)
+    labels = np.asarray(labels, dtype=np.int32)
+    if len(labels) != len(embeddings):
+        raise ValueError(f"Got {len(embeddings)} embeddings but {len(labels)} labels")
+
+    count, dim = embeddings.shape
+
+    # The header stores absolute offsets, and its own length moves them,
+    # so grow the reserved space until the JSON fits in it
+    reserved = ALIGNMENT
+    while True:
+        embeddings_offset = _align(PREFIX.size + reserved)
+        labels_offset = _align(embeddings_offset + embeddings.nbytes)
+        header = json.dumps({
+            "dtype": dtype,
+            "count": count,
+            "dim": dim,
+            "embeddings_offset": embeddings_offset,
+            "labels_offset": labels_offset,
+            "label_map": label_map,
+            "metadata": metadata or {},
+        }).encode("utf-8")
+        if PREFIX.size + len(header) <= embeddings_offset:
+            break
+        reserved = len(header)
+
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(PREFIX.pack(MAGIC, VERSION, len(header)))
+        f.write(header)
+        f.write(b"\0" * (embeddings_offset - f.tell()))
+        f.write(np.ascontiguousarray(embeddings).tobytes())
+        f.write(b"\0" * (labels_offset - f.tell()))
+        f.write(labels.tobytes())
+    os.replace(tmp, path)
+
+
+def read_header(path=GALLERY_FILE):
+    """Read only the JSON header of a gallery file"""
+    with open(path, "rb") as f:
+        prefix = f.read(PREFIX.size)
+        if len(prefix) != PREFIX.size:
+            raise ValueError(f"'{path}' is too short to be a gallery file")
+        magic, version, header_len = PREFIX.unpack(prefix)
+        if magic != MAGIC:
+            raise ValueError(f"'{path}' is not a gallery file")
+        if version > VERSION:
+            raise ValueError(f"'{path}' uses gallery format v{version}, this code reads up to v{VERSION}")
+        return json.loads(f.read(header_len).decode("utf-8"))
+
+
+def load_gallery(path=GALLERY_FILE, mmap=True):
+    """
+    Load a gallery file.
+
+    With mmap=True the embedding matrix and label column are np.memmap
+    views of the file, so several recognizer processes share the same
+    pages instead of each holding a private copy.
+    """
+    header = read_header(path)
+    count, dim, dtype = header["count"], header["dim"], np.dtype(header["dtype"])
+
+    if count == 0:
+        embeddings = np.zeros((0, dim), dtype=dtype)
+        labels = np.zeros(0, dtype=np.int32)
+    elif mmap:
+        embeddings = np.memmap(path, dtype=dtype, mode="r",
+                               offset=header["embeddings_offset"], shape=(count, dim))
+        labels = np.memmap(path, dtype=np.int32, mode="r",
+                           offset=header["labels_offset"], shape=(count,))
+    else:
+        with open(path, "rb") as f:
+            f.seek(header["embeddings_offset"])
+            embeddings = np.fromfile(f, dtype=dtype, count=count * dim).reshape(count, dim)
+            f.seek(header["labels_offset"])
+            labels = np.fromfile(f, dtype=np.int32, count=count)
+
+    return Gallery(embeddings, labels, header["label_map"], header.get("metadata"), path)
+
+
+def update_metadata(path, **updates):
+    """
+    Rewrite a gallery file with `updates` merged into its metadata. The
+    embedding and label bytes are copied unchanged, so an IVF index built
+    for the gallery stays valid.
+    """
+    gallery = load_gallery(path, mmap=False)
+    save_gallery(path, gallery.embeddings, gallery.labels, gallery.label_map, dtype=gallery.embeddings.dtype.name,
+                 metadata=dict(gallery.metadata, **updates), normalize=False)
+
+
+def load_legacy_gallery(embeddings_path=LEGACY_EMBEDDINGS_FILE,
+                        labels_path=LEGACY_LABELS_FILE,
+                        label_map_path=LABEL_MAP_FILE):
+    """Build a Gallery from the old .npy + label_map.json files"""
+    embeddings = np.load(embeddings_path, allow_pickle=True)
+    labels = np.load(labels_path, allow_pickle=True)
+    with open(label_map_path, "r") as f:
+        label_map = json.load(f)
+    embeddings = l2_normalize(np.stack(list(embeddings)) if embeddings.dtype == object else embeddings)
+    return Gallery(embeddings, labels.astype(np.int32), label_map)
+
+
+def _spherical_kmeans(points, k, iterations=20, seed=0):
+    """Cluster unit vectors by cosine similarity; returns (centroids, assignment)"""
+    rng = np.random.default_rng(seed)
+
+    # k-means++ seeding on squared euclidean distance
+    centroids = [points[rng.integers(len(points))]]
+    for _ in range(1, k):
+        d2 = np.min(2.0 - 2.0 * points @ np.array(centroids).T, axis=1).clip(min=0)
+        total = d2.sum()
+        idx = rng.choice(len(points), p=d2 / total) if total > 0 else rng.integers(len(points))
+        centroids.append(points[idx])
+    centroids = np.array(centroids)
+
+    assignment = np.zeros(len(points), dtype=np.int64)
+    for iteration in range(iterations):
+        new_assignment = np.argmax(points @ centroids.T, axis=1)
+        if iteration > 0 and np.array_equal(new_assignment, assignment):
+            break
+        assignment = new_assignment
+        for c in range(k):
+            members = points[assignment == c]
+            if len(members):
+                centroids[c] = members.sum(axis=0)
+        centroids = l2_normalize(centroids)
+
+    return centroids, assignment
+
+
+def compute_prototypes(embeddings, labels, k, method="kmeans", seed=0):
+    """
+    Reduce each student's embeddings to at most k prototypes.
+
+    method="kmeans" keeps the (re-normalized) cluster centroids,
+    method="medoids" keeps the real sample closest to each centroid.
+    Returns (prototype_embeddings, prototype_labels).
+    """
+    if method not in ("kmeans", "medoids"):
+        raise ValueError(f"Unknown prototype method '{method}'")
+
+    embeddings = l2_normalize(embeddings)
+    labels = np.asarray(labels, dtype=np.int32)
+    proto_embeddings, proto_labels = [], []
+
+    for label in np.unique(labels):
+        points = embeddings[labels == label]
+        if len(points) <= k:
+            centroids = points
+        else:
+            centroids, assignment = _spherical_kmeans(points, k, seed=seed)
+            if method == "medoids":
+                medoids = []
+                for c in range(len(centroids)):
+                    members = points[assignment == c]
+                    if len(members):
+                        medoids.append(members[np.argmax(members @ centroids[c])])
+                centroids = np.array(medoids)
+        proto_embeddings.append(centroids)
+        proto_labels.extend([label] * len(centroids))
+
+    return np.concatenate(proto_embeddings), np.array(proto_labels, dtype=np.int32)
+
+
+def evaluate_prototypes(embeddings, labels, k, method="kmeans", holdout_every=5):
+    """
+    Measure what prototype compression costs in accuracy.
+
+    Every `holdout_every`-th sample of each student is held out; the rest
+    forms both the full gallery and the prototypes built from it. Returns
+    a dict with nearest-neighbour accuracy and row counts for both.
+    """
+    embeddings = l2_normalize(embeddings)
+    labels = np.asarray(labels, dtype=np.int32)
+
+    holdout = np.zeros(len(labels), dtype=bool)
+    for label in np.unique(labels):
+        idx = np.flatnonzero(labels == label)
+        holdout[idx[::holdout_every]] = len(idx) > 1
+
+    train_emb, train_labels = embeddings[~holdout], labels[~holdout]
+    query_emb, query_labels = embeddings[holdout], labels[holdout]
+    proto_emb, proto_labels = compute_prototypes(train_emb, train_labels, k, method=method)
+
+    def accuracy(gallery_emb, gallery_labels):
+        if len(query_emb) == 0:
+            return float("nan")
+        nearest = np.argmax(query_emb @ gallery_emb.T, axis=1)
+        return float(np.mean(gallery_labels[nearest] == query_labels))
+
+    return {
+        "full_rows": int(len(train_emb)),
+        "full_accuracy": accuracy(train_emb, train_labels),
+        "prototype_rows": int(len(proto_emb)),
+        "prototype_accuracy": accuracy(proto_emb, proto_labels),
+        "queries": int(len(query_emb)),
+    }
+
+
+def gallery_exists(path=GALLERY_FILE):
+    """True if either the gallery file or the legacy model files are present"""
+    return os.path.exists(path) or all(
+        os.path.exists(p) for p in (LEGACY_EMBEDDINGS_FILE, LEGACY_LABELS_FILE, LABEL_MAP_FILE))
+
+
+def open_gallery(path=GALLERY_FILE, mmap=True):
+    """Load the gallery file, falling back to the legacy .npy files"""
+    if os.path.exists(path):
+        return load_gallery(path, mmap=mmap)
+    return load_legacy_gallery()
+
+
+def read_label_map(path=GALLERY_FILE):
+    """
+    Return {int_id -> label_str} from the gallery header without touching
+    the embedding matrix, falling back to label_map.json.
+    """
+    if os.path.exists(path):
+        data = read_header(path)["label_map"]
+    elif os.path.exists(LABEL_MAP_FILE):
+        with open(LABEL_MAP_FILE, "r") as f:
+            data = json.load(f)
+    else:
+        return {}
+    return {int(v): k for k, v in data.items()}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or convert embedding gallery files")
+    parser.add_argument("--convert", action="store_true",
+                        help="Convert the legacy .npy/.json model files into a gallery file")
+    parser.add_argument("--dtype", choices=SUPPORTED_DTYPES, default="float32",
+                        help="Storage type of the embedding matrix when converting")
+    parser.add_argument("--path", default=GALLERY_FILE, help="Gallery file to write or inspect")
+    args = parser.parse_args()
+
+    if args.convert:
+        legacy = load_legacy_gallery()
+        save_gallery(args.path, legacy.embeddings, legacy.labels, legacy.label_map, dtype=args.dtype)
+        print(f"✅ Wrote {len(legacy)} embeddings to '{args.path}'")
+
+    header = read_header(args.path)
+    size_mb = os.path.getsize(args.path) / (1024 * 1024)
+    print(f"📦 '{args.path}': {header['count']} x {header['dim']} {header['dtype']}, "
+          f"{len(header['label_map'])} students, {size_mb:.2f} MB")
@@ -0,0 +1,88 @@
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+import cv2
+import numpy as np
+from PIL import Image, ImageEnhance
+
+
+def enhance_face(face_img):
+    """Registration look: contrast x1.3, sharpness x1.2, saved as grayscale"""
+    pil_img = Image.fromarray(cv2.cvtColor(face_img, cv2.COLOR_BGR2RGB))
+    pil_img = ImageEnhance.Contrast(pil_img).enhance(1.3)
+    pil_img = ImageEnhance.Sharpness(pil_img).enhance(1.2)
+    return cv2.cvtColor(np.array(pil_img), cv2.COLOR_RGB2GRAY)
+
+
+class ImageWriter:
+    """
+    Enhances and encodes face crops on a small thread pool, so the camera
+    loop only copies the crop.
+
+    At most `max_pending` crops wait at a time; submit() returns False
+    instead of blocking when the writers fall behind, and the caller
+    simply tries again with a later frame. Finished writes are collected
+    as (path, error) and picked up with completed() on the caller's
+    thread, e.g. to move a Tk progress bar.
+    """
+
+    def __init__(self, workers=2, max_pending=16, process=enhance_face):
+        self.process = process
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="image-writer")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._futures = set()
+        self._lock = threading.Lock()
+        self._done = deque()
+
+        self.written = 0
+        self.failed = 0
+
+    def submit(self, face_img, path):
+        """Queue a BGR crop to be written to `path`; False if the queue is full"""
+        if not self._slots.acquire(blocking=False):
+            return False
+        future = self._pool.submit(self._write, face_img.copy(), path)  # The frame is drawn on afterwards
+        with self._lock:
+            self._futures.add(future)
+        future.add_done_callback(self._finished)
+        return True
+
+    def _write(self, face_img, path):
+        try:
+            if not cv2.imwrite(path, self.process(face_img)):
+                raise IOError(f"could not write '{path}'")
+            error = None
+        except Exception as e:
+            error = e
+        with self._lock:
+            if error is None:
+                self.written += 1
+            else:
+                self.failed += 1
+            self._done.append((path, error))
+
+    def _finished(self, future):
+        with self._lock:
+            self._futures.discard(future)
+        self._slots.release()
+
+    @property
+    def pending(self):
+        with self._lock:
+            return len(self._futures)
+
+    def completed(self):
+        """(path, error) of the writes finished since the last call"""
+        with self._lock:
+            done, self._done = list(self._done), deque()
+        return done
+
+    def flush(self, timeout=None):
+        """Wait for every queued write; True if none is left"""
+        with self._lock:
+            futures = list(self._futures)
+        return not wait(futures, timeout=timeout).not_done
+
+    def close(self):
+        self.flush()
+        self._pool.shutdown()
@@ -0,0 +1,226 @@
+import os
+import time
+import hashlib
+import argparse
+import numpy as np
+from gallery import GALLERY_FILE, l2_normalize, open_gallery
+from matcher import GalleryMatcher
+
+# Galleries smaller than this are searched exactly: one matrix product
+# over every row is already faster than probing inverted lists
+IVF_MIN_ROWS = 20000
+
+
+def index_path(gallery_path=GALLERY_FILE):
+    """The IVF index lives next to its gallery, e.g. faces_gallery.ivf.npz"""
+    return os.path.splitext(gallery_path)[0] + ".ivf.npz"
+
+
+def gallery_digest(embeddings, labels):
+    """Cheap fingerprint of a gallery, to notice an index built for another one"""
+    step = max(1, len(labels) // 1024)
+    digest = hashlib.sha1(np.asarray(labels, dtype=np.int32).tobytes())
+    digest.update(np.ascontiguousarray(embeddings[::step], dtype=np.float32).tobytes())
+    return digest.hexdigest()
+
+
+def _assign(points, centroids, block_rows=65536):
+    """Index of the most similar centroid for every row, computed blockwise"""
+    assignment = np.zeros(len(points), dtype=np.int64)
+    for start in range(0, len(points), block_rows):
+        block = np.asarray(points[start:start + block_rows], dtype=np.float32)
+        assignment[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return assignment
+
+
+def train_centroids(points, n_lists, iterations=10, sample_size=None, seed=0):
+    """
+    Spherical k-means on a random sample of the gallery (at most 64 rows
+    per list), started from random rows; empty lists are re-seeded.
+    """
+    rng = np.random.default_rng(seed)
+    sample_size = min(len(points), sample_size or 64 * n_lists)
+    sample = l2_normalize(points[np.sort(rng.choice(len(points), sample_size, replace=False))])
+    centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignment = _assign(sample, centroids)
+        order = np.argsort(assignment, kind="stable")
+        counts = np.bincount(assignment, minlength=n_lists)
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        empty = counts == 0
+        sums = np.zeros_like(centroids)
+        sums[~empty] = np.add.reduceat(sample[order], starts[~empty], axis=0)
+        sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+        centroids = l2_normalize(sums)
+    return centroids
+
+
+class IVFIndex:
+    """
+    Inverted-file index over an L2-normalized gallery.
+
+    Rows are clustered around `n_lists` coarse centroids. A query is only
+    compared with the rows of its `nprobe` most similar lists, so the work
+    per face is roughly nprobe / n_lists of an exact search. nprobe is the
+    recall/speed knob: higher finds more of the exact neighbours, and
+    nprobe = n_lists is an exact search.
+    """
+
+    def __init__(self, centroids, order, offsets, nprobe=8, digest=None):
+        self.centroids = np.asarray(centroids, dtype=np.float32)
+        self.order = np.asarray(order, dtype=np.int64)      # gallery rows grouped by list
+        self.offsets = np.asarray(offsets, dtype=np.int64)  # list i is order[offsets[i]:offsets[i+1]]
+        self.nprobe = max(1, min(int(nprobe), self.n_lists))
+        self.digest = digest
+
+    @property
+    def n_lists(self):
+        return len(self.centroids)
+
+    @classmethod
+    def build(cls, embeddings, labels=None, n_lists=None, nprobe=8, iterations=10, seed=0):
+        """Cluster the gallery rows; n_lists defaults to about 4 * sqrt(rows)"""
+        count = len(embeddings)
+        n_lists = max(1, min(count, n_lists or int(round(4 * np.sqrt(count)))))
+        centroids = train_centroids(embeddings, n_lists, iterations=iterations, seed=seed)
+        assignment = _assign(embeddings, centroids)
+        order = np.argsort(assignment, kind="stable")
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(assignment, minlength=n_lists))])
+        digest = gallery_digest(embeddings, labels) if labels is not None else None
+        return cls(centroids, order, offsets, nprobe=nprobe, digest=digest)
+
+    def save(self, path):
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, centroids=self.centroids, order=self.order, offsets=self.offsets,
+                     nprobe=np.int64(self.nprobe), digest=np.array(self.digest or ""))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        return cls(data["centroids"], data["order"], data["offsets"],
+                   nprobe=int(data["nprobe"]), digest=str(data["digest"]) or None)
+
+    def search(self, embeddings, queries, k, nprobe=None):
+        """
+        Return (similarities, indices) of the approximate k nearest rows of
+        `embeddings` (the gallery the index was built on) for each
+        L2-normalized query, shaped (B, k) and sorted nearest first. Lists
+        beyond nprobe are added when the probed ones hold fewer than k rows.
+        """
+        nprobe = max(1, min(nprobe or self.nprobe, self.n_lists))
+        k = max(1, min(k, len(self.order)))
+        list_order = np.argsort(-(queries @ self.centroids.T), axis=1)
+        sizes = np.diff(self.offsets)
+
+        best_sims = np.empty((len(queries), k), dtype=np.float32)
+        best_idx = np.empty((len(queries), k), dtype=np.int64)
+        for i, query in enumerate(queries):
+            probe = list_order[i, :nprobe]
+            if sizes[probe].sum() < k:
+                probe = list_order[i, :np.searchsorted(np.cumsum(sizes[list_order[i]]), k) + 1]
+            candidates = np.sort(np.concatenate([self.order[self.offsets[l]:self.offsets[l + 1]] for l in probe]))
+
+            sims = embeddings[candidates] @ query
+            top = np.argpartition(-sims, k - 1)[:k] if len(sims) > k else np.arange(len(sims))
+            top = top[np.argsort(-sims[top])]
+            best_sims[i], best_idx[i] = sims[top], candidates[top]
+        return best_sims, best_idx
+
+
+def exact_search(embeddings, queries, k, block_rows=65536):
+    """Brute-force top-k (the ground truth for recall checks)"""
+    return GalleryMatcher(embeddings, np.zeros(len(embeddings), np.int32), k=k, block_rows=block_rows).search(queries, k)
+
+
+def evaluate_recall(index, embeddings, nprobes, k=3, queries=500, batch=8, seed=0, stop_at=None):
+    """
+    Recall@k of the index against exact search, and ms per query, for each
+    nprobe. Queries are gallery rows whose own row is left out of both
+    result lists, like a new photo of an enrolled student; they are sent
+    in batches of `batch`, about one frame's worth of faces. With
+    `stop_at`, larger nprobes are skipped once that recall is reached.
+    """
+    rng = np.random.default_rng(seed)
+    rows = np.sort(rng.choice(len(embeddings), min(queries, len(embeddings)), replace=False))
+    q = l2_normalize(embeddings[rows])
+    k = min(k, len(embeddings) - 1)
+
+    def run(search):
+        start = time.perf_counter()
+        found = np.concatenate([search(q[i:i + batch])[1] for i in range(0, len(q), batch)])
+        ms = (time.perf_counter() - start) * 1000 / len(q)
+        return [[r for r in row if r != own][:k] for row, own in zip(found, rows)], ms
+
+    truth, exact_ms = run(lambda chunk: exact_search(embeddings, chunk, k + 1))
+    results = []
+    for nprobe in nprobes:
+        found, ms = run(lambda chunk: index.search(embeddings, chunk, k + 1, nprobe=nprobe))
+        hits = sum(len(set(t) & set(f)) for t, f in zip(truth, found))
+        results.append({"nprobe": int(min(nprobe, index.n_lists)), "recall": hits / max(1, len(q) * k),
+                        "ms_per_query": ms, "exact_ms_per_query": exact_ms})
+        if stop_at is not None and results[-1]["recall"] >= stop_at:
+            break
+    return results
+
+
+def tune_nprobe(index, embeddings, target_recall=0.99, k=3, queries=500):
+    """Smallest power-of-two nprobe reaching `target_recall`; returns (nprobe, results)"""
+    nprobes = [1]
+    while nprobes[-1] < index.n_lists:
+        nprobes.append(min(nprobes[-1] * 2, index.n_lists))
+    results = evaluate_recall(index, embeddings, nprobes, k=k, queries=queries, stop_at=target_recall)
+    for r in results:
+        if r["recall"] >= target_recall:
+            return r["nprobe"], results
+    return index.n_lists, results
+
+
+def load_index(gallery):
+    """The gallery's IVF index, or None if there is none or it is stale"""
+    if gallery.path is None:
+        return None  # Legacy .npy galleries are never indexed
+    path = index_path(gallery.path)
+    if not os.path.exists(path):
+        return None
+    try:
+        index = IVFIndex.load(path)
+    except Exception as e:
+        print(f"⚠️ Ignoring unreadable index '{path}': {e}")
+        return None
+    if index.digest != gallery_digest(gallery.embeddings, gallery.labels) or index.offsets[-1] != len(gallery):
+        print(f"⚠️ Ignoring '{path}': it was built for another gallery (re-run train_model.py)")
+        return None
+    return index
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or check the IVF index of a gallery")
+    parser.add_argument("--gallery", default=GALLERY_FILE, help="Gallery file to index")
+    parser.add_argument("--build", action="store_true", help="(Re)build the index before checking it")
+    parser.add_argument("--lists", type=int, default=None, help="Number of inverted lists (default ~4*sqrt(rows))")
+    parser.add_argument("--target-recall", type=float, default=0.99,
+                        help="With --build, store the smallest nprobe reaching this recall@k")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=None, help="nprobe values to check")
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--queries", type=int, default=500)
+    args = parser.parse_args()
+
+    gallery = open_gallery(args.gallery)
+    embeddings = np.asarray(gallery.embeddings, dtype=np.float32)
+    if args.build:
+        index = IVFIndex.build(embeddings, gallery.labels, n_lists=args.lists)
+        index.nprobe, _ = tune_nprobe(index, embeddings, args.target_recall, k=args.k, queries=args.queries)
+        index.save(index_path(args.gallery))
+        print(f"✅ Built '{index_path(args.gallery)}': {index.n_lists} lists, default nprobe {index.nprobe}")
+    else:
+        index = load_index(gallery)
+        if index is None:
+            parser.error(f"No usable index for '{args.gallery}'; use --build")
+
+    nprobes = args.nprobe or sorted({1, max(1, index.nprobe // 2), index.nprobe, min(index.n_lists, index.nprobe * 2)})
+    for r in evaluate_recall(index, embeddings, nprobes, k=args.k, queries=args.queries):
+        print(f"📏 nprobe {r['nprobe']:>4}: recall@{args.k} {r['recall']:.1%}, {r['ms_per_query']:.3f} ms/query "
+              f"(exact {r['exact_ms_per_query']:.3f} ms)")
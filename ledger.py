@@ -0,0 +1,169 @@
+import os
+import csv
+import threading
+from datetime import datetime
+from metrics import METRICS
+
+CSV_HEADER = ['Date', 'Time', 'Enrollment', 'Name']
+
+
+class AttendanceLedger:
+    """
+    Append-only attendance record for one day's CSV file.
+
+    The file is read once on open into a set of enrollment numbers, so
+    "already marked?" is an O(1) exact lookup with no disk I/O. Every new
+    mark is appended and flushed to disk immediately, so a crash loses
+    nothing that was already recognized.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.marked = set()
+        self.records = []  # rows appended by this session
+        self._lock = threading.Lock()
+
+        if os.path.exists(filename):
+            with open(filename, 'r', newline='') as f:
+                for row in csv.DictReader(f):
+                    enroll = (row.get('Enrollment') or '').strip()
+                    if enroll:
+                        self.marked.add(enroll)
+
+        new_file = not os.path.exists(filename) or os.path.getsize(filename) == 0
+        self._file = open(filename, 'a', newline='')
+        self._writer = csv.writer(self._file)
+        if new_file:
+            self._writer.writerow(CSV_HEADER)
+            self._flush()
+
+    def __contains__(self, enroll):
+        return enroll in self.marked
+
+    def __len__(self):
+        return len(self.marked)
+
+    def _flush(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def mark(self, enroll, name, now=None):
+        """
+        Record attendance for `enroll` unless it is already in the ledger.
+        Returns True if a new row was written.
+        """
+        with self._lock:
+            if enroll in self.marked:
+                return False
+            now = now or datetime.now()
+            record = (now.strftime("%Y-%m-%d"), now.strftime("%H:%M:%S"), enroll, name)
+            with METRICS.timer("csv_write"):
+                self._writer.writerow(record)
+                self._flush()
+            self.marked.add(enroll)
+            self.records.append(record)
+            return True
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_attendance(file_path, label_map=None):
+    """
+    Rows (date, time, enrollment, name) of one attendance CSV. Missing
+    fields read as 'Unknown'; a missing name is looked up in `label_map`
+    ({id -> 'enroll_name'}) when given.
+    """
+    rows = []
+    with open(file_path, mode='r', newline='') as file:
+        for row in csv.DictReader(file):
+            date = row.get('Date', 'Unknown')
+            time = row.get('Time', 'Unknown')
+            enrollment = row.get('Enrollment', 'Unknown')
+            name = row.get('Name', 'Unknown')
+
+            # If name is missing, try to get it from label_map
+            if name == 'Unknown' and enrollment != 'Unknown':
+                for label_name in (label_map or {}).values():
+                    if label_name.split('_', 1)[0] == enrollment:
+                        name = label_name.split('_', 1)[1] if '_' in label_name else label_name
+                        break
+
+            rows.append((date, time, enrollment, name))
+    return rows
+
+
+class DailyLedger:
+    """
+    AttendanceLedger that moves to a new file when the date changes.
+
+    `filename_for(day)` names the CSV for a datetime's date. A mark with
+    a later date than the current file moves to that date's file, so a
+    session left running over midnight starts a fresh day without
+    restarting; the previous day's file is closed when the next one
+    opens. The ledger never moves back: a late frame from before the
+    switch is counted in the current day's file.
+    """
+
+    def __init__(self, filename_for, now=None):
+        self.filename_for = filename_for
+        self.records = []  # rows appended by this session, across days
+        self._lock = threading.Lock()
+        self._day = None
+        self._ledger = None
+        self.rollover(now)
+
+    def rollover(self, now=None):
+        """Switch to the file for `now`'s date if it is later than the current one"""
+        with self._lock:
+            return self._rollover(now or datetime.now())
+
+    def _rollover(self, now):
+        if self._day is not None and now.date() <= self._day:
+            return False
+        if self._ledger is not None:
+            self._ledger.close()
+        self._ledger = AttendanceLedger(self.filename_for(now))
+        self._day = now.date()
+        return True
+
+    @property
+    def filename(self):
+        return self._ledger.filename
+
+    def __contains__(self, enroll):
+        return enroll in self._ledger
+
+    def __len__(self):
+        return len(self._ledger)
+
+    def mark(self, enroll, name, now=None):
+        """Record attendance, moving to `now`'s date first if it is a later day; True if new"""
+        now = now or datetime.now()
+        # Held across both steps, so a rollover() from another thread
+        # cannot close the file between them
+        with self._lock:
+            if self._rollover(now):
+                print(f"📅 New day: attendance now goes to '{self.filename}'")
+            if self._ledger.mark(enroll, name, now):
+                self.records.append(self._ledger.records[-1])
+                return True
+            return False
+
+    def close(self):
+        with self._lock:
+            self._ledger.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -3,6 +3,7 @@ from tkinter import ttk, messagebox
 import os
 from PIL import Image, ImageTk
 import webbrowser
+from service_client import ServiceClient, ServiceError
 
 class AttendanceSystem:
     def __init__(self, root):
@@ -150,12 +151,43 @@ class AttendanceSystem:
     def start_recognition(self):
         self.status_var.set("Starting attendance recognition...")
         self.root.update()
+
+        # Use the running recognition service (model already loaded) if there is one
+        client = ServiceClient()
+        if client.is_running():
+            try:
+                session = client.start_session(source="0", duration=15)
+                self.status_var.set(f"Attendance session {session['id']} running (15s)...")
+                self.root.after(1000, self.poll_session, client, session["id"])
+            except (OSError, ServiceError) as e:
+                messagebox.showerror("Error", f"Failed to start recognition: {str(e)}")
+                self.status_var.set("Error during recognition")
+            return
+
         try:
             os.system("python recognize.py")
             self.status_var.set("Attendance recognition completed")
         except Exception as e:
             messagebox.showerror("Error", f"Failed to start recognition: {str(e)}")
             self.status_var.set("Error during recognition")
+
+    def poll_session(self, client, session_id):
+        try:
+            session = client.session(session_id)
+        except (OSError, ServiceError) as e:
+            messagebox.showerror("Error", f"Lost the recognition service: {str(e)}")
+            self.status_var.set("Error during recognition")
+            return
+        if session["running"]:
+            self.status_var.set(f"Attendance session {session_id}: {len(session['marked'])} marked, "
+                                f"{session['fps']} fps")
+            self.root.after(1000, self.poll_session, client, session_id)
+            return
+
+        names = "\n".join(f"{m['name']} ({m['enrollment']})" for m in session["marked"])
+        self.status_var.set("Attendance recognition completed")
+        messagebox.showinfo("Attendance", f"{len(session['marked'])} students marked"
+                            + (f":\n{names}" if names else ""))
     
     def view_records(self):
         self.status_var.set("Viewing attendance records...")
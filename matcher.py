@@ -0,0 +1,102 @@
+import numpy as np
+from gallery import l2_normalize
+
+
+class GalleryMatcher:
+    """
+    Batched k-nearest-neighbour search over an L2-normalized gallery.
+
+    All queries of a batch are answered with one matrix product per block
+    of gallery rows and a partial top-k selection, so there is no per-face
+    classifier call and no refit on startup. For unit vectors the
+    euclidean distance is sqrt(2 - 2 * cosine), so distances match the
+    old KNeighborsClassifier(metric="euclidean") values.
+
+    With an IVF `index` (see ivf.py), search() only scans the rows of the
+    `nprobe` lists closest to each query instead of the whole gallery.
+    """
+
+    def __init__(self, embeddings, labels, k=3, block_rows=65536, index=None, nprobe=None):
+        # float32 memmaps are used in place; float16 galleries are widened
+        # once because numpy has no fast float16 matrix product
+        if embeddings.dtype != np.float32:
+            embeddings = np.asarray(embeddings, dtype=np.float32)
+        self.embeddings = embeddings
+        self.labels = np.asarray(labels, dtype=np.int32)
+        self.k = max(1, min(k, len(self.labels)))
+        self.block_rows = block_rows
+        self.index = index
+        self.nprobe = nprobe
+
+    @classmethod
+    def from_gallery(cls, gallery, k=3, **kwargs):
+        # A prototype gallery has only a few rows per student to vote with
+        k = min(k, gallery.metadata.get("prototypes_per_student", k))
+        return cls(gallery.embeddings, gallery.labels, k=k, **kwargs)
+
+    def __len__(self):
+        return len(self.labels)
+
+    def search(self, queries, k=None):
+        """
+        Return (similarities, indices) of the k nearest gallery rows for
+        each query, both shaped (B, k) and sorted nearest first.
+        """
+        k = self.k if k is None else max(1, min(k, len(self.labels)))
+        queries = l2_normalize(np.atleast_2d(queries))
+        if self.index is not None:
+            return self.index.search(self.embeddings, queries, k, nprobe=self.nprobe)
+
+        best_sims = np.empty((len(queries), 0), dtype=np.float32)
+        best_idx = np.empty((len(queries), 0), dtype=np.int64)
+
+        for start in range(0, len(self.labels), self.block_rows):
+            block = self.embeddings[start:start + self.block_rows]
+            sims = queries @ block.T
+            idx = np.broadcast_to(np.arange(start, start + len(block)), sims.shape)
+
+            # Merge this block's candidates with the running top-k
+            sims = np.concatenate([best_sims, sims], axis=1)
+            idx = np.concatenate([best_idx, idx], axis=1)
+            if sims.shape[1] > k:
+                top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+                sims = np.take_along_axis(sims, top, axis=1)
+                idx = np.take_along_axis(idx, top, axis=1)
+            best_sims, best_idx = sims, idx
+
+        order = np.argsort(-best_sims, axis=1)
+        return np.take_along_axis(best_sims, order, axis=1), np.take_along_axis(best_idx, order, axis=1)
+
+    def match(self, queries):
+        """
+        Identify a batch of query embeddings in one pass.
+
+        Returns three arrays of length B:
+          labels    - majority label among the k nearest rows (ties go to
+                      the label with the nearest row)
+          distances - euclidean distance to the nearest row of that label
+          margins   - (winner votes - runner-up votes) / k, in [0, 1]
+
+        An empty gallery (e.g. a roster with no registered students)
+        answers every query with label -1 at an infinite distance.
+        """
+        queries = np.atleast_2d(queries)
+        if len(queries) == 0 or len(self.labels) == 0:
+            return (np.full(len(queries), -1, dtype=np.int32), np.full(len(queries), np.inf, dtype=np.float32),
+                    np.zeros(len(queries), dtype=np.float32))
+
+        sims, idx = self.search(queries)
+        neighbour_labels = self.labels[idx]                          # (B, k)
+        same = neighbour_labels[:, :, None] == neighbour_labels[:, None, :]
+        votes = same.sum(axis=2)                                     # (B, k)
+
+        # argmax picks the first (= nearest) neighbour among the most voted
+        winner_pos = np.argmax(votes, axis=1)
+        rows = np.arange(len(queries))
+        labels = neighbour_labels[rows, winner_pos]
+        winner_votes = votes[rows, winner_pos]
+        runner_up_votes = np.where(neighbour_labels != labels[:, None], votes, 0).max(axis=1)
+
+        distances = np.sqrt(np.clip(2.0 - 2.0 * sims[rows, winner_pos], 0.0, None))
+        margins = (winner_votes - runner_up_votes) / idx.shape[1]
+        return labels, distances.astype(np.float32), margins.astype(np.float32)
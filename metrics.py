@@ -0,0 +1,206 @@
+import os
+import json
+import time
+import pstats
+import cProfile
+import threading
+from collections import deque
+from contextlib import contextmanager
+import numpy as np
+
+# Prefix of every exported Prometheus metric name
+PROMETHEUS_PREFIX = "face_attendance_"
+
+
+class Summary:
+    """Count, sum and the most recent `window` observations of one quantity"""
+
+    def __init__(self, window=2048):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, value):
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        self.recent.append(value)
+
+    def snapshot(self):
+        p50, p95, p99 = np.percentile(self.recent, [50, 95, 99]) if self.recent else (0.0, 0.0, 0.0)
+        return {"count": self.count, "sum": self.total, "mean": self.total / self.count if self.count else 0.0,
+                "p50": float(p50), "p95": float(p95), "p99": float(p99), "max": self.max}
+
+
+class Metrics:
+    """
+    Process-wide hot-path counters and latency summaries.
+
+    Timers are recorded in seconds under names like 'detect' or
+    'csv_write'; percentiles cover the most recent observations of each.
+    Counters also keep recent event times, for a current rate (e.g. FPS).
+    All methods are thread-safe.
+    """
+
+    def __init__(self, window=2048):
+        self.window = window
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._summaries = {}  # name -> Summary (timers are '<name>_seconds')
+        self._counters = {}   # name -> total
+        self._events = {}     # name -> deque of recent event times
+
+    def observe(self, name, value):
+        with self._lock:
+            summary = self._summaries.get(name)
+            if summary is None:
+                summary = self._summaries[name] = Summary(self.window)
+            summary.observe(value)
+
+    @contextmanager
+    def timer(self, name):
+        """Time the body of a `with` block as '<name>_seconds'"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name + "_seconds", time.perf_counter() - start)
+
+    def count(self, name, n=1):
+        now = time.time()
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+            self._events.setdefault(name, deque(maxlen=100)).append(now)
+
+    def rate(self, name):
+        """Events per second over the last (up to) 100 events of a counter"""
+        with self._lock:
+            events = list(self._events.get(name, ()))
+        if len(events) < 2 or events[-1] <= events[0]:
+            return 0.0
+        return (len(events) - 1) / (events[-1] - events[0])
+
+    def reset(self):
+        with self._lock:
+            self.started = time.time()
+            self._summaries.clear()
+            self._counters.clear()
+            self._events.clear()
+
+    def snapshot(self):
+        """JSON-serializable state of every counter and summary"""
+        with self._lock:
+            summaries = {name: s.snapshot() for name, s in self._summaries.items()}
+            counters = dict(self._counters)
+        uptime = time.time() - self.started
+        return {
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "uptime_seconds": uptime,
+            "fps": self.rate("frames"),
+            "counters": {name: {"total": total, "per_second": total / max(uptime, 1e-9), "rate": self.rate(name)}
+                         for name, total in counters.items()},
+            "summaries": summaries,
+        }
+
+    def prometheus(self):
+        """The snapshot in the Prometheus text exposition format"""
+        snap = self.snapshot()
+        lines = [f"# TYPE {PROMETHEUS_PREFIX}uptime_seconds gauge",
+                 f"{PROMETHEUS_PREFIX}uptime_seconds {snap['uptime_seconds']:.3f}",
+                 f"# TYPE {PROMETHEUS_PREFIX}fps gauge",
+                 f"{PROMETHEUS_PREFIX}fps {snap['fps']:.3f}"]
+        for name, counter in sorted(snap["counters"].items()):
+            lines += [f"# TYPE {PROMETHEUS_PREFIX}{name}_total counter",
+                      f"{PROMETHEUS_PREFIX}{name}_total {counter['total']}"]
+        for name, s in sorted(snap["summaries"].items()):
+            metric = PROMETHEUS_PREFIX + name
+            lines.append(f"# TYPE {metric} summary")
+            lines += [f'{metric}{{quantile="{q}"}} {s[key]:.6g}'
+                      for q, key in (("0.5", "p50"), ("0.95", "p95"), ("0.99", "p99"))]
+            lines += [f"{metric}_sum {s['sum']:.6g}", f"{metric}_count {s['count']}"]
+        return "\n".join(lines) + "\n"
+
+    def format_report(self):
+        """One line per timer: p50/p95/p99 in milliseconds, slowest total first"""
+        snap = self.snapshot()
+        timers = sorted(((name[:-len("_seconds")], s) for name, s in snap["summaries"].items()
+                         if name.endswith("_seconds")), key=lambda item: -item[1]["sum"])
+        lines = [f"⏱️ {name:<10} n={s['count']:<6} p50 {s['p50'] * 1000:7.2f} ms  p95 {s['p95'] * 1000:7.2f} ms  "
+                 f"p99 {s['p99'] * 1000:7.2f} ms  total {s['sum']:.1f}s" for name, s in timers]
+        faces = snap["summaries"].get("faces_per_frame")
+        if faces:
+            lines.append(f"👥 {faces['mean']:.2f} faces per frame (max {faces['max']:.0f}), {snap['fps']:.1f} fps")
+        return lines
+
+
+# Shared by recognize.py, detectors.py, ledger.py and the service
+METRICS = Metrics()
+
+
+def _write_atomic(path, text):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+class MetricsExporter(threading.Thread):
+    """Writes the metrics to a JSON and/or Prometheus text file every `interval` seconds"""
+
+    def __init__(self, json_path=None, prometheus_path=None, interval=10.0, metrics=METRICS):
+        super().__init__(name="metrics", daemon=True)
+        self.json_path = json_path
+        self.prometheus_path = prometheus_path
+        self.interval = interval
+        self.metrics = metrics
+        self._stop_event = threading.Event()
+
+    def write(self):
+        if self.json_path:
+            _write_atomic(self.json_path, json.dumps(self.metrics.snapshot(), indent=2))
+        if self.prometheus_path:
+            _write_atomic(self.prometheus_path, self.metrics.prometheus())
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.write()
+            except OSError as e:
+                print(f"⚠️ Could not write metrics: {e}")
+
+    def stop(self):
+        """Stop the thread and write the final numbers"""
+        self._stop_event.set()
+        if self.is_alive():
+            self.join()
+        self.write()
+
+
+class ProfileCapture:
+    """
+    cProfile for a multi-threaded run: every thread that calls profile()
+    gets its own profiler, and dump() merges them into one .prof file.
+    """
+
+    def __init__(self):
+        self._profiles = []
+        self._lock = threading.Lock()
+
+    def profile(self, func, *args, **kwargs):
+        """Run func(*args, **kwargs) under a new profiler and return its result"""
+        profiler = cProfile.Profile()
+        with self._lock:
+            self._profiles.append(profiler)
+        return profiler.runcall(func, *args, **kwargs)
+
+    def dump(self, path, top=15):
+        """Save the merged stats to `path` and print the top functions by cumulative time"""
+        with self._lock:
+            profiles = list(self._profiles)
+        if not profiles:
+            return
+        stats = pstats.Stats(*profiles)
+        stats.dump_stats(path)
+        print(f"🧪 Profile saved to '{path}' (view with: python -m pstats {path}); top {top} by cumulative time:")
+        stats.sort_stats("cumulative").print_stats(top)
@@ -0,0 +1,85 @@
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    """
+    Cheap frame-differencing gate in front of face detection.
+
+    Each frame is shrunk to a small blurred grayscale thumbnail and
+    compared with the previous one; motion is a share of changed pixels
+    of at least `threshold`. Frames are admitted while there was motion in
+    the last `idle_after` seconds. Once the room is still, the gate goes
+    idle: frames are skipped, callers poll at `idle_fps`, and one frame
+    every `keepalive` seconds is still admitted so a student sitting
+    perfectly still is not missed. The first moving frame switches back
+    to full rate.
+    """
+
+    def __init__(self, threshold=0.002, pixel_delta=20, width=160, idle_after=3.0, idle_fps=2.0, keepalive=5.0):
+        self.threshold = threshold
+        self.pixel_delta = pixel_delta
+        self.width = width
+        self.idle_after = idle_after
+        self.idle_fps = idle_fps
+        self.keepalive = keepalive
+
+        self.reference = None
+        self.last_motion = None
+        self.last_admitted = None
+        self.last_ts = None
+
+        # Counters for the end-of-session report
+        self.frames = 0
+        self.skipped = 0
+        self.idle_time = 0.0
+        self.total_time = 0.0
+
+    def _thumbnail(self, frame):
+        height, width = frame.shape[:2]
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        small = cv2.resize(gray, (self.width, max(1, height * self.width // width)), interpolation=cv2.INTER_AREA)
+        return cv2.GaussianBlur(small, (5, 5), 0)
+
+    def motion(self, frame):
+        """Share of pixels that changed since the previous frame (1.0 for the first one)"""
+        thumb = self._thumbnail(frame)
+        changed = 1.0 if self.reference is None else float(
+            np.mean(cv2.absdiff(thumb, self.reference) > self.pixel_delta))
+        self.reference = thumb
+        return changed
+
+    @property
+    def idle(self):
+        return self.last_motion is None or self.last_ts - self.last_motion > self.idle_after
+
+    @property
+    def poll_delay(self):
+        """Seconds a live capture loop should wait before its next frame"""
+        return 1.0 / self.idle_fps if self.idle and self.idle_fps > 0 else 0.0
+
+    def admit(self, frame, ts):
+        """True if the frame should go on to detection and embedding"""
+        if self.last_ts is not None:
+            elapsed = max(0.0, ts - self.last_ts)
+            self.total_time += elapsed
+            if self.idle:
+                self.idle_time += elapsed
+        self.last_ts = ts
+        self.frames += 1
+
+        if self.motion(frame) >= self.threshold:
+            self.last_motion = ts
+        if not self.idle or self.last_admitted is None or ts - self.last_admitted >= self.keepalive:
+            self.last_admitted = ts
+            return True
+        self.skipped += 1
+        return False
+
+    @property
+    def skipped_fraction(self):
+        return self.skipped / self.frames if self.frames else 0.0
+
+    @property
+    def idle_fraction(self):
+        return self.idle_time / self.total_time if self.total_time else 0.0
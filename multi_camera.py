@@ -0,0 +1,300 @@
+import os
+import json
+import time
+import queue
+import argparse
+import threading
+from datetime import datetime
+from gallery import GALLERY_FILE, PROTOTYPES_FILE, gallery_exists
+from batcher import EmbeddingBatcher
+from pipeline import DropOldestQueue, Stage
+from ledger import DailyLedger
+from detectors import DETECTOR_BACKENDS
+from sources import open_source
+from roster import roster_path
+from quality import load_pose_predictor
+from metrics import METRICS, MetricsExporter
+from recognize import FaceRecognizer, RecognitionSession, attendance_dir
+
+
+def parse_sources(specs, config=None, sections=None):
+    """
+    Return [(room, source_spec, section)] from ROOM=SPEC strings and/or a
+    JSON config file holding [{"room": ..., "source": ..., "section": ...}].
+    `sections` are ROOM=SECTION strings; a room without one matches the
+    whole gallery.
+    """
+    sources = []
+    if config:
+        with open(config) as f:
+            for entry in json.load(f):
+                sources.append((str(entry["room"]), str(entry["source"]), entry.get("section")))
+    for spec in specs or []:
+        room, sep, source = spec.partition("=")
+        if not sep:
+            room, source = f"cam{len(sources)}", spec
+        sources.append((room, source, None))
+
+    by_room = dict(s.split("=", 1) for s in sections or [])
+    sources = [(room, source, by_room.pop(room, section)) for room, source, section in sources]
+    if by_room:
+        raise ValueError(f"Sections given for unknown rooms: {', '.join(sorted(by_room))}")
+
+    rooms = [room for room, _, _ in sources]
+    duplicates = sorted({room for room in rooms if rooms.count(room) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate room names: {', '.join(duplicates)}")
+    return sources
+
+
+def room_filename(room, day=None):
+    """Per-room attendance CSV, e.g. attendance/attendance_2024-05-01_B204.csv"""
+    day = (day or datetime.now()).strftime("%Y-%m-%d")
+    return os.path.join(attendance_dir, f"attendance_{day}_{room}.csv")
+
+
+class Camera:
+    """
+    One source: its capture thread, latest-frame slot, session and ledger.
+
+    Recorded sources (video files, frame folders) are read at their own
+    frame rate, so they behave like a camera replaying the recording.
+    """
+
+    def __init__(self, room, spec, session, ledger, stop_event):
+        self.room = room
+        self.spec = spec
+        self.session = session
+        self.ledger = ledger
+        self.cap = open_source(spec)
+        self.frames = DropOldestQueue(1)  # Only the newest frame is ever processed
+        self.capture = Stage(f"capture-{room}", self._read, None, self.frames, stop_event)
+        self.started = None
+
+    def _read(self):
+        with METRICS.timer("capture"):
+            ret, frame, ts = self.cap.read()
+        if not ret:
+            if self.cap.live:
+                print(f"❌ [{self.room}] Failed to read from '{self.spec}'.")
+            else:
+                print(f"🏁 [{self.room}] End of '{self.spec}'.")
+            return StopIteration
+        if not self.cap.live:
+            self.started = self.started or time.time() - ts
+            time.sleep(max(0.0, self.started + ts - time.time()))
+        now = time.time()
+        if not self.session.admit(frame, now):
+            time.sleep(self.session.poll_delay)  # Idle room: poll slowly, skip detection
+            return None
+        return frame, now
+
+    @property
+    def done(self):
+        return self.capture.finished.is_set() and not len(self.frames)
+
+
+def run_cameras(sources, gallery_path=GALLERY_FILE, workers=None, duration=None, status_interval=10.0,
+                batch_size=32, batch_frames=None, batch_delay=0.05, embedder="keras", **session_options):
+    """
+    Recognize faces from several sources in one process.
+
+    The FaceNet model, gallery and embedding batcher are loaded once and
+    shared. Each source has its own capture thread, tracker and per-room
+    attendance CSV (a new one each day). `workers` threads take cameras round-robin from a
+    FIFO queue and process each one's newest frame, so a busy room cannot
+    starve a quiet one and stale frames are dropped rather than queued.
+    """
+    if not gallery_exists(gallery_path):
+        print("❌ Model files not found. Run train_model.py first.")
+        return
+
+    recognizer = FaceRecognizer(gallery_path, embedder)
+
+    # ✅ One batcher for all rooms: crops from several cameras share a forward pass
+    batcher = EmbeddingBatcher(recognizer, max_batch_size=batch_size,
+                               max_frames=batch_frames or len(sources), max_delay=batch_delay)
+
+    stop_event = threading.Event()
+    cameras = []
+    for room, spec, section in sources:
+        ledger = DailyLedger(lambda day, room=room: room_filename(room, day))
+        session = RecognitionSession(recognizer, ledger, batcher=batcher, name=room, section=section,
+                                     **session_options)
+        camera = Camera(room, spec, session, ledger, stop_event)
+        if not camera.cap.isOpened():
+            print(f"⚠️ [{room}] Could not open '{spec}', skipping.")
+            ledger.close()
+            continue
+        cameras.append(camera)
+
+    if not cameras:
+        print("❌ No camera could be opened.")
+        return
+
+    ready = queue.Queue()
+    for camera in cameras:
+        ready.put(camera)
+
+    def worker():
+        while not stop_event.is_set():
+            try:
+                camera = ready.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            item = camera.frames.get(timeout=0.01)
+            if item is not None:
+                frame, ts = item
+                try:
+                    camera.session.process_frame(frame, ts)
+                except Exception as e:
+                    print(f"⚠️ [{camera.room}] Error processing frame: {e}")
+            if not camera.done:
+                ready.put(camera)
+
+    workers = workers or min(len(cameras), os.cpu_count() or 1)
+    threads = [threading.Thread(target=worker, name=f"worker-{i}", daemon=True) for i in range(workers)]
+
+    print(f"\n📸 Recognizing {len(cameras)} sources with {workers} workers"
+          + (f" for {duration} seconds" if duration else " (Ctrl+C to stop)") + "...\n")
+
+    start_time = time.time()
+    for camera in cameras:
+        camera.capture.start()
+    for thread in threads:
+        thread.start()
+
+    next_status = start_time + status_interval
+    try:
+        while not all(camera.done for camera in cameras):
+            if duration and time.time() - start_time >= duration:
+                break
+            time.sleep(0.1)
+            if status_interval and time.time() >= next_status:
+                next_status += status_interval
+                elapsed = time.time() - start_time
+                print("📊 " + " | ".join(f"{c.room}: {c.session.frames / elapsed:.1f} fps, "
+                                         f"{len(c.ledger.records)} marked"
+                                         + ("" if c.session.gate is None else
+                                            f", {c.session.gate.skipped_fraction:.0%} skipped")
+                                         for c in cameras))
+    except KeyboardInterrupt:
+        print("\n🛑 Stopping...")
+
+    stop_event.set()
+    for thread in threads + [camera.capture for camera in cameras]:
+        thread.join(timeout=2.0)
+
+    # ✅ Embed what is still batched, then deliver every room its last votes
+    for camera in cameras:
+        camera.session.finish()
+
+    elapsed = time.time() - start_time
+    print(f"\n🧮 {batcher.crops} faces embedded in {batcher.calls} calls "
+          f"(mean batch size {batcher.mean_batch_size:.1f})")
+    for camera in cameras:
+        camera.cap.release()
+        camera.ledger.close()
+        session = camera.session
+        print(f"✅ [{camera.room}] {session.frames} frames ({session.frames / max(elapsed, 1e-9):.1f} fps, "
+              f"{camera.frames.dropped} dropped), tracking skipped {session.tracker.embeddings_saved} "
+              f"of {session.tracker.faces_seen} faces; {len(camera.ledger.records)} new, "
+              f"{len(camera.ledger)} total in '{camera.ledger.filename}'"
+              + ("" if session.gate is None else
+                 f"; motion gate skipped {session.gate.skipped_fraction:.0%} of frames")
+              + ("" if session.quality is None else
+                 f"; quality gate skipped {session.quality.skipped} of {session.quality.checked} crops"))
+    for line in METRICS.format_report():
+        print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mark attendance from several cameras in one process")
+    parser.add_argument("--source", action="append", default=[], metavar="ROOM=SPEC",
+                        help="Room name and camera index, stream URL or video file (repeatable)")
+    parser.add_argument("--config", default=None,
+                        help='JSON file with [{"room": "B204", "source": "rtsp://...", "section": "CS101-A"}, ...]')
+    parser.add_argument("--section", action="append", default=[], metavar="ROOM=SECTION",
+                        help="Only match the students on this section's roster in that room (repeatable)")
+    parser.add_argument("--roster-fallback", action="store_true",
+                        help="Also search the full gallery for faces not on a room's roster")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Threads processing frames (default: one per source, up to the CPU count)")
+    parser.add_argument("--duration", type=float, default=None,
+                        help="Seconds to run for (default: until Ctrl+C or every source ends)")
+    parser.add_argument("--status-every", type=float, default=10.0,
+                        help="Seconds between per-room status lines (0 to disable)")
+    parser.add_argument("--prototypes", action="store_true",
+                        help=f"Match against the compressed '{PROTOTYPES_FILE}' gallery")
+    parser.add_argument("--gallery", default=None, help="Gallery file to match against")
+    parser.add_argument("--embedder", default="keras",
+                        help="Embedding backend: keras, tflite[:float16|dynamic|int8|path] or stub")
+    parser.add_argument("--batch-size", type=int, default=32,
+                        help="Maximum number of faces per embeddings() call")
+    parser.add_argument("--batch-frames", type=int, default=None,
+                        help="Collect faces from up to this many frames before embedding (default: one per source)")
+    parser.add_argument("--batch-delay-ms", type=float, default=50,
+                        help="Maximum time a face waits for its batch to fill")
+    parser.add_argument("--min-votes", type=int, default=2,
+                        help="Matching recognitions needed before a tracked face is identified")
+    parser.add_argument("--reverify", type=float, default=5.0,
+                        help="Seconds between re-verifications of an identified face")
+    parser.add_argument("--detect-scale", type=float, default=0.5,
+                        help="Run face detection on a frame resized by this factor")
+    parser.add_argument("--full-scan-every", type=int, default=10,
+                        help="Frames between full-frame scans; others only search around known faces")
+    parser.add_argument("--motion-gate", action="store_true",
+                        help="Skip detection in rooms where nothing moves, polling those cameras slowly")
+    parser.add_argument("--motion-threshold", type=float, default=0.002,
+                        help="Share of changed pixels that counts as motion")
+    parser.add_argument("--idle-fps", type=float, default=2.0,
+                        help="Frames per second read from an idle camera")
+    parser.add_argument("--quality-gate", action="store_true",
+                        help="Don't embed small, blurred or badly exposed faces; their track waits for a better frame")
+    parser.add_argument("--min-face", type=int, default=40,
+                        help="With --quality-gate: smallest face (pixels) worth embedding")
+    parser.add_argument("--min-sharpness", type=float, default=40.0,
+                        help="With --quality-gate: minimum Laplacian variance of a face crop")
+    parser.add_argument("--max-yaw", type=float, default=None,
+                        help="With --quality-gate, also skip faces turned away: nose offset from the face centre, "
+                             "e.g. 0.15 (needs dlib)")
+    parser.add_argument("--detector", choices=DETECTOR_BACKENDS, default="haar",
+                        help="Face detector backend (see benchmark_detectors.py)")
+    parser.add_argument("--metrics-json", default=None,
+                        help="Write per-stage counters and p50/p95/p99 latencies to this JSON file")
+    parser.add_argument("--metrics-prom", default=None, help="Write the same metrics in Prometheus text format")
+    parser.add_argument("--metrics-every", type=float, default=10.0, help="Seconds between metrics file updates")
+    args = parser.parse_args()
+
+    try:
+        sources = parse_sources(args.source, args.config, args.section)
+        for _, _, section in sources:
+            if section:
+                roster_path(section)
+    except (OSError, ValueError, KeyError) as e:
+        parser.error(f"Invalid sources: {e}")
+    if not sources:
+        parser.error("Give at least one --source ROOM=SPEC or a --config file")
+    if args.max_yaw is not None and args.quality_gate:
+        try:
+            load_pose_predictor()
+        except RuntimeError as e:
+            parser.error(str(e))
+
+    exporter = None
+    if args.metrics_json or args.metrics_prom:
+        exporter = MetricsExporter(args.metrics_json, args.metrics_prom, interval=args.metrics_every)
+        exporter.start()
+
+    run_cameras(sources, gallery_path=args.gallery or (PROTOTYPES_FILE if args.prototypes else GALLERY_FILE),
+                workers=args.workers, duration=args.duration, status_interval=args.status_every,
+                batch_size=args.batch_size, batch_frames=args.batch_frames,
+                batch_delay=args.batch_delay_ms / 1000.0, embedder=args.embedder, min_votes=args.min_votes,
+                reverify_interval=args.reverify, detect_scale=args.detect_scale,
+                full_scan_interval=args.full_scan_every, detector=args.detector,
+                roster_fallback=args.roster_fallback, motion_gate=args.motion_gate,
+                motion_threshold=args.motion_threshold, idle_fps=args.idle_fps,
+                quality_gate=args.quality_gate, min_face=args.min_face,
+                min_sharpness=args.min_sharpness, max_yaw=args.max_yaw)
+    if exporter is not None:
+        exporter.stop()
@@ -0,0 +1,159 @@
+import time
+import queue
+import threading
+from collections import deque
+
+
+class DropOldestQueue:
+    """
+    Bounded queue that never blocks the producer: when it is full the
+    oldest item is discarded, so consumers always work on recent frames.
+    """
+
+    def __init__(self, maxsize=1):
+        self._queue = queue.Queue(maxsize=max(1, maxsize))
+        self.maxsize = max(1, maxsize)
+        self.dropped = 0
+
+    def put(self, item):
+        while True:
+            try:
+                self._queue.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout=None):
+        """Return the next item, or None if nothing arrives within `timeout`"""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def __len__(self):
+        return self._queue.qsize()
+
+
+class Stage(threading.Thread):
+    """
+    One pipeline stage running on its own thread.
+
+    With an inbox, `func(item)` is called for every item taken from it;
+    without one (a source stage), `func()` is called in a loop. Results
+    other than None go to the outbox. A source returning StopIteration
+    finishes; downstream stages then drain their inbox and finish too.
+    """
+
+    def __init__(self, name, func, inbox=None, outbox=None, stop_event=None, upstream=None, profiler=None):
+        super().__init__(name=name, daemon=True)
+        self.func = func
+        self.inbox = inbox
+        self.outbox = outbox
+        self.stop_event = stop_event or threading.Event()
+        self.upstream = upstream
+        self.finished = threading.Event()
+        self.profiler = profiler  # metrics.ProfileCapture, for --profile runs
+
+        self.processed = 0
+        self.busy_time = 0.0
+        self._completions = deque(maxlen=30)
+
+    def run(self):
+        try:
+            if self.profiler is not None:
+                self.profiler.profile(self._loop)
+            else:
+                self._loop()
+        finally:
+            self.finished.set()
+
+    def _loop(self):
+        while not self.stop_event.is_set():
+            if self.inbox is not None:
+                item = self.inbox.get(timeout=0.1)
+                if item is None:
+                    if self.upstream is not None and self.upstream.finished.is_set() and not len(self.inbox):
+                        break
+                    continue
+
+            start = time.time()
+            try:
+                result = self.func(item) if self.inbox is not None else self.func()
+            except Exception as e:
+                print(f"⚠️ Error in {self.name} stage: {e}")
+                continue
+            end = time.time()
+
+            if result is StopIteration:
+                break
+
+            self.processed += 1
+            self.busy_time += end - start
+            self._completions.append(end)
+
+            if result is not None and self.outbox is not None:
+                self.outbox.put(result)
+
+    @property
+    def fps(self):
+        """Items per second over the last few completions"""
+        if len(self._completions) < 2:
+            return 0.0
+        span = self._completions[-1] - self._completions[0]
+        return (len(self._completions) - 1) / span if span > 0 else 0.0
+
+    @property
+    def mean_ms(self):
+        return self.busy_time / self.processed * 1000 if self.processed else 0.0
+
+
+class Pipeline:
+    """A chain of Stages connected by DropOldestQueues"""
+
+    def __init__(self, profiler=None):
+        self.stages = []
+        self.stop_event = threading.Event()
+        self.profiler = profiler
+
+    def add_stage(self, name, func, inbox=None, queue_depth=2):
+        """Append a stage and return its outbox for the next stage to read"""
+        outbox = DropOldestQueue(queue_depth)
+        upstream = self.stages[-1] if self.stages and inbox is not None else None
+        self.stages.append(Stage(name, func, inbox, outbox, self.stop_event, upstream, self.profiler))
+        return outbox
+
+    def start(self):
+        for stage in self.stages:
+            stage.start()
+
+    def stop(self, timeout=2.0):
+        self.stop_event.set()
+        for stage in self.stages:
+            stage.join(timeout=timeout)
+
+    @property
+    def running(self):
+        """False once stopped, or once every stage has finished"""
+        return not self.stop_event.is_set() and not all(s.finished.is_set() for s in self.stages)
+
+    def stats(self):
+        """Per-stage FPS, mean latency, outbox depth and dropped items"""
+        return [{
+            "stage": stage.name,
+            "fps": stage.fps,
+            "mean_ms": stage.mean_ms,
+            "processed": stage.processed,
+            "queue_depth": len(stage.outbox),
+            "queue_size": stage.outbox.maxsize,
+            "dropped": stage.outbox.dropped,
+        } for stage in self.stages]
+
+    def format_stats(self):
+        """One short line per stage, e.g. 'detect 24.0fps 12.3ms q1/2 drop5'"""
+        return [f"{s['stage']} {s['fps']:.1f}fps {s['mean_ms']:.1f}ms "
+                f"q{s['queue_depth']}/{s['queue_size']} drop{s['dropped']}"
+                for s in self.stats()]
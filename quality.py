@@ -0,0 +1,125 @@
+import os
+from collections import Counter
+import cv2
+import numpy as np
+
+# Every crop is resized to this square before scoring, so the sharpness
+# and exposure thresholds mean the same thing for near and far faces
+SCORE_SIZE = 64
+
+# dlib's 68-point landmark model, downloaded separately (bz2-compressed)
+PREDICTOR_FILE = "shape_predictor_68_face_landmarks.dat"
+PREDICTOR_URL = "http://dlib.net/files/shape_predictor_68_face_landmarks.dat.bz2"
+
+
+def load_pose_predictor(path=PREDICTOR_FILE):
+    try:
+        import dlib
+    except ImportError:
+        raise RuntimeError("The pose check needs dlib (pip install dlib)")
+    if not os.path.exists(path):
+        raise RuntimeError(f"The pose check needs '{path}' (download and unpack {PREDICTOR_URL})")
+    return dlib, dlib.shape_predictor(path)
+
+
+class QualityGate:
+    """
+    Scores face crops before they are embedded and rejects the ones
+    unlikely to give a usable embedding: too small, blurred (low variance
+    of the Laplacian), too dark or bright, flat (low contrast) and,
+    optionally, turned away from the camera.
+
+    All crops of a frame are scored together on one stacked array. The
+    pose check needs dlib landmarks, so it only runs on the crops that
+    passed the cheap checks. A rejected face keeps its track undecided,
+    so it is simply retried on a later frame.
+    """
+
+    def __init__(self, min_size=40, min_sharpness=40.0, min_brightness=40.0, max_brightness=220.0,
+                 min_contrast=15.0, max_yaw=None):
+        self.min_size = min_size
+        self.min_sharpness = min_sharpness
+        self.min_brightness = min_brightness
+        self.max_brightness = max_brightness
+        self.min_contrast = min_contrast
+        self.max_yaw = max_yaw
+        if max_yaw is not None:
+            self.dlib, self.predictor = load_pose_predictor()
+
+        # Counters for the end-of-session report
+        self.checked = 0
+        self.rejected = Counter()  # reason -> crops
+
+    @staticmethod
+    def _crop(frame, box):
+        """Grayscale SCORE_SIZE square of one box (all zeros if it is empty)"""
+        x, y, w, h = box
+        crop = frame[max(0, y):max(0, y + h), max(0, x):max(0, x + w)]
+        if crop.size == 0:
+            return np.zeros((SCORE_SIZE, SCORE_SIZE), dtype=np.uint8)
+        if crop.ndim == 3:
+            crop = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+        return cv2.resize(crop, (SCORE_SIZE, SCORE_SIZE), interpolation=cv2.INTER_AREA)
+
+    def scores(self, frame, boxes):
+        """
+        Quality measures for each (x, y, w, h) box of a BGR or grayscale
+        frame, as a dict of arrays: size, sharpness, brightness and contrast.
+        """
+        boxes = np.asarray(boxes, dtype=np.int64).reshape(-1, 4)
+        crops = np.stack([self._crop(frame, box) for box in boxes]).astype(np.float32)
+
+        # 4-neighbour Laplacian of every crop at once (borders excluded)
+        lap = (crops[:, :-2, 1:-1] + crops[:, 2:, 1:-1] + crops[:, 1:-1, :-2] + crops[:, 1:-1, 2:]
+               - 4.0 * crops[:, 1:-1, 1:-1])
+        return {
+            "size": np.minimum(boxes[:, 2], boxes[:, 3]),
+            "sharpness": lap.reshape(len(crops), -1).var(axis=1),
+            "brightness": crops.mean(axis=(1, 2)),
+            "contrast": crops.std(axis=(1, 2)),
+        }
+
+    def check(self, frame, boxes):
+        """Return a boolean array, True for the boxes worth embedding"""
+        if len(boxes) == 0:
+            return np.zeros(0, dtype=bool)
+        s = self.scores(frame, boxes)
+        failures = [
+            ("small", s["size"] < self.min_size),
+            ("blurred", s["sharpness"] < self.min_sharpness),
+            ("dark", s["brightness"] < self.min_brightness),
+            ("bright", s["brightness"] > self.max_brightness),
+            ("flat", s["contrast"] < self.min_contrast),
+        ]
+
+        ok = np.ones(len(boxes), dtype=bool)
+        for reason, failed in failures:
+            # Each rejected crop is counted once, under its first failed check
+            self.rejected[reason] += int(np.sum(failed & ok))
+            ok &= ~failed
+        if self.max_yaw is not None:
+            for i in np.flatnonzero(ok):
+                if self.yaw(frame, boxes[i]) > self.max_yaw:
+                    self.rejected["turned"] += 1
+                    ok[i] = False
+        self.checked += len(boxes)
+        return ok
+
+    def yaw(self, frame, box):
+        """
+        How far the nose tip sits from the middle of the jaw line, as a
+        share of the face width: about 0 for a frontal face, 0.5 in profile.
+        """
+        x, y, w, h = (int(v) for v in box)
+        shape = self.predictor(frame, self.dlib.rectangle(x, y, x + w, y + h))
+        left, right, nose = shape.part(0).x, shape.part(16).x, shape.part(30).x
+        return abs((nose - left) / max(right - left, 1) - 0.5)
+
+    @property
+    def skipped(self):
+        return sum(self.rejected.values())
+
+    def format_report(self):
+        reasons = ", ".join(f"{reason} {count}" for reason, count in self.rejected.most_common() if count)
+        return (f"🧹 Quality gate: skipped {self.skipped} of {self.checked} crops "
+                f"({self.skipped / self.checked if self.checked else 0.0:.0%})" + (f": {reasons}" if reasons else ""))
@@ -1,153 +1,636 @@
 import cv2
 import os
-import csv
-import json
 import time
+import signal
+import threading
+import argparse
+from collections import deque
 import numpy as np
 from datetime import datetime
-from keras_facenet import FaceNet
-from sklearn.neighbors import KNeighborsClassifier
+from embedders import create_embedder, embedder_family
+from gallery import GALLERY_FILE, PROTOTYPES_FILE, gallery_exists, open_gallery, read_label_map
+from matcher import GalleryMatcher
+from ivf import load_index
+from motion import MotionGate
+from quality import QualityGate, load_pose_predictor
+from roster import load_roster, roster_label_ids, roster_path
+from batcher import EmbeddingBatcher
+from pipeline import Pipeline
+from tracker import FaceTracker
+from ledger import AttendanceLedger, DailyLedger
+from metrics import METRICS, MetricsExporter, ProfileCapture
+from detectors import DETECTOR_BACKENDS, AdaptiveDetector, create_detector
+from sources import open_source
 
 # Create attendance directory if it doesn't exist
 attendance_dir = "attendance"
 os.makedirs(attendance_dir, exist_ok=True)
 
 def load_label_map():
-    with open("label_map.json", "r") as f:
-        data = json.load(f)
     # Reverse mapping {int_id -> label_str}
-    return {int(v): k for k, v in data.items()}
+    return read_label_map()
 
-def get_today_filename():
-    today = datetime.now().strftime("%Y-%m-%d")
+def get_today_filename(day=None):
+    today = (day or datetime.now()).strftime("%Y-%m-%d")
     return os.path.join(attendance_dir, f"attendance_{today}.csv")
 
-def already_marked_today(enroll, filename):
-    if not os.path.exists(filename):
-        return False
-    with open(filename, 'r') as f:
-        for line in f.readlines():
-            if enroll in line:
-                return True
-    return False
+# ✅ Threshold for unknown, unless calibrate.py stored one in the gallery
+MATCH_THRESHOLD = 0.9
 
-def recognize_faces():
-    # ✅ Check model files
-    if not (os.path.exists("faces_embeddings.npy") and 
-            os.path.exists("faces_labels.npy") and 
-            os.path.exists("label_map.json")):
-        print("❌ Model files not found. Run train_model.py first.")
-        return
+def load_thresholds(metadata):
+    """(global, {label_id -> threshold}) from a gallery's metadata (see calibrate.py)"""
+    calibrated = (metadata or {}).get("thresholds") or {}
+    per_label = {int(k): float(v) for k, v in calibrated.get("per_student", {}).items()}
+    return float(calibrated.get("global", MATCH_THRESHOLD)), per_label
 
-    # ✅ Load embeddings & labels
-    faces_embeddings = np.load("faces_embeddings.npy", allow_pickle=True)
-    faces_labels = np.load("faces_labels.npy", allow_pickle=True)
-    label_map = load_label_map()
+def match_labels(matcher, label_map, embeddings, threshold=MATCH_THRESHOLD, per_label=None):
+    """Return (label or "Unknown", distance, margin) for each embedding of a batch"""
+    pred_ids, distances, margins = matcher.match(embeddings)
+    per_label = per_label or {}
+    return [(label_map.get(int(pred_id), "Unknown") if distance < per_label.get(int(pred_id), threshold)
+             else "Unknown", float(distance), float(margin))
+            for pred_id, distance, margin in zip(pred_ids, distances, margins)]
 
-    print(f"🔍 Loaded {len(faces_embeddings)} embeddings for {len(set(faces_labels))} classes")
+def identify(matcher, label_map, embeddings, threshold=MATCH_THRESHOLD, per_label=None):
+    """Return a label (or "Unknown") for each embedding of a batch"""
+    return [label for label, _, _ in match_labels(matcher, label_map, embeddings, threshold, per_label)]
 
-    # ✅ Train KNN classifier
-    knn = KNeighborsClassifier(n_neighbors=3, metric="euclidean")
-    knn.fit(list(faces_embeddings), list(faces_labels))
+def label_overlay(label):
+    """Split a label into (enroll, name) and pick its overlay text and colour"""
+    if label == "Unknown":
+        return None, None, "Unknown", (0, 0, 255)
+    try:
+        enroll, name = label.split('_', 1)
+    except ValueError:
+        enroll, name = "???", "Unknown"
+    return enroll, name, f"{name} ({enroll})", (0, 255, 0)
 
-    # ✅ Load FaceNet model
-    embedder = FaceNet()
+class FaceRecognizer:
+    """
+    Gallery, matcher and FaceNet model, loaded once and shared by every
+    session. embeddings() may be called from several threads; calls into
+    the model are serialized.
+    """
 
-    # ✅ Haar cascade for face detection
-    face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+    def __init__(self, gallery_path=GALLERY_FILE, embedder="keras", nprobe=None, exact=False):
+        # ✅ Load embeddings & labels (memory-mapped from the gallery file)
+        self.gallery = open_gallery(gallery_path)
+        self.label_map = self.gallery.label_names
 
-    cap = cv2.VideoCapture(0)
-    attendance = {}
-    filename = get_today_filename()
+        print(f"🔍 Loaded {len(self.gallery)} embeddings for {self.gallery.class_count} classes")
 
-    if not os.path.exists(filename):
-        with open(filename, 'w', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow(['Date', 'Time', 'Enrollment', 'Name'])
+        # ✅ Distance thresholds calibrated on this gallery, if any
+        self.threshold, self.per_label = load_thresholds(self.gallery.metadata)
+        if "thresholds" in self.gallery.metadata:
+            print(f"🎯 Calibrated threshold {self.threshold:.3f}"
+                  + (f", {len(self.per_label)} per-student thresholds" if self.per_label else ""))
 
-    print("\n📸 Starting FaceNet recognition. Will run for 15 seconds...\n")
+        # ✅ Nearest-neighbour matcher over the normalized gallery (no fitting needed),
+        # through the IVF index when train_model.py built one
+        index = None if exact else load_index(self.gallery)
+        self.matcher = GalleryMatcher.from_gallery(self.gallery, k=3, index=index, nprobe=nprobe)
+        if index is not None:
+            print(f"🗂️ Using IVF index: {index.n_lists} lists, nprobe {nprobe or index.nprobe}")
 
-    start_time = time.time()
-    end_time = start_time + 15
+        # ✅ Load the FaceNet model (Keras, or an exported TFLite model; see embedders.py)
+        self.embedder = create_embedder(embedder)
+        built_with = self.gallery.metadata.get("embedder", "keras")
+        if embedder_family(built_with) != embedder_family(self.embedder.name):
+            print(f"⚠️ Gallery was built with '{built_with}' but recognizing with '{self.embedder.name}'; "
+                  f"distances are not comparable. Re-run train_model.py --embedder {embedder}")
+        elif built_with != self.embedder.name:
+            print(f"ℹ️ Gallery built with '{built_with}', recognizing with '{self.embedder.name}' "
+                  f"(check the drift with verify_embedders.py)")
+        self._embed_lock = threading.Lock()
+
+    def embeddings(self, crops):
+        """FaceNet embeddings for a list of RGB face crops"""
+        with self._embed_lock, METRICS.timer("embed"):
+            METRICS.count("embeddings", len(crops))
+            return self.embedder.embeddings(crops)
+
+    def identify(self, embeddings):
+        return identify(self.matcher, self.label_map, embeddings, self.threshold, self.per_label)
+
+    def match(self, embeddings):
+        return match_labels(self.matcher, self.label_map, embeddings, self.threshold, self.per_label)
+
+class RosterMatcher:
+    """
+    Matches faces against one section's students only: a small in-memory
+    slice of the gallery, so lookups are cheap and students of other
+    sections cannot be mistaken for them. With `fallback`, faces that
+    match nobody on the roster are searched in the full gallery too, and
+    such unexpected attendees are reported once each.
+    """
+
+    def __init__(self, recognizer, section, fallback=False):
+        enrollments = load_roster(section)
+        label_ids, missing = roster_label_ids(recognizer.gallery.label_map, enrollments)
+        self.gallery = recognizer.gallery.subset(label_ids)
+        self.label_map = recognizer.label_map
+        self.threshold, self.per_label = recognizer.threshold, recognizer.per_label
+        self.matcher = GalleryMatcher.from_gallery(self.gallery, k=3)
+        self.fallback = recognizer if fallback else None
+        self.section = section
+        self.unexpected = set()
+
+        print(f"📋 Section '{section}': {self.gallery.class_count} of {len(enrollments)} students "
+              f"on the roster ({len(self.gallery)} embeddings)")
+        if missing:
+            print(f"⚠️ Not registered: {', '.join(missing)}")
+        if len(self.gallery) == 0:
+            print("⚠️ Nobody on this roster is registered; every face is "
+                  + ("searched in the full gallery" if fallback else "Unknown"))
+
+    def match(self, embeddings):
+        results = match_labels(self.matcher, self.label_map, embeddings, self.threshold, self.per_label)
+        if self.fallback is None:
+            return results
+
+        unknown = [i for i, (label, _, _) in enumerate(results) if label == "Unknown"]
+        if unknown:
+            for i, result in zip(unknown, self.fallback.match(np.asarray(embeddings)[unknown])):
+                results[i] = result
+                if result[0] != "Unknown" and result[0] not in self.unexpected:
+                    self.unexpected.add(result[0])
+                    print(f"❗ {result[0]} is not on the roster of section '{self.section}'")
+        return results
+
+    def identify(self, embeddings):
+        return [label for label, _, _ in self.match(embeddings)]
+
+class RecognitionSession:
+    """
+    Per-source recognition state: detector, tracker, embedding batcher
+    and attendance ledger.
+
+    Frames flow through detect() -> embed() -> record() as (frame, ts)
+    items, where ts is the frame time in epoch seconds. The live mode runs
+    each step on its own pipeline thread; process_frame() runs them
+    back to back for offline input.
+
+    Several sessions may share one batcher (see multi_camera.py): crops
+    are tagged with their session, and each result is delivered to its
+    session's inbox and voted in the next time that session runs.
+    """
+
+    def __init__(self, recognizer, ledger, detector="haar", detect_scale=0.5, full_scan_interval=10,
+                 batch_size=32, batch_frames=1, batch_delay=0.05, min_votes=2, reverify_interval=5.0,
+                 batcher=None, name="camera", section=None, roster_fallback=False,
+                 motion_gate=False, motion_threshold=0.002, idle_fps=2.0,
+                 quality_gate=False, min_face=40, min_sharpness=40.0, max_yaw=None):
+        self.recognizer = recognizer
+        self.ledger = ledger
+        self.name = name
+
+        # ✅ Optionally skip detection entirely while nothing in the room moves
+        self.gate = MotionGate(threshold=motion_threshold, idle_fps=idle_fps) if motion_gate else None
+
+        # ✅ Don't spend an embedding on tiny, blurred, badly exposed (or turned) faces
+        self.quality = QualityGate(min_size=min_face, min_sharpness=min_sharpness,
+                                   max_yaw=max_yaw) if quality_gate else None
+
+        # ✅ Match only the section's students when a roster is given
+        self.identifier = RosterMatcher(recognizer, section, roster_fallback) if section else recognizer
+
+        # ✅ Face detector (Haar by default) on a downscaled frame, searching only
+        # around known faces between full scans
+        self.face_detector = AdaptiveDetector(create_detector(detector), scale=detect_scale,
+                                              full_scan_interval=full_scan_interval)
+
+        # ✅ Crops from up to `batch_frames` frames share one forward pass
+        self.batcher = batcher or EmbeddingBatcher(recognizer, max_batch_size=batch_size,
+                                                   max_frames=batch_frames, max_delay=batch_delay)
+        self.inbox = deque()  # (track_id, label) results waiting to be voted in
+
+        # ✅ Track faces across frames so a seated student is not re-embedded every frame
+        self.tracker = FaceTracker(min_votes=min_votes, reverify_interval=reverify_interval)
+
+        self.frames = 0
+        self.marked = []  # (time, enroll, name) newly marked by this session
+
+    def admit(self, frame, ts):
+        """False if the motion gate skips this frame (no detection, no embedding)"""
+        return self.gate is None or self.gate.admit(frame, ts)
+
+    @property
+    def poll_delay(self):
+        """Seconds a live capture should wait while the motion gate is idle"""
+        return self.gate.poll_delay if self.gate is not None else 0.0
+
+    def detect(self, item):
+        frame, ts = item
+        self.frames += 1
+        faces = self.face_detector.detect(frame)
+        METRICS.count("frames")
+        METRICS.observe("faces_per_frame", len(faces))
+        return frame, ts, faces
+
+    def embed(self, item):
+        frame, ts, faces = item
+
+        # ✅ Only embed faces whose track is new, undecided or due for re-verification
+        tracks = self.tracker.update(faces)
+        self._drain_votes()
+        due = [track for track in tracks if self.tracker.needs_embedding(track, ts)]
+        if self.quality is not None and due:
+            # ✅ Rejected crops stay undecided and are retried on a later frame
+            with METRICS.timer("quality"):
+                ok = self.quality.check(frame, [track.box for track in due])
+            due = [track for track, good in zip(due, ok) if good]
+        for track in due:
+            x, y, w, h = track.box
+            face_img = frame[y:y+h, x:x+w]
+            self.batcher.submit(cv2.cvtColor(face_img, cv2.COLOR_BGR2RGB), (self, track.id))
+            self.tracker.mark_pending(track, ts)
+        self.batcher.end_frame()
+
+        try:
+            self._apply(self.batcher.poll())
+        except Exception as e:
+            print(f"⚠️ Error processing faces: {e}")
+            for track in tracks:
+                track.pending = False
+
+        return frame, ts, [(track.box, track.identity) for track in tracks]
+
+    def _apply(self, results):
+        """Identify a flushed batch and hand each result to its session"""
+        by_session = {}
+        for (session, track_id), emb in results:
+            by_session.setdefault(session, []).append((track_id, emb))
+
+        # One matcher call per session, each against its own roster (if any)
+        for session, items in by_session.items():
+            with METRICS.timer("match"):
+                labels = session.identifier.identify(np.array([emb for _, emb in items]))
+            session.inbox.extend((track_id, label) for (track_id, _), label in zip(items, labels))
+        self._drain_votes()
+
+    def _drain_votes(self):
+        while self.inbox:
+            track_id, label = self.inbox.popleft()
+            self.tracker.add_vote(track_id, label)
+
+    def record(self, item):
+        frame, ts, tracked = item
+        return frame, self._mark(tracked, ts)
+
+    def _mark(self, tracked, ts):
+        """Mark attendance for identified tracks; returns [(box, text, color)] overlays"""
+        overlays = []
+
+        for box, identity in tracked:
+            if identity is None:
+                overlays.append((box, "Identifying...", (0, 255, 255)))
+                continue
+
+            # ✅ Mark attendance (the ledger skips students already marked that day)
+            enroll, name, text, color = label_overlay(identity)
+            if enroll is not None:
+                when = datetime.fromtimestamp(ts)
+                if self.ledger.mark(enroll, name, when):
+                    self.marked.append((when, enroll, name))
+                    METRICS.count("marked")
+            overlays.append((box, text, color))
+
+        return overlays
+
+    def process_frame(self, frame, ts):
+        """Run all steps for one frame on the calling thread"""
+        return self.record(self.embed(self.detect((frame, ts))))
 
-    while time.time() < end_time:
-        ret, frame = cap.read()
+    def finish(self, ts=None):
+        """Embed crops still waiting in the batcher and mark their identities"""
+        try:
+            self._apply(self.batcher.flush())
+        except Exception as e:
+            print(f"⚠️ Error processing faces: {e}")
+        tracked = [(track.box, track.identity) for track in self.tracker.tracks.values()]
+        self._mark(tracked, time.time() if ts is None else ts)
+
+    def report(self):
+        """Print the end-of-session counters"""
+        batcher, tracker, face_detector = self.batcher, self.tracker, self.face_detector
+        print(f"🧮 {batcher.crops} faces embedded in {batcher.calls} calls "
+              f"(mean batch size {batcher.mean_batch_size:.1f}); tracking skipped "
+              f"{tracker.embeddings_saved} of {tracker.faces_seen} detected faces")
+        print(f"🔎 Detection: {face_detector.full_scans} full scans, {face_detector.roi_scans} ROI scans, "
+              f"{face_detector.scanned_fraction:.0%} of downscaled pixels searched")
+        if self.gate is not None:
+            print(f"🎚️ Motion gate: skipped {self.gate.skipped} of {self.gate.frames} frames "
+                  f"({self.gate.skipped_fraction:.0%}), idle {self.gate.idle_fraction:.0%} of the time")
+        if self.quality is not None:
+            print(self.quality.format_report())
+
+def draw_overlays(frame, frame_overlays, status_lines):
+    """Draw face boxes and labels plus status text onto the frame"""
+    # ✅ Draw the latest identified faces
+    for (x, y, w, h), text, color in frame_overlays:
+        cv2.putText(frame, text, (x, y-10),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.8, color, 2)
+        cv2.rectangle(frame, (x, y), (x+w, y+h), (255, 255, 0), 2)
+
+    # ✅ Show remaining time and per-stage FPS / queue depth
+    cv2.putText(frame, status_lines[0], (10, 30),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 255), 2)
+    for i, line in enumerate(status_lines[1:]):
+        cv2.putText(frame, line, (10, 55 + 18 * i),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.45, (0, 255, 255), 1)
+
+def build_pipeline(session, cap, queue_depth=2, profiler=None):
+    """
+    Stages: capture -> detect -> embed -> record, each on its own thread.
+    Every queue keeps only the newest `queue_depth` items, so a slow stage
+    skips stale frames instead of falling further behind. Frames the
+    session's motion gate skips never leave the capture stage. Returns the
+    pipeline and the queue of (frame, overlays) it produces.
+    """
+    def capture():
+        with METRICS.timer("capture"):
+            ret, frame, _ = cap.read()
         if not ret:
             print("❌ Failed to access webcam.")
-            break
+            return StopIteration
+        ts = time.time()
+        if not session.admit(frame, ts):
+            time.sleep(session.poll_delay)  # Idle: poll the camera slowly
+            return None
+        return frame, ts
 
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        faces = face_cascade.detectMultiScale(gray, scaleFactor=1.2, minNeighbors=5)
-
-        for (x, y, w, h) in faces:
-            face_img = frame[y:y+h, x:x+w]  
-            face_rgb = cv2.cvtColor(face_img, cv2.COLOR_BGR2RGB)
-
-            try:
-                # ✅ Get embedding
-                embeddings = embedder.embeddings([face_rgb])
-                if embeddings is None or len(embeddings) == 0:
-                    raise ValueError("No embedding generated")
-                emb = embeddings[0]
-
-                # ✅ Predict using KNN
-                pred_id = knn.predict([emb])[0]
-                dist, _ = knn.kneighbors([emb], n_neighbors=1)
-                distance = dist[0][0]
-
-                # ✅ Threshold for unknown
-                THRESHOLD = 0.9
-                if distance < THRESHOLD:
-                    label = label_map.get(int(pred_id), "Unknown")
-                else:
-                    label = "Unknown"
-
-            except Exception as e:
-                print(f"⚠️ Error processing face: {e}")
-                cv2.putText(frame, "Error", (x, y-10),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2)
-                continue
+    def record(item):
+        result = session.record(item)
+        METRICS.observe("latency_seconds", time.time() - item[1])  # Capture to marked
+        return result
+
+    pipeline = Pipeline(profiler)
+    frames = pipeline.add_stage("capture", capture, queue_depth=1)
+    detected = pipeline.add_stage("detect", session.detect, frames, queue_depth=queue_depth)
+    embedded = pipeline.add_stage("embed", session.embed, detected, queue_depth=queue_depth)
+    recorded = pipeline.add_stage("record", record, embedded, queue_depth=queue_depth)
+    return pipeline, recorded
+
+def recognize_faces(gallery_path=GALLERY_FILE, source=0, queue_depth=2, duration=15, headless=False,
+                    status_interval=60.0, embedder="keras", nprobe=None, exact=False, profiler=None,
+                    **session_options):
+    """
+    Live recognition from a camera or stream.
+
+    With a window, runs for `duration` seconds (or until ESC). Headless,
+    nothing is drawn and it runs until `duration` passes, if given, or
+    SIGINT/SIGTERM arrives; pending marks are flushed before exiting.
+    Attendance moves to a new day's CSV at midnight.
+    """
+    # ✅ Check model files
+    if not gallery_exists(gallery_path):
+        print("❌ Model files not found. Run train_model.py first.")
+        return
+
+    recognizer = FaceRecognizer(gallery_path, embedder, nprobe=nprobe, exact=exact)
+    cap = open_source(source)
+
+    # ✅ Today's attendance, loaded once; each new mark is written immediately
+    ledger = DailyLedger(get_today_filename)
+    session = RecognitionSession(recognizer, ledger, **session_options)
+
+    pipeline, recorded = build_pipeline(session, cap, queue_depth, profiler)
+
+    # ✅ Stop cleanly on Ctrl+C or a service manager's SIGTERM
+    stop_requested = []
+    def request_stop(signum, _frame):
+        print(f"\n🛑 Received {signal.Signals(signum).name}, stopping...")
+        stop_requested.append(signum)
+    previous_handlers = {sig: signal.signal(sig, request_stop) for sig in (signal.SIGINT, signal.SIGTERM)}
+
+    if duration:
+        print(f"\n📸 Starting FaceNet recognition. Will run for {duration} seconds...\n")
+    else:
+        print("\n📸 Starting FaceNet recognition. Running until stopped (Ctrl+C / SIGTERM)...\n")
+
+    start_time = time.time()
+    end_time = start_time + duration if duration else float("inf")
+    next_status = start_time + status_interval
+    pipeline.start()
+
+    while not stop_requested and time.time() < end_time and (pipeline.running or len(recorded)):
+        item = recorded.get(timeout=0.1 if not headless else 0.5)
+
+        if headless:
+            # ✅ No window and no drawing; open the new day's file at midnight
+            # and log a status line now and then
+            if ledger.rollover():
+                print(f"📅 New day: attendance now goes to '{ledger.filename}'")
+            if status_interval and time.time() >= next_status:
+                next_status += status_interval
+                gate = "" if session.gate is None else f"{session.gate.skipped_fraction:.0%} skipped | "
+                print(f"📊 {datetime.now():%H:%M:%S} {len(ledger)} marked today | {gate}"
+                      + " | ".join(pipeline.format_stats()))
+            continue
 
-            # ✅ Mark attendance
-            if label != "Unknown":
-                try:
-                    enroll, name = label.split('_', 1)
-                except ValueError:
-                    enroll, name = "???", "Unknown"
-
-                if enroll not in attendance and not already_marked_today(enroll, filename):
-                    now = datetime.now()
-                    date = now.strftime("%Y-%m-%d")
-                    time_str = now.strftime("%H:%M:%S")
-                    attendance[enroll] = (date, time_str, enroll, name)
-
-                cv2.putText(frame, f"{name} ({enroll})", (x, y-10),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
-            else:
-                cv2.putText(frame, "Unknown", (x, y-10),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2)
-
-            cv2.rectangle(frame, (x, y), (x+w, y+h), (255, 255, 0), 2)
-
-        # ✅ Show remaining time
-        remaining = int(end_time - time.time())
-        cv2.putText(frame, f"Time left: {remaining}s", (10, 30),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 255), 2)
-
-        cv2.imshow("FaceNet Recognition Attendance", frame)
-        if cv2.waitKey(1) == 27:  # ESC
+        if item is None:
+            continue
+        frame, frame_overlays = item
+
+        remaining = "" if not duration else f"Time left: {int(end_time - time.time())}s"
+        with METRICS.timer("display"):
+            draw_overlays(frame, frame_overlays, [remaining] + pipeline.format_stats())
+
+            # ✅ Display on the main thread (OpenCV windows are not thread-safe)
+            cv2.imshow("FaceNet Recognition Attendance", frame)
+            key = cv2.waitKey(1)
+        if key == 27:  # ESC
             break
 
+    pipeline.stop()
     cap.release()
-    cv2.destroyAllWindows()
+    if not headless:
+        cv2.destroyAllWindows()
+    session.finish()
+    for sig, handler in previous_handlers.items():
+        signal.signal(sig, handler)
+
+    print("📊 Pipeline: " + " | ".join(pipeline.format_stats()))
+    session.report()
+    for line in METRICS.format_report():
+        print(line)
+
+    ledger.close()
+    print(f"\n✅ Attendance recorded in '{ledger.filename}' ({len(ledger.records)} new, {len(ledger)} total today)")
+
+def process_recording(input_path, gallery_path=GALLERY_FILE, stride=1, seek=0.0, fps=25.0,
+                      start=None, output=None, embedder="keras", nprobe=None, exact=False, **session_options):
+    """
+    Headless attendance from a video file or a folder of frames.
+
+    Every sampled frame is processed (nothing is dropped) as fast as the
+    CPU allows. Marks are time-stamped with `start` (the recording's
+    start time, default now) plus the frame's position in the recording,
+    and written to the attendance CSV of the day each mark falls on (a
+    recording that runs past midnight continues in the next day's file),
+    or all to `output` if given.
+    """
+    if not gallery_exists(gallery_path):
+        print("❌ Model files not found. Run train_model.py first.")
+        return
+
+    source = open_source(input_path, stride=stride, seek=seek, fps=fps)
+    if not source.isOpened():
+        print(f"❌ Could not open '{input_path}'.")
+        return
 
-    # ✅ Save attendance
-    with open(filename, 'a', newline='') as f:
-        writer = csv.writer(f)
-        for record in attendance.values():
-            writer.writerow(record)
+    start = start or datetime.now()
 
-    print(f"\n✅ Attendance recorded in '{filename}'")
+    recognizer = FaceRecognizer(gallery_path, embedder, nprobe=nprobe, exact=exact)
+    ledger = AttendanceLedger(output) if output else DailyLedger(get_today_filename, now=start)
+    session = RecognitionSession(recognizer, ledger, **session_options)
+
+    print(f"\n🎞️ Processing '{input_path}' (stride {stride}, from {seek:.1f}s)...\n")
+
+    t0 = time.time()
+    first_ts = last_ts = None
+    while True:
+        with METRICS.timer("capture"):
+            ret, frame, ts = source.read()
+        if not ret:
+            break
+        first_ts = ts if first_ts is None else first_ts
+        last_ts = ts
+        if session.admit(frame, start.timestamp() + ts):
+            session.process_frame(frame, start.timestamp() + ts)
+    session.finish(start.timestamp() + (last_ts or 0.0))
+    elapsed = time.time() - t0
+    source.release()
+
+    covered = (last_ts - first_ts) if first_ts is not None else 0.0
+    print(f"⏱️ {session.frames} frames processed ({source.frames_read} read) in {elapsed:.1f}s: "
+          f"{session.frames / max(elapsed, 1e-9):.1f} frames/sec, "
+          f"{covered / max(elapsed, 1e-9):.1f}x real time")
+    session.report()
+    for line in METRICS.format_report():
+        print(line)
+
+    ledger.close()
+    days = sorted({when.strftime("%Y-%m-%d") for when, _, _ in session.marked})
+    print(f"\n✅ Attendance recorded in '{ledger.filename}' ({len(ledger.records)} new, {len(ledger)} total)"
+          + (f"; the recording spans {', '.join(days)}" if len(days) > 1 else ""))
 
 if __name__ == "__main__":
-    recognize_faces()
+    parser = argparse.ArgumentParser(description="Mark attendance with live face recognition")
+    parser.add_argument("--prototypes", action="store_true",
+                        help=f"Match against the compressed '{PROTOTYPES_FILE}' gallery")
+    parser.add_argument("--gallery", default=None, help="Gallery file to match against")
+    parser.add_argument("--embedder", default="keras",
+                        help="Embedding backend: keras, tflite[:float16|dynamic|int8|path] or stub")
+    parser.add_argument("--nprobe", type=int, default=None,
+                        help="IVF lists searched per face (higher = better recall, slower; default from training)")
+    parser.add_argument("--exact", action="store_true", help="Ignore the IVF index and search the whole gallery")
+    parser.add_argument("--motion-gate", action="store_true",
+                        help="Skip detection while nothing moves, polling the camera slowly (for --headless)")
+    parser.add_argument("--motion-threshold", type=float, default=0.002,
+                        help="Share of changed pixels that counts as motion")
+    parser.add_argument("--idle-fps", type=float, default=2.0,
+                        help="Frames per second read from the camera while the motion gate is idle")
+    parser.add_argument("--quality-gate", action="store_true",
+                        help="Don't embed small, blurred or badly exposed faces; their track waits for a better frame")
+    parser.add_argument("--min-face", type=int, default=40,
+                        help="With --quality-gate: smallest face (pixels) worth embedding")
+    parser.add_argument("--min-sharpness", type=float, default=40.0,
+                        help="With --quality-gate: minimum Laplacian variance of a face crop")
+    parser.add_argument("--max-yaw", type=float, default=None,
+                        help="With --quality-gate, also skip faces turned away: nose offset from the face centre, "
+                             "e.g. 0.15 (needs dlib)")
+    parser.add_argument("--section", default=None,
+                        help="Only match students on this section's roster (rosters/<section>.txt or a file)")
+    parser.add_argument("--roster-fallback", action="store_true",
+                        help="With --section, also search the full gallery for faces not on the roster")
+    parser.add_argument("--batch-size", type=int, default=32,
+                        help="Maximum number of faces per embeddings() call")
+    parser.add_argument("--batch-frames", type=int, default=1,
+                        help="Collect faces from up to this many frames before embedding")
+    parser.add_argument("--batch-delay-ms", type=float, default=50,
+                        help="Maximum time a face waits for its batch to fill")
+    parser.add_argument("--queue-depth", type=int, default=2,
+                        help="Frames buffered between pipeline stages (oldest are dropped)")
+    parser.add_argument("--duration", type=float, default=None,
+                        help="Seconds to run recognition for (default: 15, or until stopped with --headless)")
+    parser.add_argument("--headless", action="store_true",
+                        help="No window or drawing; run until SIGINT/SIGTERM, rolling over to a new CSV at midnight")
+    parser.add_argument("--status-every", type=float, default=60.0,
+                        help="Headless: seconds between status lines (0 to disable)")
+    parser.add_argument("--min-votes", type=int, default=2,
+                        help="Matching recognitions needed before a tracked face is identified")
+    parser.add_argument("--reverify", type=float, default=5.0,
+                        help="Seconds between re-verifications of an identified face")
+    parser.add_argument("--detect-scale", type=float, default=0.5,
+                        help="Run face detection on a frame resized by this factor")
+    parser.add_argument("--full-scan-every", type=int, default=10,
+                        help="Frames between full-frame scans; others only search around known faces")
+    parser.add_argument("--detector", choices=DETECTOR_BACKENDS, default="haar",
+                        help="Face detector backend (see benchmark_detectors.py)")
+    parser.add_argument("--source", default="0",
+                        help="Camera index or stream URL for live recognition")
+    parser.add_argument("--input", default=None,
+                        help="Video file or folder of frames to process offline (no window, no frame dropping)")
+    parser.add_argument("--stride", type=int, default=1, help="Offline: process every N-th frame")
+    parser.add_argument("--seek", type=float, default=0.0, help="Offline: start this many seconds in")
+    parser.add_argument("--fps", type=float, default=25.0, help="Offline: frame rate of a folder of frames")
+    parser.add_argument("--start", default=None,
+                        help="Offline: recording start time 'YYYY-MM-DD HH:MM:SS' (default: now)")
+    parser.add_argument("--output", default=None, help="Offline: attendance CSV to write")
+    parser.add_argument("--metrics-json", default=None,
+                        help="Write per-stage counters and p50/p95/p99 latencies to this JSON file")
+    parser.add_argument("--metrics-prom", default=None,
+                        help="Write the same metrics in Prometheus text format (e.g. for node_exporter's textfile collector)")
+    parser.add_argument("--metrics-every", type=float, default=10.0, help="Seconds between metrics file updates")
+    parser.add_argument("--profile", default=None,
+                        help="Run under cProfile (every pipeline thread) and save the merged stats to this file")
+    args = parser.parse_args()
+
+    session_options = dict(batch_size=args.batch_size, batch_frames=args.batch_frames,
+                           batch_delay=args.batch_delay_ms / 1000.0, min_votes=args.min_votes,
+                           reverify_interval=args.reverify, detect_scale=args.detect_scale,
+                           full_scan_interval=args.full_scan_every, detector=args.detector,
+                           section=args.section, roster_fallback=args.roster_fallback,
+                           motion_gate=args.motion_gate, motion_threshold=args.motion_threshold,
+                           idle_fps=args.idle_fps, quality_gate=args.quality_gate,
+                           min_face=args.min_face, min_sharpness=args.min_sharpness,
+                           max_yaw=args.max_yaw)
+    gallery_path = args.gallery or (PROTOTYPES_FILE if args.prototypes else GALLERY_FILE)
+    if args.max_yaw is not None and args.quality_gate:
+        try:
+            load_pose_predictor()
+        except RuntimeError as e:
+            parser.error(str(e))
+    if args.section:
+        try:
+            roster_path(args.section)
+        except FileNotFoundError as e:
+            parser.error(str(e))
+
+    exporter = None
+    if args.metrics_json or args.metrics_prom:
+        exporter = MetricsExporter(args.metrics_json, args.metrics_prom, interval=args.metrics_every)
+        exporter.start()
+    profiler = ProfileCapture() if args.profile else None
+
+    if args.input:
+        start = datetime.strptime(args.start, "%Y-%m-%d %H:%M:%S") if args.start else None
+        run, kwargs = process_recording, dict(input_path=args.input, stride=args.stride, seek=args.seek,
+                                              fps=args.fps, start=start, output=args.output)
+    else:
+        duration = args.duration if args.duration is not None else (None if args.headless else 15)
+        run, kwargs = recognize_faces, dict(source=args.source, queue_depth=args.queue_depth, duration=duration,
+                                            headless=args.headless, status_interval=args.status_every,
+                                            profiler=profiler)
+    kwargs.update(gallery_path=gallery_path, embedder=args.embedder, nprobe=args.nprobe, exact=args.exact,
+                  **session_options)
+    if profiler is not None:
+        profiler.profile(run, **kwargs)
+        profiler.dump(args.profile)
+    else:
+        run(**kwargs)
+
+    if exporter is not None:
+        exporter.stop()
+        print(f"📈 Metrics written to {' and '.join(p for p in (args.metrics_json, args.metrics_prom) if p)}")
@@ -2,10 +2,11 @@ import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 import os
 import csv
-import json
 from datetime import datetime
 from tkcalendar import Calendar  # For the date picker
 import glob
+from gallery import read_label_map
+from ledger import read_attendance
 
 class AttendanceViewer:
     def __init__(self, master):
@@ -39,13 +40,9 @@ class AttendanceViewer:
         self.load_data()
     
     def load_label_map(self):
-        """Load the label map from JSON file"""
+        """Load the label map from the gallery header (or label_map.json)"""
         try:
-            if os.path.exists("label_map.json"):
-                with open("label_map.json", "r") as f:
-                    data = json.load(f)
-                return {int(v): k for k, v in data.items()}
-            return {}
+            return read_label_map()
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load label map: {str(e)}")
             return {}
@@ -268,25 +265,9 @@ class AttendanceViewer:
                 if not os.path.exists(file_path):
                     continue
                 
-                with open(file_path, mode='r', newline='') as file:
-                    reader = csv.DictReader(file)
-                    
-                    for row in reader:
-                        # Get values with defaults
-                        date = row.get('Date', 'Unknown')
-                        time = row.get('Time', 'Unknown')
-                        enrollment = row.get('Enrollment', 'Unknown')
-                        name = row.get('Name', 'Unknown')
-                        
-                        # If name is missing, try to get it from label_map
-                        if name == 'Unknown' and enrollment != 'Unknown':
-                            for label_id, label_name in self.label_map.items():
-                                if enrollment in label_name:
-                                    name = label_name.split('_', 1)[1] if '_' in label_name else label_name
-                                    break
-                        
-                        self.tree.insert("", tk.END, values=(date, time, enrollment, name))
-                        record_count += 1
+                for values in read_attendance(file_path, self.label_map):
+                    self.tree.insert("", tk.END, values=values)
+                    record_count += 1
                 
             except Exception as e:
                 messagebox.showerror("Error", f"Failed to load data from {file_path}: {str(e)}")
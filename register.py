@@ -1,18 +1,15 @@
 import os
 import cv2
-import dlib
-import numpy as np
-import urllib.request
-import bz2
-from PIL import Image, ImageEnhance, ImageTk
-import face_recognition
-from imutils import face_utils
+from PIL import Image, ImageTk
+import argparse
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
+from detectors import DETECTOR_BACKENDS, create_detector
+from image_writer import ImageWriter
 
 
 class StudentRegistrationApp:
-    def __init__(self, root):
+    def __init__(self, root, detector="hog", writers=2):
         self.root = root
         self.root.title("Student Registration System")
         self.root.geometry("1000x700")
@@ -21,11 +18,15 @@ class StudentRegistrationApp:
         # Initialize variables
         self.camera_active = False
         self.cap = None
-        self.count = 0
-        self.use_landmarks = False
-        self.predictor = None
-        self.face_detector = None
+        self.count = 0  # images queued for saving
+        self.saved = 0
         self.full_save_path = ""
+
+        # Same detector interface as recognize.py; dlib HOG by default
+        self.detector = create_detector(detector)
+
+        # Enhancement and JPEG encoding run off the Tk thread
+        self.writer = ImageWriter(workers=writers)
         
         # Create main container
         self.main_frame = ttk.Frame(self.root)
@@ -35,9 +36,6 @@ class StudentRegistrationApp:
         self.create_registration_form()
         self.create_camera_feed()
         self.create_status_bar()
-        
-        # Check for shape predictor
-        self.check_shape_predictor()
     
     def create_registration_form(self):
         """Create the registration form elements"""
@@ -118,66 +116,6 @@ class StudentRegistrationApp:
             self.save_path_entry.delete(0, tk.END)
             self.save_path_entry.insert(0, path)
     
-    def check_shape_predictor(self):
-        """Check if shape predictor is available"""
-        predictor_path = "shape_predictor_68_face_landmarks.dat"
-        
-        if os.path.exists(predictor_path):
-            self.initialize_landmark_detector(predictor_path)
-            return
-        
-        answer = messagebox.askyesno(
-            "Download Required",
-            "The facial landmark predictor file is missing (37MB). Download now?"
-        )
-        
-        if answer:
-            self.download_shape_predictor()
-        else:
-            self.status_var.set("Using basic face detection (no landmarks)")
-            self.use_landmarks = False
-    
-    def initialize_landmark_detector(self, predictor_path):
-        """Initialize the facial landmark detector"""
-        try:
-            self.predictor = dlib.shape_predictor(predictor_path)
-            self.face_detector = dlib.get_frontal_face_detector()
-            self.use_landmarks = True
-            self.status_var.set("Ready (with facial landmarks)")
-        except Exception as e:
-            self.use_landmarks = False
-            self.status_var.set(f"Error initializing predictor: {str(e)}")
-    
-    def download_shape_predictor(self):
-        """Download the facial landmark predictor"""
-        predictor_url = "http://dlib.net/files/shape_predictor_68_face_landmarks.dat.bz2"
-        bz2_path = "shape_predictor_68_face_landmarks.dat.bz2"
-        dat_path = "shape_predictor_68_face_landmarks.dat"
-        
-        try:
-            self.status_var.set("Downloading facial landmark predictor (37MB)...")
-            self.root.update()
-            
-            # Download the file
-            urllib.request.urlretrieve(predictor_url, bz2_path)
-            
-            # Extract the bz2 file
-            with open(dat_path, 'wb') as new_file, bz2.BZ2File(bz2_path, 'rb') as file:
-                for data in iter(lambda: file.read(100 * 1024), b''):
-                    new_file.write(data)
-            
-            # Clean up
-            os.remove(bz2_path)
-            
-            # Initialize the detector
-            self.initialize_landmark_detector(dat_path)
-            messagebox.showinfo("Success", "Facial landmark predictor downloaded successfully!")
-            
-        except Exception as e:
-            self.use_landmarks = False
-            self.status_var.set(f"Error downloading predictor: {str(e)}")
-            messagebox.showerror("Error", f"Failed to download predictor: {str(e)}")
-    
     def validate_inputs(self):
         """Validate user inputs before starting registration"""
         enroll = self.enroll_entry.get().strip()
@@ -233,6 +171,8 @@ class StudentRegistrationApp:
         # Initialize registration state
         self.camera_active = True
         self.count = 0
+        self.saved = 0
+        self.writer.completed()  # Forget a previous student's writes
         self.progress_bar['value'] = 0
         self.image_counter.config(text="Images captured: 0/100")
         
@@ -249,36 +189,31 @@ class StudentRegistrationApp:
         if self.cap:
             self.cap.release()
             self.cap = None
+
+        # Let the writers finish the images still queued
+        if self.writer.pending:
+            self.status_var.set(f"Saving {self.writer.pending} remaining images...")
+            self.root.update_idletasks()
+        self.writer.flush()
+        self.update_progress()
         
         # Update UI state
         self.start_btn.config(state=tk.NORMAL)
         self.stop_btn.config(state=tk.DISABLED)
         
         # Show completion message
-        self.status_var.set(f"Registration complete. {self.count} images saved in: {self.full_save_path}")
-        messagebox.showinfo("Complete", f"Registration complete!\n{self.count} images saved.")
+        failed = self.count - self.saved
+        self.status_var.set(f"Registration complete. {self.saved} images saved in: {self.full_save_path}"
+                            + (f" ({failed} failed)" if failed else ""))
+        messagebox.showinfo("Complete", f"Registration complete!\n{self.saved} images saved.")
     
-    def detect_faces(self, rgb_frame):
-        """Detect faces in the frame using the appropriate method"""
-        if self.use_landmarks and self.count < 100:
-            faces = self.face_detector(rgb_frame, 1)
-            if not faces:
-                face_locations = face_recognition.face_locations(rgb_frame)
-                faces = [dlib.rectangle(left, top, right, bottom) 
-                        for (top, right, bottom, left) in face_locations]
-        else:
-            face_locations = face_recognition.face_locations(rgb_frame)
-            faces = [(top, right, bottom, left) for (top, right, bottom, left) in face_locations]
-        
-        return faces
+    def detect_faces(self, frame):
+        """Detect faces in the BGR frame, returned as (x, y, w, h) boxes"""
+        return self.detector.detect(frame)
     
     def process_face(self, frame, face):
         """Process a detected face and save if conditions are met"""
-        if self.use_landmarks:
-            (x, y, w, h) = face_utils.rect_to_bb(face)
-        else:
-            (top, right, bottom, left) = face
-            x, y, w, h = left, top, right-left, bottom-top
+        (x, y, w, h) = face
         
         # Add padding to the face region
         padding = 30
@@ -292,34 +227,27 @@ class StudentRegistrationApp:
         
         # Only save if face is properly detected and we haven't reached the limit
         if w > 100 and h > 100 and self.count < 100:
-            self.save_face_image(face_img)
-            return True
+            return self.save_face_image(face_img)
         
         return False
     
     def save_face_image(self, face_img):
-        """Save the face image with quality enhancements"""
+        """Queue the face image for enhancement and saving; False if the writers are busy"""
+        img_path = os.path.join(self.full_save_path, f"{self.count + 1}.jpg")
+        if not self.writer.submit(face_img, img_path):
+            return False  # Writers behind; try again with a later frame
         self.count += 1
-        img_path = os.path.join(self.full_save_path, f"{self.count}.jpg")
-        
-        # Convert to PIL Image for enhancements
-        pil_img = Image.fromarray(cv2.cvtColor(face_img, cv2.COLOR_BGR2RGB))
-        
-        # Apply image enhancements
-        enhancer = ImageEnhance.Contrast(pil_img)
-        pil_img = enhancer.enhance(1.3)
-        
-        enhancer = ImageEnhance.Sharpness(pil_img)
-        pil_img = enhancer.enhance(1.2)
-        
-        # Convert back to OpenCV format and save as grayscale
-        enhanced_img = cv2.cvtColor(np.array(pil_img), cv2.COLOR_RGB2BGR)
-        gray_img = cv2.cvtColor(enhanced_img, cv2.COLOR_BGR2GRAY)
-        cv2.imwrite(img_path, gray_img)
-        
-        # Update progress
-        self.progress_bar['value'] = self.count
-        self.image_counter.config(text=f"Images captured: {self.count}/100")
+        return True
+
+    def update_progress(self):
+        """Move the progress bar for the images written since the last update"""
+        for img_path, error in self.writer.completed():
+            if error is None:
+                self.saved += 1
+            else:
+                self.status_var.set(f"Failed to save {os.path.basename(img_path)}: {error}")
+        self.progress_bar['value'] = self.saved
+        self.image_counter.config(text=f"Images captured: {self.saved}/100")
     
     def update_camera_feed(self):
         """Update the camera feed with face detection"""
@@ -330,22 +258,15 @@ class StudentRegistrationApp:
         if not ret:
             return
         
-        # Convert to RGB for face detection
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        
         # Detect faces
-        faces = self.detect_faces(rgb_frame)
+        faces = self.detect_faces(frame)
         
         for face in faces:
             # Process each face
             face_processed = self.process_face(frame, face)
             
             # Draw rectangle around face
-            if self.use_landmarks:
-                (x, y, w, h) = face_utils.rect_to_bb(face)
-            else:
-                (top, right, bottom, left) = face
-                x, y, w, h = left, top, right-left, bottom-top
+            (x, y, w, h) = face
             
             cv2.rectangle(frame, (x, y), (x+w, y+h), (0, 255, 0), 2)
             cv2.putText(frame, f"#{self.count}", (x, y-10), 
@@ -353,6 +274,7 @@ class StudentRegistrationApp:
         
         # Display the frame
         self.display_frame(frame)
+        self.update_progress()
         
         # Schedule next update or stop if done
         if self.camera_active:
@@ -372,8 +294,15 @@ class StudentRegistrationApp:
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Register a student's face images")
+    parser.add_argument("--detector", choices=DETECTOR_BACKENDS, default="hog",
+                        help="Face detector backend (see benchmark_detectors.py)")
+    parser.add_argument("--writers", type=int, default=2,
+                        help="Threads enhancing and saving captured images in the background")
+    args = parser.parse_args()
+
     root = tk.Tk()
-    app = StudentRegistrationApp(root)
+    app = StudentRegistrationApp(root, detector=args.detector, writers=args.writers)
     root.mainloop()
 
 
@@ -0,0 +1,46 @@
+import os
+import csv
+
+# One file per course section: rosters/<section>.txt (one enrollment number
+# per line, '#' starts a comment) or rosters/<section>.csv with an
+# 'Enrollment' column, e.g. exported from the attendance CSVs
+ROSTER_DIR = "rosters"
+
+
+def roster_path(section):
+    """Path of a section's roster; `section` may also be a file path"""
+    if os.path.isfile(section):
+        return section
+    for ext in (".txt", ".csv"):
+        path = os.path.join(ROSTER_DIR, section + ext)
+        if os.path.exists(path):
+            return path
+    raise FileNotFoundError(f"No roster for section '{section}' in '{ROSTER_DIR}/'")
+
+
+def load_roster(section):
+    """Return the set of enrollment numbers on a section's roster"""
+    path = roster_path(section)
+    with open(path, newline="") as f:
+        lines = f.read().splitlines()
+
+    if lines and "Enrollment" in lines[0]:
+        return {row["Enrollment"].strip() for row in csv.DictReader(lines) if (row.get("Enrollment") or "").strip()}
+
+    enrollments = set()
+    for line in lines:
+        line = line.split("#", 1)[0].strip()
+        if line:
+            # Accept bare numbers as well as 'enroll_name' folder names
+            enrollments.add(line.split(",", 1)[0].split("_", 1)[0].strip())
+    return enrollments
+
+
+def roster_label_ids(label_map, enrollments):
+    """
+    Gallery label IDs of the students on a roster, from {label_str -> id}
+    with 'enroll_name' labels, and the enrollments that have no images.
+    """
+    ids = {label: id_ for label, id_ in label_map.items() if label.split("_", 1)[0] in enrollments}
+    found = {label.split("_", 1)[0] for label in ids}
+    return sorted(ids.values()), sorted(enrollments - found)
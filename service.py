@@ -0,0 +1,352 @@
+import json
+import time
+import base64
+import binascii
+import signal
+import argparse
+import threading
+import itertools
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import cv2
+import numpy as np
+from gallery import GALLERY_FILE, PROTOTYPES_FILE, gallery_exists
+from ledger import DailyLedger
+from metrics import METRICS
+from detectors import create_detector
+from sources import open_source
+from recognize import (FaceRecognizer, RecognitionSession, build_pipeline, get_today_filename,
+                       label_overlay)
+from multi_camera import room_filename
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Finished sessions whose summary nobody fetched are forgotten after this long
+SESSION_TTL = 3600.0
+
+# RecognitionSession options a client may set when starting a session
+SESSION_OPTIONS = ("detector", "detect_scale", "full_scan_interval", "batch_size", "batch_frames",
+                   "batch_delay", "min_votes", "reverify_interval", "section", "roster_fallback",
+                   "motion_gate", "motion_threshold", "idle_fps", "quality_gate", "min_face",
+                   "min_sharpness", "max_yaw")
+
+
+def decode_image(data):
+    """BGR image from base64-encoded JPEG/PNG bytes; ValueError if it is not one"""
+    try:
+        img = cv2.imdecode(np.frombuffer(base64.b64decode(data, validate=True), np.uint8), cv2.IMREAD_COLOR)
+    except (binascii.Error, TypeError, cv2.error) as e:
+        raise ValueError(f"Could not decode image: {e}") from None
+    if img is None:
+        raise ValueError("Could not decode image")
+    return img
+
+
+class LiveSession:
+    """A camera pipeline started by a client, running headless on its own threads"""
+
+    def __init__(self, session_id, recognizer, ledger, source="0", room=None, duration=None,
+                 queue_depth=2, **session_options):
+        self.id = session_id
+        self.source = source
+        self.room = room
+        self.duration = duration
+        self.ledger = ledger
+        self.cap = open_source(source)
+        if not self.cap.isOpened():
+            raise ValueError(f"Could not open source '{source}'")
+        self.session = RecognitionSession(recognizer, ledger, name=room or str(source), **session_options)
+        self.pipeline, self.recorded = build_pipeline(self.session, self.cap, queue_depth)
+        self.stop_event = threading.Event()
+        self.started = time.time()
+        self.stopped = None
+        self.reported = False  # final summary handed to a client
+        self.thread = threading.Thread(target=self._run, name=f"session-{session_id}", daemon=True)
+
+    def start(self):
+        self.pipeline.start()
+        self.thread.start()
+        return self
+
+    def _run(self):
+        try:
+            end_time = self.started + self.duration if self.duration else float("inf")
+            while (not self.stop_event.is_set() and time.time() < end_time
+                   and (self.pipeline.running or len(self.recorded))):
+                self.recorded.get(timeout=0.2)  # Overlays are not drawn; just keep the queue moving
+        finally:
+            self.pipeline.stop()
+            self.cap.release()
+            self.session.finish()
+            self.stopped = time.time()
+
+    def stop(self, timeout=5.0):
+        self.stop_event.set()
+        self.thread.join(timeout)
+
+    @property
+    def running(self):
+        return self.stopped is None
+
+    def summary(self):
+        """JSON-serializable state of the session"""
+        elapsed = (self.stopped or time.time()) - self.started
+        return {
+            "id": self.id, "source": self.source, "room": self.room, "running": self.running,
+            "section": getattr(self.session.identifier, "section", None),
+            "elapsed": round(elapsed, 1), "frames": self.session.frames,
+            "fps": round(self.session.frames / max(elapsed, 1e-9), 1),
+            "skipped_fraction": None if self.session.gate is None else round(self.session.gate.skipped_fraction, 3),
+            "quality_skipped": None if self.session.quality is None else dict(self.session.quality.rejected),
+            "file": self.ledger.filename,
+            "marked": [{"time": when.strftime("%Y-%m-%d %H:%M:%S"), "enrollment": enroll, "name": name}
+                       for when, enroll, name in self.session.marked],
+            "stages": self.pipeline.stats(),
+        }
+
+
+class RecognitionService:
+    """
+    Loads the gallery, matcher and FaceNet once and serves recognition to
+    local clients: one-off identification of submitted images and
+    long-running camera sessions.
+
+    A finished session is dropped once a client has fetched its final
+    summary, or `session_ttl` seconds after it stopped, so a long-running
+    service does not keep every session it ever ran.
+    """
+
+    def __init__(self, gallery_path=GALLERY_FILE, embedder="keras", session_ttl=SESSION_TTL):
+        self.recognizer = FaceRecognizer(gallery_path, embedder)
+        self.detector = create_detector("haar")
+        self._detect_lock = threading.Lock()  # OpenCV cascades are not thread-safe
+        self.sessions = {}
+        self.ledgers = {}  # room (None = shared daily file) -> DailyLedger
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.session_ttl = session_ttl
+        self.started = time.time()
+
+    def health(self):
+        self._evict()
+        with self._lock:
+            running = sum(s.running for s in self.sessions.values())
+        gallery = self.recognizer.gallery
+        return {"status": "ok", "uptime": round(time.time() - self.started, 1),
+                "embedder": self.recognizer.embedder.name,
+                "embeddings": len(gallery), "classes": gallery.class_count,
+                "sessions": running}
+
+    def identify(self, images, detect=False):
+        """
+        Identify faces in base64-encoded images, all in one embeddings()
+        call. Images are face crops unless `detect` is set, in which case
+        faces are first detected in each image. Returns one list of faces
+        per image.
+        """
+        t0 = time.perf_counter()
+        frames = [decode_image(data) for data in images]
+        crops, owners = [], []
+        for i, frame in enumerate(frames):
+            if detect:
+                with self._detect_lock:
+                    boxes = self.detector.detect(frame)
+            else:
+                boxes = [(0, 0, frame.shape[1], frame.shape[0])]
+            for (x, y, w, h) in boxes:
+                crops.append(cv2.cvtColor(frame[y:y+h, x:x+w], cv2.COLOR_BGR2RGB))
+                owners.append((i, (x, y, w, h)))
+
+        results = [[] for _ in frames]
+        if crops:
+            matches = self.recognizer.match(self.recognizer.embeddings(crops))
+            for (i, box), (label, distance, margin) in zip(owners, matches):
+                enroll, name, _, _ = label_overlay(label)
+                results[i].append({"box": list(box), "label": label, "enrollment": enroll, "name": name,
+                                   "distance": round(distance, 4), "margin": round(margin, 4)})
+        return {"results": results, "faces": len(crops), "ms": round((time.perf_counter() - t0) * 1000, 1)}
+
+    def _ledger(self, room):
+        if room not in self.ledgers:
+            if room is None:
+                self.ledgers[room] = DailyLedger(get_today_filename)
+            else:
+                self.ledgers[room] = DailyLedger(lambda day: room_filename(room, day))
+        return self.ledgers[room]
+
+    def _evict(self):
+        """Forget finished sessions that were reported or have outlived the TTL"""
+        now = time.time()
+        with self._lock:
+            done = [s.id for s in self.sessions.values()
+                    if not s.running and (s.reported or now - s.stopped >= self.session_ttl)]
+            for session_id in done:
+                del self.sessions[session_id]
+
+    def start_session(self, source="0", room=None, duration=None, queue_depth=2, **options):
+        self._evict()
+        unknown = set(options) - set(SESSION_OPTIONS)
+        if unknown:
+            raise ValueError(f"Unknown session options: {', '.join(sorted(unknown))}")
+        try:
+            duration = float(duration) if duration is not None else None
+            queue_depth = int(queue_depth)
+        except (TypeError, ValueError):
+            raise ValueError(f"duration must be a number of seconds and queue_depth a whole number, "
+                             f"got {duration!r} and {queue_depth!r}") from None
+        if (duration is not None and not duration > 0) or queue_depth < 1:
+            raise ValueError("duration must be positive and queue_depth at least 1")
+        with self._lock:
+            busy = [s.id for s in self.sessions.values() if s.running and s.source == str(source)]
+            if busy:
+                raise ValueError(f"Source '{source}' is already used by session {busy[0]}")
+            session = LiveSession(next(self._ids), self.recognizer, self._ledger(room), source=str(source),
+                                  room=room, duration=duration, queue_depth=queue_depth, **options)
+            self.sessions[session.id] = session
+        print(f"▶️ Session {session.id}: source '{session.source}'" + (f", room {room}" if room else ""))
+        return session.start().summary()
+
+    def session(self, session_id):
+        self._evict()
+        with self._lock:
+            if session_id not in self.sessions:
+                raise KeyError(f"No session {session_id}")
+            return self.sessions[session_id]
+
+    def summaries(self):
+        self._evict()
+        with self._lock:
+            sessions = list(self.sessions.values())
+        return [s.summary() for s in sessions]
+
+    def report(self, session_id):
+        """Summary of one session; once it has finished, the session is dropped afterwards"""
+        session = self.session(session_id)
+        summary = session.summary()
+        session.reported = not summary["running"]
+        return summary
+
+    def stop_session(self, session_id):
+        session = self.session(session_id)
+        session.stop()
+        summary = self.report(session_id)
+        print(f"⏹️ Session {session_id}: {summary['frames']} frames, {len(summary['marked'])} marked")
+        return summary
+
+    def close(self):
+        with self._lock:
+            sessions = list(self.sessions.values())
+        for session in sessions:
+            session.stop()
+        for ledger in self.ledgers.values():
+            ledger.close()
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    """
+    JSON over HTTP:
+      GET  /health                     model and gallery status
+      GET  /metrics                    per-stage counters and latencies (Prometheus text format)
+      POST /identify                   {"images": [base64, ...], "detect": false}
+      GET  /sessions                   all sessions
+      POST /sessions                   {"source": "0", "room": null, "section": null, "duration": null, ...}
+      GET  /sessions/<id>              one session, with the students it marked (a finished
+                                       session is dropped once this has returned its summary)
+      POST /sessions/<id>/stop         stop it and return its summary
+    """
+
+    service = None  # set by serve()
+
+    def _send(self, status, payload, content_type="application/json"):
+        body = payload.encode() if isinstance(payload, str) else json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}") if length else {}
+
+    def _dispatch(self, method):
+        parts = [p for p in self.path.split("?")[0].split("/") if p]
+        service = self.service
+        try:
+            if method == "GET" and parts == ["health"]:
+                return self._send(200, service.health())
+            if method == "GET" and parts == ["metrics"]:
+                return self._send(200, METRICS.prometheus(), "text/plain; version=0.0.4")
+            if method == "POST" and parts == ["identify"]:
+                body = self._body()
+                return self._send(200, service.identify(body.get("images") or [], bool(body.get("detect"))))
+            if parts[:1] == ["sessions"]:
+                if method == "GET" and len(parts) == 1:
+                    return self._send(200, {"sessions": service.summaries()})
+                if method == "POST" and len(parts) == 1:
+                    return self._send(201, service.start_session(**self._body()))
+                if method == "GET" and len(parts) == 2:
+                    return self._send(200, service.report(int(parts[1])))
+                if method == "POST" and len(parts) == 3 and parts[2] == "stop":
+                    return self._send(200, service.stop_session(int(parts[1])))
+            return self._send(404, {"error": f"No route for {method} {self.path}"})
+        except KeyError as e:
+            return self._send(404, {"error": str(e.args[0])})
+        except FileNotFoundError as e:
+            return self._send(404, {"error": str(e)})
+        except (ValueError, TypeError) as e:
+            return self._send(400, {"error": str(e)})
+        except Exception as e:
+            return self._send(500, {"error": str(e)})
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def log_message(self, format, *args):
+        pass  # Keep the console for session events
+
+
+def serve(gallery_path=GALLERY_FILE, host=DEFAULT_HOST, port=DEFAULT_PORT, embedder="keras",
+          session_ttl=SESSION_TTL):
+    """Run the recognition service until SIGINT/SIGTERM"""
+    if not gallery_exists(gallery_path):
+        print("❌ Model files not found. Run train_model.py first.")
+        return
+
+    t0 = time.time()
+    ServiceHandler.service = service = RecognitionService(gallery_path, embedder, session_ttl)
+    server = ThreadingHTTPServer((host, port), ServiceHandler)
+    server.daemon_threads = True
+
+    def request_stop(signum, _frame):
+        print(f"\n🛑 Received {signal.Signals(signum).name}, stopping...")
+        threading.Thread(target=server.shutdown).start()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, request_stop)
+
+    print(f"✅ Ready in {time.time() - t0:.1f}s, listening on http://{host}:{port}")
+    server.serve_forever()
+
+    server.server_close()
+    service.close()
+    print("✅ Sessions stopped and attendance files closed")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Keep the recognition model loaded and serve local clients")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="Address to listen on (keep it local)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--prototypes", action="store_true",
+                        help=f"Match against the compressed '{PROTOTYPES_FILE}' gallery")
+    parser.add_argument("--gallery", default=None, help="Gallery file to match against")
+    parser.add_argument("--embedder", default="keras",
+                        help="Embedding backend: keras, tflite[:float16|dynamic|int8|path] or stub")
+    parser.add_argument("--session-ttl", type=float, default=SESSION_TTL,
+                        help="Seconds a finished session is kept when no client fetches its summary")
+    args = parser.parse_args()
+
+    serve(args.gallery or (PROTOTYPES_FILE if args.prototypes else GALLERY_FILE), host=args.host, port=args.port,
+          embedder=args.embedder, session_ttl=args.session_ttl)
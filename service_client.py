@@ -0,0 +1,80 @@
+import json
+import base64
+import urllib.error
+import urllib.request
+import cv2
+
+DEFAULT_URL = "http://127.0.0.1:8765"
+
+
+class ServiceError(Exception):
+    """The recognition service answered with an error"""
+
+
+def encode_image(image):
+    """Base64 JPEG for a BGR array; file paths and encoded bytes are sent as they are"""
+    if isinstance(image, str):
+        with open(image, "rb") as f:
+            data = f.read()
+    elif isinstance(image, bytes):
+        data = image
+    else:
+        ok, buf = cv2.imencode(".jpg", image)
+        if not ok:
+            raise ValueError("Could not encode image")
+        data = buf.tobytes()
+    return base64.b64encode(data).decode("ascii")
+
+
+class ServiceClient:
+    """Thin client for service.py; no model is loaded on this side"""
+
+    def __init__(self, url=DEFAULT_URL, timeout=10.0):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def _request(self, method, path, payload=None):
+        data = json.dumps(payload).encode() if payload is not None else None
+        request = urllib.request.Request(self.url + path, data=data, method=method,
+                                         headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            try:
+                message = json.loads(e.read()).get("error", str(e))
+            except ValueError:
+                message = str(e)
+            raise ServiceError(message) from None
+
+    def is_running(self):
+        """True if a service is listening and has its model loaded"""
+        try:
+            return self.health().get("status") == "ok"
+        except (OSError, ServiceError, ValueError):
+            return False
+
+    def health(self):
+        return self._request("GET", "/health")
+
+    def identify(self, images, detect=False):
+        """
+        Identify BGR arrays, image paths or encoded image bytes. Images are
+        face crops unless `detect` is set. Returns one list of faces
+        ({box, label, enrollment, name, distance, margin}) per image.
+        """
+        payload = {"images": [encode_image(img) for img in images], "detect": detect}
+        return self._request("POST", "/identify", payload)["results"]
+
+    def start_session(self, source="0", room=None, duration=None, **options):
+        payload = dict(options, source=str(source), room=room, duration=duration)
+        return self._request("POST", "/sessions", payload)
+
+    def sessions(self):
+        return self._request("GET", "/sessions")["sessions"]
+
+    def session(self, session_id):
+        return self._request("GET", f"/sessions/{session_id}")
+
+    def stop_session(self, session_id):
+        return self._request("POST", f"/sessions/{session_id}/stop", {})
@@ -0,0 +1,104 @@
+import os
+import re
+import time
+import cv2
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+def natural_key(name):
+    """Sort key that orders 'frame2.jpg' before 'frame10.jpg'"""
+    return [int(part) if part.isdigit() else part.lower() for part in re.split(r"(\d+)", name)]
+
+
+class VideoSource:
+    """
+    Frames from a camera index, a video file or a stream URL.
+
+    For files, `seek` skips to that many seconds in and `stride` keeps
+    every stride-th frame; skipped frames are only grabbed, not decoded.
+    Camera and stream frames are stamped with wall-clock time, file
+    frames with their position in the video.
+    """
+
+    def __init__(self, spec, stride=1, seek=0.0):
+        self.spec = spec
+        self.live = isinstance(spec, int) or "://" in spec
+        self.cap = cv2.VideoCapture(spec)
+        self.stride = max(1, stride)
+        self.frames_read = 0
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 25.0
+
+        if seek and not self.live:
+            self.cap.set(cv2.CAP_PROP_POS_MSEC, seek * 1000.0)
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def read(self):
+        """Return (ok, frame, timestamp_seconds)"""
+        for _ in range(self.stride - 1):
+            if not self.cap.grab():
+                return False, None, None
+            self.frames_read += 1
+
+        ret, frame = self.cap.read()
+        if not ret:
+            return False, None, None
+        self.frames_read += 1
+
+        if self.live:
+            return True, frame, time.time()
+        return True, frame, self.cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+
+    def release(self):
+        self.cap.release()
+
+
+class ImageFolderSource:
+    """
+    Frames from a directory of images, in natural file-name order (so
+    unpadded dumps like 2.jpg, 10.jpg play in sequence), treated as a
+    video recorded at `fps` frames per second for seek and timestamps.
+    """
+
+    def __init__(self, path, stride=1, seek=0.0, fps=25.0):
+        self.spec = path
+        self.live = False
+        self.fps = fps
+        self.stride = max(1, stride)
+        self.paths = [os.path.join(path, name)
+                      for name in sorted(os.listdir(path), key=natural_key)
+                      if name.lower().endswith(IMAGE_EXTENSIONS)]
+        self.index = int(seek * fps)
+        self.frames_read = 0
+
+    def isOpened(self):
+        return bool(self.paths)
+
+    def read(self):
+        """Return (ok, frame, timestamp_seconds)"""
+        while self.index < len(self.paths):
+            index = self.index
+            self.index += self.stride
+            self.frames_read += 1
+            frame = cv2.imread(self.paths[index])
+            if frame is not None:
+                return True, frame, index / self.fps
+        return False, None, None
+
+    def release(self):
+        pass
+
+
+def open_source(spec, stride=1, seek=0.0, fps=25.0):
+    """
+    Open a frame source from a command-line style spec: a camera index
+    ("0"), an image folder, or anything cv2.VideoCapture accepts (a video
+    file or a stream URL).
+    """
+    if isinstance(spec, int) or (isinstance(spec, str) and spec.isdigit()):
+        return VideoSource(int(spec))
+    if os.path.isdir(spec):
+        return ImageFolderSource(spec, stride=stride, seek=seek, fps=fps)
+    return VideoSource(spec, stride=stride, seek=seek)
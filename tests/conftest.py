@@ -0,0 +1,30 @@
+import os
+import sys
+import glob
+import cv2
+import numpy as np
+
+# The modules live flat in the repository root
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+from detectors import AdaptiveDetector, create_detector  # noqa: E402
+from embedders import StubEmbedder  # noqa: E402
+
+
+def student_image(label):
+    """First registered photo of a student in the repository's student_images/"""
+    return sorted(glob.glob(os.path.join(REPO, "student_images", label, "*.jpg")))[0]
+
+
+def face_frames(folder, image_path, frames=6):
+    """A frame folder showing one registered face; returns that face's stub embedding"""
+    frame = np.full((240, 320, 3), 96, dtype=np.uint8)
+    frame[40:200, 80:240] = cv2.resize(cv2.imread(image_path), (160, 160))
+    os.makedirs(folder)
+    for i in range(frames):
+        cv2.imwrite(os.path.join(folder, f"{i}.png"), frame)
+
+    # Same detector settings as RecognitionSession, so the live crop is this crop
+    (x, y, w, h), = AdaptiveDetector(create_detector("haar"), scale=0.5).detect(frame)
+    return StubEmbedder().embeddings([cv2.cvtColor(frame[y:y+h, x:x+w], cv2.COLOR_BGR2RGB)])[0]
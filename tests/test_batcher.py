@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+from batcher import EmbeddingBatcher
+
+
+class EchoEmbedder:
+    """Embeds each crop as its own value and records the batch sizes"""
+
+    def __init__(self):
+        self.calls = []
+
+    def embeddings(self, images):
+        self.calls.append(len(images))
+        return np.array([[float(img)] for img in images], dtype=np.float32)
+
+
+def test_batches_across_frames():
+    embedder = EchoEmbedder()
+    batcher = EmbeddingBatcher(embedder, max_batch_size=32, max_frames=2, max_delay=10.0)
+
+    batcher.submit(1, "a")
+    batcher.end_frame()
+    assert batcher.poll(now=batcher.oldest) == []
+
+    batcher.submit(2, "b")
+    batcher.end_frame()
+    results = batcher.poll(now=batcher.oldest)
+
+    assert [(tag, float(emb[0])) for tag, emb in results] == [("a", 1.0), ("b", 2.0)]
+    assert embedder.calls == [2]
+
+
+def test_flushes_on_size_and_delay():
+    batcher = EmbeddingBatcher(EchoEmbedder(), max_batch_size=2, max_frames=5, max_delay=0.05)
+
+    batcher.submit(1, "a")
+    assert not batcher.due(now=batcher.oldest)
+    assert batcher.due(now=batcher.oldest + 0.06)
+
+    batcher.submit(2, "b")
+    assert batcher.due(now=batcher.oldest)
+
+
+def test_flush_splits_into_max_batch_size_calls():
+    embedder = EchoEmbedder()
+    batcher = EmbeddingBatcher(embedder, max_batch_size=2)
+    for i in range(5):
+        batcher.submit(i, i)
+
+    results = batcher.flush()
+
+    assert [tag for tag, _ in results] == [0, 1, 2, 3, 4]
+    assert embedder.calls == [2, 2, 1]
+    assert batcher.mean_batch_size == 5 / 3
+
+
+def test_failed_batch_raises():
+    class Broken:
+        def embeddings(self, images):
+            return None
+
+    batcher = EmbeddingBatcher(Broken())
+    batcher.submit(1, "a")
+    with pytest.raises(ValueError):
+        batcher.flush()
+    assert batcher.pending == []
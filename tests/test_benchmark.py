@@ -0,0 +1,34 @@
+import numpy as np
+from benchmark import compare, run, synthetic_embeddings
+
+
+def test_synthetic_embeddings_are_reproducible():
+    first, labels = synthetic_embeddings(10, per_student=3, dim=32, seed=1)
+    second, _ = synthetic_embeddings(10, per_student=3, dim=32, seed=1)
+
+    np.testing.assert_array_equal(first, second)
+    assert labels.tolist() == np.repeat(np.arange(10), 3).tolist()
+    np.testing.assert_allclose(np.linalg.norm(first, axis=1), 1.0, rtol=1e-5)
+
+
+def test_compare_flags_only_slowdowns_beyond_the_tolerance():
+    baseline = {"results": [{"benchmark": "match", "search": "exact", "students": 100, "queries_per_sec": 1000.0,
+                             "ms_per_query": 1.0}]}
+    slower = {"results": [{"benchmark": "match", "search": "exact", "students": 100, "queries_per_sec": 700.0,
+                           "ms_per_query": 1.1}]}
+    faster = {"results": [{"benchmark": "match", "search": "exact", "students": 100, "queries_per_sec": 1500.0,
+                           "ms_per_query": 0.5}]}
+
+    regressions = compare(baseline, slower, tolerance=0.2)
+
+    assert [r["metric"] for r in regressions] == ["queries_per_sec"]
+    assert compare(baseline, faster) == []
+
+
+def test_small_run_end_to_end(tmp_path):
+    report = run(sizes=(20,), image_students=3, images_per_student=2, attendance_days=2, attendance_rows=5,
+                 student_images=str(tmp_path / "none"), workdir=str(tmp_path / "work"))
+
+    benchmarks = {r["benchmark"] for r in report["results"]}
+    assert benchmarks == {"extraction", "gallery_load", "match", "attendance_load"}
+    assert compare(report, report) == []
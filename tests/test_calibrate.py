@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+from benchmark import synthetic_embeddings, synthetic_label_map
+from calibrate import calibrate, format_problem, global_threshold, scan_distances
+from gallery import save_gallery
+
+
+def clustered(students, per_student=6, spread=0.1):
+    return synthetic_embeddings(students, per_student, dim=32, spread=spread)
+
+
+def write_gallery(tmp_path, embeddings, labels):
+    path = str(tmp_path / "gallery.bin")
+    save_gallery(path, embeddings, labels, synthetic_label_map(int(labels.max()) + 1))
+    return path
+
+
+def test_scan_matches_brute_force():
+    embeddings, labels = clustered(4, per_student=5)
+    dist = np.sqrt(np.clip(2 - 2 * embeddings @ embeddings.T, 0, None))
+    np.fill_diagonal(dist, np.inf)
+    same = labels[:, None] == labels[None, :]
+
+    genuine, impostor, nearest_other, _, _ = scan_distances(embeddings, labels, max_block_mb=0)
+
+    np.testing.assert_allclose(genuine, np.where(same, dist, np.inf).min(axis=1), atol=1e-4)
+    np.testing.assert_allclose(impostor, np.where(same, np.inf, dist).min(axis=1), atol=1e-4)
+    np.testing.assert_array_equal(nearest_other, np.where(same, np.inf, dist).argmin(axis=1))
+
+
+def test_separable_gallery(tmp_path):
+    path = write_gallery(tmp_path, *clustered(5))
+
+    thresholds, report = calibrate(path, far=0.01)
+
+    assert report["problem"] is None
+    assert report["confusable_pairs"] == []
+    assert thresholds["tar"] == 1.0
+    assert thresholds["far"] <= 0.01
+    assert report["nearest_genuine"]["p99"] < thresholds["global"]
+    assert sorted(thresholds["per_student"]) == [0, 1, 2, 3, 4]
+
+
+def test_per_student_thresholds_stay_within_max_adjust(tmp_path):
+    path = write_gallery(tmp_path, *clustered(5, spread=0.3))
+
+    thresholds, _ = calibrate(path, far=0.01, max_adjust=0.1)
+
+    values = np.array(list(thresholds["per_student"].values()))
+    assert np.all(values >= thresholds["global"] * 0.9 - 1e-3)
+    assert np.all(values <= thresholds["global"] * 1.1 + 1e-3)
+
+
+def test_single_student_is_refused(tmp_path):
+    path = write_gallery(tmp_path, *clustered(1))
+
+    with pytest.raises(ValueError, match="two registered students"):
+        calibrate(path)
+    with pytest.raises(ValueError, match="two registered students"):
+        calibrate(path, criterion="eer")
+
+
+def test_eer_needs_several_photos_per_student():
+    with pytest.raises(ValueError, match="at least two photos"):
+        global_threshold(np.full(3, np.inf), np.array([0.5, 0.6, 0.7]), criterion="eer")
+
+
+def test_duplicated_folder_is_reported(tmp_path):
+    embeddings, labels = clustered(4)
+    duplicate = labels == 2
+    embeddings = np.concatenate([embeddings, embeddings[duplicate]])
+    labels = np.concatenate([labels, np.full(duplicate.sum(), 4)])
+    path = write_gallery(tmp_path, embeddings, labels)
+
+    thresholds, report = calibrate(path, far=0.01)
+
+    assert thresholds["tar"] < 0.5
+    assert "duplicated or mislabelled" in report["problem"]
+    assert report["confusable_pairs"] == [{"students": ["000002_Student2", "000004_Student4"], "rows": 12}]
+    assert "000002_Student2 / 000004_Student4: 12 photos" in "\n".join(format_problem(report))
@@ -0,0 +1,79 @@
+import os
+import cv2
+import numpy as np
+import pytest
+from detectors import AdaptiveDetector, _merge_regions, create_detector
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class BrightBlobDetector:
+    """Finds every white square in the image"""
+
+    def __init__(self):
+        self.shapes = []
+
+    def detect(self, image):
+        self.shapes.append(image.shape[:2])
+        count, _, stats, _ = cv2.connectedComponentsWithStats((image > 128).astype(np.uint8))
+        return [tuple(int(v) for v in stats[i, :4]) for i in range(1, count)]
+
+
+def frame_with_faces(*boxes, size=(480, 640)):
+    frame = np.zeros(size, dtype=np.uint8)
+    for x, y, w, h in boxes:
+        frame[y:y + h, x:x + w] = 255
+    return frame
+
+
+def test_boxes_are_in_full_frame_coordinates():
+    detector = AdaptiveDetector(BrightBlobDetector(), scale=0.5)
+
+    boxes = detector.detect(frame_with_faces((100, 60, 80, 80)))
+
+    assert boxes == [(100, 60, 80, 80)]
+    assert detector.detector.shapes == [(240, 320)]
+
+
+def test_roi_scans_between_full_scans():
+    inner = BrightBlobDetector()
+    detector = AdaptiveDetector(inner, scale=0.5, roi_margin=0.5, full_scan_interval=3)
+    frame = frame_with_faces((100, 60, 80, 80))
+
+    results = [detector.detect(frame) for _ in range(4)]
+
+    assert all(boxes == [(100, 60, 80, 80)] for boxes in results)
+    assert (detector.full_scans, detector.roi_scans) == (2, 2)
+    # The ROI is the face plus half its size on every side
+    assert inner.shapes[1] == (80, 80)
+    assert detector.scanned_fraction < 1.0
+
+
+def test_newcomer_is_found_at_the_next_full_scan():
+    detector = AdaptiveDetector(BrightBlobDetector(), scale=1.0, full_scan_interval=2)
+    detector.detect(frame_with_faces((100, 60, 80, 80)))
+
+    both = frame_with_faces((100, 60, 80, 80), (400, 300, 80, 80))
+    assert len(detector.detect(both)) == 1
+    assert len(detector.detect(both)) == 2
+
+
+def test_merge_regions():
+    merged = _merge_regions([(0, 0, 10, 10), (5, 5, 20, 20), (30, 30, 40, 40)])
+    assert sorted(map(tuple, merged)) == [(0, 0, 20, 20), (30, 30, 40, 40)]
+
+
+def test_haar_finds_the_face_of_a_registered_image():
+    image = cv2.imread(os.path.join(REPO, "student_images", "67_rivansh", "1.jpg"))
+
+    boxes = create_detector("haar").detect(image)
+
+    assert len(boxes) == 1
+    x, y, w, h = boxes[0]
+    assert w > image.shape[1] // 2 and 0 <= x and x + w <= image.shape[1]
+    assert create_detector("haar").detect(np.zeros((100, 100), dtype=np.uint8)) == []
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        create_detector("sonar")
@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+from embedders import create_embedder, embedder_family, embedder_name
+
+
+def test_embedder_name_without_loading_a_model():
+    assert embedder_name("keras") == "keras"
+    assert embedder_name("stub") == create_embedder("stub").name
+    assert embedder_name("tflite") == "tflite:facenet_dynamic.tflite"
+    assert embedder_name("tflite:int8") == "tflite:facenet_int8.tflite"
+    assert embedder_name("tflite:/models/custom.tflite") == "tflite:custom.tflite"
+    with pytest.raises(ValueError):
+        embedder_name("onnx")
+
+
+def test_families():
+    assert embedder_family("keras") == embedder_family("tflite:facenet_int8.tflite") == "facenet"
+    assert embedder_family("stub") == "stub"
+
+
+def test_stub_embeddings_are_unit_rows_and_deterministic():
+    rng = np.random.default_rng(0)
+    images = [rng.integers(0, 256, (60, 50, 3), dtype=np.uint8) for _ in range(3)]
+
+    first = create_embedder("stub").embeddings(images)
+    second = create_embedder("stub").embeddings(images)
+
+    assert first.shape == (3, 512)
+    np.testing.assert_allclose(np.linalg.norm(first, axis=1), 1.0, rtol=1e-5)
+    np.testing.assert_array_equal(first, second)
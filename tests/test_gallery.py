@@ -0,0 +1,115 @@
+import numpy as np
+import pytest
+from benchmark import synthetic_embeddings
+from gallery import compute_prototypes, evaluate_prototypes, load_gallery, save_gallery, update_metadata
+
+LABEL_MAP = {"001_Asha": 0, "002_Ben": 1, "003_Chen": 2}
+
+
+def random_gallery(rows=30, dim=16, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.standard_normal((rows, dim)).astype(np.float32), rng.integers(0, 3, rows)
+
+
+@pytest.mark.parametrize("mmap", [True, False])
+def test_round_trip(tmp_path, mmap):
+    path = str(tmp_path / "gallery.bin")
+    embeddings, labels = random_gallery()
+
+    save_gallery(path, embeddings, labels, LABEL_MAP, metadata={"embedder": "stub"})
+    gallery = load_gallery(path, mmap=mmap)
+
+    expected = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    np.testing.assert_allclose(gallery.embeddings, expected, rtol=1e-6)
+    np.testing.assert_array_equal(gallery.labels, labels)
+    assert gallery.label_map == LABEL_MAP
+    assert gallery.metadata == {"embedder": "stub"}
+    assert gallery.class_count == 3
+
+
+def test_float16_round_trip(tmp_path):
+    path = str(tmp_path / "gallery.bin")
+    embeddings, labels = random_gallery()
+
+    save_gallery(path, embeddings, labels, LABEL_MAP, dtype="float16")
+    gallery = load_gallery(path)
+
+    assert gallery.embeddings.dtype == np.float16
+    np.testing.assert_allclose(np.linalg.norm(gallery.embeddings.astype(np.float32), axis=1), 1.0, atol=1e-3)
+
+
+def test_empty_gallery(tmp_path):
+    path = str(tmp_path / "gallery.bin")
+    save_gallery(path, np.zeros((0, 16), dtype=np.float32), [], {})
+
+    gallery = load_gallery(path)
+
+    assert len(gallery) == 0 and gallery.embeddings.shape == (0, 16)
+
+
+def test_update_metadata_keeps_the_matrix(tmp_path):
+    path = str(tmp_path / "gallery.bin")
+    embeddings, labels = random_gallery()
+    save_gallery(path, embeddings, labels, LABEL_MAP, metadata={"embedder": "stub"})
+    before = load_gallery(path, mmap=False)
+
+    update_metadata(path, thresholds={"global": 0.8})
+    after = load_gallery(path, mmap=False)
+
+    np.testing.assert_array_equal(after.embeddings, before.embeddings)
+    assert after.metadata == {"embedder": "stub", "thresholds": {"global": 0.8}}
+
+
+def test_subset_keeps_only_the_given_students(tmp_path):
+    path = str(tmp_path / "gallery.bin")
+    embeddings, labels = random_gallery()
+    save_gallery(path, embeddings, labels, LABEL_MAP)
+    gallery = load_gallery(path)
+
+    subset = gallery.subset([1])
+    assert set(subset.labels) == {1} and len(subset) == np.sum(labels == 1)
+    assert subset.label_map == {"002_Ben": 1}
+    assert len(gallery.subset([])) == 0
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "not_a_gallery.bin"
+    path.write_bytes(b"x" * 64)
+    with pytest.raises(ValueError):
+        load_gallery(str(path))
+
+
+def clustered_embeddings(students=4, per_student=20):
+    return synthetic_embeddings(students, per_student, dim=32, spread=0.2)
+
+
+@pytest.mark.parametrize("method", ["kmeans", "medoids"])
+def test_prototypes_per_student(method):
+    embeddings, labels = clustered_embeddings()
+
+    protos, proto_labels = compute_prototypes(embeddings, labels, 3, method=method)
+
+    assert np.bincount(proto_labels).tolist() == [3, 3, 3, 3]
+    np.testing.assert_allclose(np.linalg.norm(protos, axis=1), 1.0, rtol=1e-5)
+    if method == "medoids":
+        # Every medoid is one of the student's own rows
+        assert all(np.isclose(embeddings[labels == label] @ proto, 1.0).any()
+                   for proto, label in zip(protos, proto_labels))
+
+
+def test_prototypes_keep_small_students_whole():
+    embeddings, labels = clustered_embeddings(students=1, per_student=2)
+
+    protos, proto_labels = compute_prototypes(embeddings, labels, 5)
+
+    np.testing.assert_allclose(protos, embeddings, rtol=1e-6)
+    assert proto_labels.tolist() == [0, 0]
+
+
+def test_evaluate_prototypes_on_separable_students():
+    embeddings, labels = clustered_embeddings()
+
+    report = evaluate_prototypes(embeddings, labels, 2)
+
+    assert report["prototype_rows"] == 8 and report["queries"] == 16
+    assert report["full_accuracy"] == 1.0 and report["prototype_accuracy"] == 1.0
@@ -0,0 +1,82 @@
+import os
+import threading
+import cv2
+import numpy as np
+from image_writer import ImageWriter, enhance_face
+
+
+def face(value=100):
+    return np.full((20, 20, 3), value, dtype=np.uint8)
+
+
+def test_enhance_face_returns_grayscale():
+    assert enhance_face(face()).shape == (20, 20)
+
+
+def test_writes_are_reported_once(tmp_path):
+    writer = ImageWriter(workers=2)
+    paths = [str(tmp_path / f"{i}.jpg") for i in range(5)]
+    for path in paths:
+        assert writer.submit(face(), path)
+
+    assert writer.flush(timeout=5)
+    done = writer.completed()
+    assert sorted(path for path, _ in done) == paths
+    assert all(error is None for _, error in done)
+    assert all(os.path.exists(path) for path in paths)
+    assert writer.written == 5 and writer.failed == 0
+    assert writer.completed() == []
+    writer.close()
+
+
+def test_full_queue_rejects_instead_of_blocking(tmp_path):
+    release = threading.Event()
+
+    def slow(img):
+        release.wait(5)
+        return img
+
+    writer = ImageWriter(workers=1, max_pending=2, process=slow)
+    assert writer.submit(face(), str(tmp_path / "0.jpg"))
+    assert writer.submit(face(), str(tmp_path / "1.jpg"))
+    assert not writer.submit(face(), str(tmp_path / "2.jpg"))
+    assert writer.pending == 2
+
+    release.set()
+    writer.close()
+    assert writer.written == 2
+
+
+def test_crop_is_copied_on_submit(tmp_path):
+    release = threading.Event()
+
+    def slow(img):
+        release.wait(5)
+        return img
+
+    writer = ImageWriter(workers=1, process=slow)
+    img = face(50)
+    path = str(tmp_path / "crop.png")
+    writer.submit(img, path)
+    img[:] = 255  # The camera loop draws on the frame afterwards
+    release.set()
+    writer.close()
+
+    assert cv2.imread(path, cv2.IMREAD_UNCHANGED).max() == 50
+
+
+def test_failures_are_reported(tmp_path):
+    def broken(img):
+        raise RuntimeError("no face")
+
+    writer = ImageWriter(workers=1)
+    writer.submit(face(), str(tmp_path / "missing" / "0.jpg"))
+    writer.flush(timeout=5)
+    writer.process = broken
+    writer.submit(face(), str(tmp_path / "1.jpg"))
+    writer.close()
+
+    errors = [error for _, error in writer.completed()]
+    assert isinstance(errors[0], IOError)
+    assert isinstance(errors[1], RuntimeError)
+    assert writer.written == 0 and writer.failed == 2
@@ -0,0 +1,70 @@
+import numpy as np
+from benchmark import synthetic_embeddings
+from gallery import l2_normalize, load_gallery, save_gallery
+from ivf import IVFIndex, evaluate_recall, exact_search, index_path, load_index, tune_nprobe
+from matcher import GalleryMatcher
+
+
+def clustered_gallery(students=200, per_student=10):
+    return synthetic_embeddings(students, per_student, dim=64, spread=0.3)
+
+
+def test_full_probe_is_exact():
+    embeddings, labels = clustered_gallery()
+    index = IVFIndex.build(embeddings, labels, n_lists=32)
+    queries = embeddings[::97]
+
+    sims, idx = index.search(embeddings, queries, 5, nprobe=index.n_lists)
+
+    exact_sims, exact_idx = exact_search(embeddings, queries, 5)
+    np.testing.assert_array_equal(idx, exact_idx)
+    np.testing.assert_allclose(sims, exact_sims, rtol=1e-5)
+
+
+def test_tuned_nprobe_reaches_the_target_recall():
+    embeddings, labels = clustered_gallery()
+    index = IVFIndex.build(embeddings, labels, n_lists=32)
+
+    index.nprobe, _ = tune_nprobe(index, embeddings, target_recall=0.95, queries=200)
+
+    assert index.nprobe < index.n_lists
+    recall = evaluate_recall(index, embeddings, [index.nprobe], queries=300, seed=1)[0]["recall"]
+    assert recall >= 0.9
+
+
+def test_every_row_is_in_exactly_one_list():
+    embeddings, labels = clustered_gallery(students=20)
+    index = IVFIndex.build(embeddings, labels, n_lists=7)
+    assert sorted(index.order.tolist()) == list(range(len(embeddings)))
+    assert index.offsets[-1] == len(embeddings)
+
+
+def test_small_lists_are_topped_up_to_k():
+    embeddings, labels = clustered_gallery(students=3, per_student=2)
+    index = IVFIndex.build(embeddings, labels, n_lists=6)
+
+    sims, idx = index.search(embeddings, embeddings[:2], 4, nprobe=1)
+
+    assert idx.shape == (2, 4) and len(set(idx[0])) == 4
+
+
+def test_stale_index_is_ignored(tmp_path):
+    path = str(tmp_path / "gallery.bin")
+    embeddings, labels = clustered_gallery(students=20)
+    save_gallery(path, embeddings, labels, {})
+    gallery = load_gallery(path)
+    IVFIndex.build(np.asarray(gallery.embeddings), gallery.labels, n_lists=8).save(index_path(path))
+    assert load_index(gallery) is not None
+
+    save_gallery(path, embeddings[::-1], labels[::-1], {})
+    assert load_index(load_gallery(path)) is None
+
+
+def test_matcher_through_the_index():
+    embeddings, labels = clustered_gallery()
+    index = IVFIndex.build(embeddings, labels, n_lists=32)
+    exact = GalleryMatcher(embeddings, labels)
+    approximate = GalleryMatcher(embeddings, labels, index=index, nprobe=8)
+    queries = l2_normalize(embeddings[::13] + 0.05)
+
+    assert np.mean(exact.match(queries)[0] == approximate.match(queries)[0]) >= 0.95
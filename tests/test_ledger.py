@@ -0,0 +1,104 @@
+import sys
+import threading
+from datetime import datetime, timedelta
+from ledger import AttendanceLedger, DailyLedger, read_attendance
+
+
+def test_marks_each_student_once(tmp_path):
+    path = str(tmp_path / "attendance.csv")
+    with AttendanceLedger(path) as ledger:
+        assert ledger.mark("001", "Asha", datetime(2025, 8, 20, 9, 0, 0))
+        assert not ledger.mark("001", "Asha", datetime(2025, 8, 20, 9, 5, 0))
+        assert ledger.mark("002", "Ben", datetime(2025, 8, 20, 9, 1, 0))
+        assert len(ledger) == 2 and "001" in ledger
+
+    assert read_attendance(path) == [("2025-08-20", "09:00:00", "001", "Asha"),
+                                     ("2025-08-20", "09:01:00", "002", "Ben")]
+
+
+def test_reopening_keeps_earlier_marks(tmp_path):
+    path = str(tmp_path / "attendance.csv")
+    with AttendanceLedger(path) as ledger:
+        ledger.mark("001", "Asha")
+
+    with AttendanceLedger(path) as ledger:
+        assert "001" in ledger
+        assert not ledger.mark("001", "Asha")
+        assert ledger.mark("002", "Ben")
+
+    with open(path) as f:
+        assert f.read().count("Date,Time,Enrollment,Name") == 1
+
+
+def test_read_attendance_fills_missing_names(tmp_path):
+    path = tmp_path / "attendance.csv"
+    path.write_text("Date,Time,Enrollment\n2025-08-20,09:00:00,001\n")
+
+    assert read_attendance(str(path), {0: "001_Asha"}) == [("2025-08-20", "09:00:00", "001", "Asha")]
+
+
+def test_read_attendance_matches_the_whole_enrollment(tmp_path):
+    path = tmp_path / "attendance.csv"
+    path.write_text("Date,Time,Enrollment\n2025-08-20,09:00:00,7\n2025-08-20,09:01:00,8\n")
+    label_map = {0: "67_rivansh", 1: "17_Asha", 2: "7_Ben"}
+
+    rows = read_attendance(str(path), label_map)
+
+    assert [row[3] for row in rows] == ["Ben", "Unknown"]
+
+
+def daily_ledger(tmp_path, now):
+    return DailyLedger(lambda day: str(tmp_path / f"attendance_{day:%Y-%m-%d}.csv"), now)
+
+
+def test_midnight_rollover(tmp_path):
+    evening = datetime(2025, 8, 20, 23, 59, 30)
+    with daily_ledger(tmp_path, evening) as ledger:
+        assert ledger.mark("001", "Asha", evening)
+        assert ledger.mark("001", "Asha", datetime(2025, 8, 21, 0, 0, 10))
+        assert ledger.filename.endswith("attendance_2025-08-21.csv")
+        assert len(ledger.records) == 2
+
+    assert [row[0] for row in read_attendance(str(tmp_path / "attendance_2025-08-20.csv"))] == ["2025-08-20"]
+    assert [row[0] for row in read_attendance(str(tmp_path / "attendance_2025-08-21.csv"))] == ["2025-08-21"]
+
+
+def test_late_frame_does_not_roll_back(tmp_path):
+    with daily_ledger(tmp_path, datetime(2025, 8, 20, 23, 59)) as ledger:
+        ledger.mark("001", "Asha", datetime(2025, 8, 21, 0, 0, 1))
+
+        # A frame captured before midnight but processed after the switch
+        assert not ledger.rollover(datetime(2025, 8, 20, 23, 59, 59))
+        assert ledger.mark("002", "Ben", datetime(2025, 8, 20, 23, 59, 59))
+        assert ledger.filename.endswith("attendance_2025-08-21.csv")
+        assert not ledger.mark("001", "Asha", datetime(2025, 8, 21, 0, 0, 2))
+
+    assert [row[2] for row in read_attendance(str(tmp_path / "attendance_2025-08-21.csv"))] == ["001", "002"]
+
+
+def test_concurrent_rollover_never_writes_to_a_closed_file(tmp_path):
+    day = datetime(2025, 8, 20, 9, 0)
+    ledger = daily_ledger(tmp_path, day)
+    errors = []
+
+    def mark_all():
+        try:
+            for i in range(300):
+                ledger.mark(f"{i:03d}", "Student", day + timedelta(days=i // 100))
+        except Exception as e:
+            errors.append(e)
+
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)  # Switch threads as often as possible
+    try:
+        marker = threading.Thread(target=mark_all)
+        marker.start()
+        while marker.is_alive():
+            ledger.rollover(day + timedelta(days=2))
+        marker.join()
+    finally:
+        sys.setswitchinterval(switch_interval)
+    ledger.close()
+
+    assert errors == []
+    assert len(ledger.records) == 300
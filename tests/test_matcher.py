@@ -0,0 +1,74 @@
+import numpy as np
+from gallery import l2_normalize
+from matcher import GalleryMatcher
+from recognize import match_labels
+
+
+def random_rows(n, dim=16, seed=0):
+    return l2_normalize(np.random.default_rng(seed).standard_normal((n, dim)))
+
+
+def test_blockwise_search_matches_brute_force():
+    gallery = random_rows(500)
+    queries = random_rows(20, seed=1)
+    matcher = GalleryMatcher(gallery, np.arange(500), k=5, block_rows=64)
+
+    sims, idx = matcher.search(queries)
+
+    expected = np.argsort(-(queries @ gallery.T), axis=1)[:, :5]
+    np.testing.assert_array_equal(idx, expected)
+    np.testing.assert_allclose(sims, np.take_along_axis(queries @ gallery.T, expected, axis=1), rtol=1e-5)
+
+
+def test_match_votes_and_distances():
+    gallery = random_rows(3)
+    labels = np.array([7, 7, 9])
+    matcher = GalleryMatcher(gallery, labels, k=3)
+
+    pred, distances, margins = matcher.match(gallery[2] + 0.01 * gallery[0])
+
+    # Label 7 outvotes the nearest row (label 9) two to one
+    assert pred.tolist() == [7]
+    nearest_7 = np.max(l2_normalize(gallery[2:3] + 0.01 * gallery[0:1]) @ gallery[:2].T)
+    np.testing.assert_allclose(distances, np.sqrt(2 - 2 * nearest_7), rtol=1e-5)
+    np.testing.assert_allclose(margins, [1 / 3], rtol=1e-6)
+
+
+def test_vote_tie_goes_to_the_nearest_row():
+    gallery = random_rows(2)
+    matcher = GalleryMatcher(gallery, np.array([1, 2]), k=2)
+
+    pred, distances, margins = matcher.match(gallery)
+
+    assert pred.tolist() == [1, 2]
+    np.testing.assert_allclose(distances, 0.0, atol=1e-3)
+    assert margins.tolist() == [0.0, 0.0]
+
+
+def test_k_is_capped_by_the_gallery_size():
+    matcher = GalleryMatcher(random_rows(2), np.array([0, 1]), k=3)
+    assert matcher.k == 2
+
+
+def test_float16_gallery_is_widened():
+    gallery = random_rows(10).astype(np.float16)
+    matcher = GalleryMatcher(gallery, np.arange(10))
+    assert matcher.embeddings.dtype == np.float32
+    assert matcher.match(gallery[4].astype(np.float32))[0].tolist() == [4]
+
+
+def test_match_labels_applies_the_thresholds():
+    gallery = random_rows(2)
+    matcher = GalleryMatcher(gallery, np.array([0, 1]), k=1)
+    label_map = {0: "001_Asha", 1: "002_Ben"}
+    queries = l2_normalize(gallery + 0.3 * random_rows(2, seed=5))
+    distances = matcher.match(queries)[1]
+
+    loose = match_labels(matcher, label_map, queries, threshold=distances.max() + 0.01)
+    strict = match_labels(matcher, label_map, queries, threshold=distances.min() - 0.01)
+    per_student = match_labels(matcher, label_map, queries, threshold=distances.max() + 0.01,
+                               per_label={1: distances[1] - 0.01})
+
+    assert [label for label, _, _ in loose] == ["001_Asha", "002_Ben"]
+    assert [label for label, _, _ in strict] == ["Unknown", "Unknown"]
+    assert [label for label, _, _ in per_student] == ["001_Asha", "Unknown"]
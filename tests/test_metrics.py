@@ -0,0 +1,52 @@
+import json
+from metrics import Metrics, MetricsExporter
+
+
+def test_timers_counters_and_snapshot():
+    metrics = Metrics()
+    for value in (0.01, 0.02, 0.03):
+        metrics.observe("detect_seconds", value)
+    with metrics.timer("match"):
+        pass
+    metrics.count("frames", 3)
+
+    snap = metrics.snapshot()
+
+    detect = snap["summaries"]["detect_seconds"]
+    assert detect["count"] == 3 and abs(detect["sum"] - 0.06) < 1e-9 and detect["max"] == 0.03
+    assert abs(detect["p50"] - 0.02) < 1e-9
+    assert snap["summaries"]["match_seconds"]["count"] == 1
+    assert snap["counters"]["frames"]["total"] == 3
+    json.dumps(snap)
+
+
+def test_prometheus_text():
+    metrics = Metrics()
+    metrics.observe("detect_seconds", 0.5)
+    metrics.count("marked")
+
+    text = metrics.prometheus()
+
+    assert "# TYPE face_attendance_detect_seconds summary" in text
+    assert 'face_attendance_detect_seconds{quantile="0.5"} 0.5' in text
+    assert "face_attendance_detect_seconds_count 1" in text
+    assert "face_attendance_marked_total 1" in text
+
+
+def test_window_keeps_recent_observations():
+    metrics = Metrics(window=2)
+    for value in (100.0, 1.0, 1.0):
+        metrics.observe("x", value)
+    summary = metrics.snapshot()["summaries"]["x"]
+    assert summary["p99"] == 1.0 and summary["max"] == 100.0 and summary["count"] == 3
+
+
+def test_exporter_writes_the_final_numbers(tmp_path):
+    metrics = Metrics()
+    exporter = MetricsExporter(str(tmp_path / "m.json"), str(tmp_path / "m.prom"), interval=60.0, metrics=metrics)
+    exporter.start()
+    metrics.count("frames")
+    exporter.stop()
+
+    assert json.loads((tmp_path / "m.json").read_text())["counters"]["frames"]["total"] == 1
+    assert "face_attendance_frames_total 1" in (tmp_path / "m.prom").read_text()
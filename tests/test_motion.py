@@ -0,0 +1,42 @@
+import numpy as np
+from motion import MotionGate
+
+
+def still_frame():
+    return np.full((120, 160, 3), 90, dtype=np.uint8)
+
+
+def moving_frame(offset):
+    frame = still_frame()
+    frame[40:80, offset:offset + 30] = 250
+    return frame
+
+
+def test_still_room_goes_idle_with_keepalive_frames():
+    gate = MotionGate(idle_after=1.0, idle_fps=2.0, keepalive=5.0)
+
+    admitted = [gate.admit(still_frame(), ts) for ts in np.arange(0.0, 10.0, 0.5)]
+
+    # Motion at the first frame keeps the gate open for 1s, then one frame every 5s
+    assert [ts for ts, ok in zip(np.arange(0.0, 10.0, 0.5), admitted) if ok] == [0.0, 0.5, 1.0, 6.0]
+    assert gate.idle and gate.poll_delay == 0.5
+    assert gate.skipped_fraction == 16 / 20
+
+
+def test_motion_switches_back_to_full_rate():
+    gate = MotionGate(idle_after=1.0, keepalive=100.0)
+    for ts in np.arange(0.0, 3.0, 0.5):
+        gate.admit(still_frame(), ts)
+    assert gate.idle
+
+    assert gate.admit(moving_frame(20), 3.0)
+    assert not gate.idle and gate.poll_delay == 0.0
+    assert gate.admit(moving_frame(60), 3.5)
+    assert gate.admit(still_frame(), 4.0)
+
+
+def test_motion_measure():
+    gate = MotionGate()
+    assert gate.motion(still_frame()) == 1.0
+    assert gate.motion(still_frame()) == 0.0
+    assert gate.motion(moving_frame(20)) > gate.threshold
@@ -0,0 +1,56 @@
+import os
+import csv
+import json
+from datetime import datetime
+import numpy as np
+import pytest
+import multi_camera
+from conftest import face_frames, student_image
+from gallery import save_gallery
+from multi_camera import parse_sources, room_filename, run_cameras
+
+
+def test_parse_sources_from_specs_and_config(tmp_path):
+    config = tmp_path / "rooms.json"
+    config.write_text(json.dumps([{"room": "B204", "source": "rtsp://cam/1", "section": "CS101-A"}]))
+
+    sources = parse_sources(["A101=0", "lec.avi"], config=str(config), sections=["A101=MA201"])
+
+    assert sources == [("B204", "rtsp://cam/1", "CS101-A"), ("A101", "0", "MA201"), ("cam2", "lec.avi", None)]
+
+
+def test_parse_sources_rejects_bad_rooms():
+    with pytest.raises(ValueError, match="Duplicate"):
+        parse_sources(["A101=0", "A101=1"])
+    with pytest.raises(ValueError, match="unknown rooms"):
+        parse_sources(["A101=0"], sections=["B204=CS101-A"])
+
+
+def test_room_filename():
+    assert room_filename("B204", datetime(2025, 8, 20)).endswith("attendance_2025-08-20_B204.csv")
+
+
+def test_rooms_share_one_batcher_and_keep_their_own_files(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("attendance")
+    a101, b204 = str(tmp_path / "A101"), str(tmp_path / "B204")
+    rivansh = face_frames(a101, student_image("67_rivansh"))
+    atish = face_frames(b204, student_image("68_Atish"))
+    save_gallery("gallery.bin", np.stack([rivansh, atish]), [0, 1], {"67_rivansh": 0, "68_Atish": 1},
+                 metadata={"embedder": "stub"})
+
+    sessions = []
+    session_class = multi_camera.RecognitionSession
+
+    def recording_session(*args, **kwargs):
+        sessions.append(session_class(*args, **kwargs))
+        return sessions[-1]
+    monkeypatch.setattr(multi_camera, "RecognitionSession", recording_session)
+
+    run_cameras([("A101", a101, None), ("B204", b204, None)], gallery_path="gallery.bin", embedder="stub",
+                duration=20, status_interval=0)
+
+    assert len(sessions) == 2 and sessions[0].batcher is sessions[1].batcher
+    for room, enrollment in (("A101", "67"), ("B204", "68")):
+        with open(room_filename(room)) as f:
+            assert [row["Enrollment"] for row in csv.DictReader(f)] == [enrollment]
@@ -0,0 +1,46 @@
+import time
+from pipeline import DropOldestQueue, Pipeline
+
+
+def test_drop_oldest_queue_keeps_the_newest_items():
+    q = DropOldestQueue(2)
+    for item in range(5):
+        q.put(item)
+
+    assert [q.get(), q.get(), q.get(timeout=0.01)] == [3, 4, None]
+    assert q.dropped == 3
+
+
+def test_pipeline_runs_every_item_and_finishes():
+    items = iter(range(20))
+    seen = []
+    pipeline = Pipeline()
+    source = pipeline.add_stage("source", lambda: next(items, StopIteration), queue_depth=32)
+    squared = pipeline.add_stage("square", lambda x: x * x, source, queue_depth=32)
+    pipeline.add_stage("collect", seen.append, squared, queue_depth=32)
+
+    pipeline.start()
+    deadline = time.time() + 5
+    while pipeline.running and time.time() < deadline:
+        time.sleep(0.01)
+    pipeline.stop()
+
+    assert seen == [x * x for x in range(20)]
+    assert [s["processed"] for s in pipeline.stats()] == [20, 20, 20]
+
+
+def test_stage_errors_skip_the_item():
+    items = iter([1, 0, 2])
+    seen = []
+    pipeline = Pipeline()
+    source = pipeline.add_stage("source", lambda: next(items, StopIteration), queue_depth=8)
+    inverted = pipeline.add_stage("invert", lambda x: 1 / x, source, queue_depth=8)
+    pipeline.add_stage("collect", seen.append, inverted, queue_depth=8)
+
+    pipeline.start()
+    deadline = time.time() + 5
+    while pipeline.running and time.time() < deadline:
+        time.sleep(0.01)
+    pipeline.stop()
+
+    assert seen == [1.0, 0.5]
@@ -0,0 +1,47 @@
+import cv2
+import numpy as np
+from quality import QualityGate
+
+
+def textured_frame(seed=0):
+    """A frame whose left face box is sharp and whose right one is blurred"""
+    rng = np.random.default_rng(seed)
+    frame = np.full((200, 400, 3), 128, dtype=np.uint8)
+    face = rng.integers(40, 220, (100, 100, 3), dtype=np.uint8)
+    frame[50:150, 20:120] = face
+    frame[50:150, 220:320] = cv2.GaussianBlur(face, (31, 31), 10)
+    return frame
+
+
+def test_rejects_small_blurred_dark_and_flat_faces():
+    frame = textured_frame()
+    rng = np.random.default_rng(1)
+    frame[0:40, 330:370] = rng.integers(0, 30, (40, 40, 3))        # dark
+    frame[150:200, 340:390] = rng.integers(116, 140, (50, 50, 3))  # flat
+    gate = QualityGate()
+    boxes = [(20, 50, 100, 100), (220, 50, 100, 100), (20, 50, 20, 20), (330, 0, 40, 40), (340, 150, 50, 50)]
+
+    ok = gate.check(frame, boxes)
+
+    assert ok.tolist() == [True, False, False, False, False]
+    assert +gate.rejected == {"blurred": 1, "small": 1, "dark": 1, "flat": 1}
+    assert gate.checked == 5 and gate.skipped == 4
+    assert "skipped 4 of 5" in gate.format_report()
+
+
+def test_scores_are_size_independent():
+    frame = textured_frame()
+    large = cv2.resize(frame, None, fx=2, fy=2, interpolation=cv2.INTER_NEAREST)
+    gate = QualityGate()
+
+    small_scores = gate.scores(frame, [(20, 50, 100, 100)])
+    large_scores = gate.scores(large, [(40, 100, 200, 200)])
+
+    np.testing.assert_allclose(small_scores["brightness"], large_scores["brightness"], rtol=0.02)
+    np.testing.assert_allclose(small_scores["sharpness"], large_scores["sharpness"], rtol=0.3)
+
+
+def test_no_boxes_and_boxes_off_the_frame():
+    gate = QualityGate()
+    assert gate.check(textured_frame(), []).tolist() == []
+    assert gate.check(textured_frame(), [(500, 500, 60, 60)]).tolist() == [False]
@@ -0,0 +1,36 @@
+import os
+import csv
+from datetime import datetime
+import numpy as np
+from conftest import face_frames, student_image
+from gallery import save_gallery
+from ledger import AttendanceLedger
+from recognize import FaceRecognizer, RecognitionSession, get_today_filename, process_recording
+
+
+def test_recording_past_midnight_continues_in_the_next_days_file(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("attendance")
+    frames = str(tmp_path / "frames")
+    rivansh = face_frames(frames, student_image("67_rivansh"), frames=8)
+    save_gallery("gallery.bin", np.stack([rivansh, -rivansh]), [0, 1], {"67_rivansh": 0, "68_Atish": 1},
+                 metadata={"embedder": "stub"})
+
+    # One frame per second from 23:59:56, so the face is seen on both days
+    process_recording(frames, gallery_path="gallery.bin", fps=1.0, start=datetime(2025, 8, 20, 23, 59, 56),
+                      embedder="stub")
+
+    for day in (datetime(2025, 8, 20), datetime(2025, 8, 21)):
+        with open(get_today_filename(day)) as f:
+            rows = list(csv.DictReader(f))
+        assert [(row["Date"], row["Enrollment"]) for row in rows] == [(day.strftime("%Y-%m-%d"), "67")]
+
+
+def test_quality_gate_is_opt_in(tmp_path):
+    path = str(tmp_path / "gallery.bin")
+    save_gallery(path, np.eye(2, 512), [0, 1], {"67_rivansh": 0, "68_Atish": 1}, metadata={"embedder": "stub"})
+    recognizer = FaceRecognizer(path, embedder="stub")
+
+    with AttendanceLedger(str(tmp_path / "attendance.csv")) as ledger:
+        assert RecognitionSession(recognizer, ledger).quality is None
+        assert RecognitionSession(recognizer, ledger, quality_gate=True, min_face=60).quality.min_size == 60
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+from gallery import l2_normalize, save_gallery
+from matcher import GalleryMatcher
+from recognize import FaceRecognizer, RosterMatcher
+from roster import load_roster, roster_label_ids
+
+LABEL_MAP = {"001_Asha": 0, "002_Ben": 1, "003_Chen": 2}
+
+
+@pytest.fixture
+def recognizer(tmp_path):
+    rng = np.random.default_rng(0)
+    labels = np.repeat([0, 1, 2], 4)
+    embeddings = l2_normalize(rng.standard_normal((3, 512))[labels] + 0.1 * rng.standard_normal((12, 512)))
+    path = str(tmp_path / "gallery.bin")
+    save_gallery(path, embeddings, labels, LABEL_MAP, metadata={"embedder": "stub"})
+    recognizer = FaceRecognizer(path, embedder="stub")
+    recognizer.queries = embeddings[::4]  # one photo of each student
+    return recognizer
+
+
+def write_roster(tmp_path, text):
+    path = tmp_path / "section.txt"
+    path.write_text(text)
+    return str(path)
+
+
+def test_load_roster_formats(tmp_path):
+    assert load_roster(write_roster(tmp_path, "001\n002_Ben  # late joiner\n\n")) == {"001", "002"}
+
+    csv_path = tmp_path / "section.csv"
+    csv_path.write_text("Date,Time,Enrollment,Name\n2025-08-20,09:00:00,003,Chen\n")
+    assert load_roster(str(csv_path)) == {"003"}
+
+
+def test_roster_label_ids():
+    ids, missing = roster_label_ids(LABEL_MAP, {"001", "003", "042"})
+    assert ids == [0, 2] and missing == ["042"]
+
+
+def test_empty_gallery_answers_every_query():
+    matcher = GalleryMatcher(np.zeros((0, 8), dtype=np.float32), np.zeros(0, dtype=np.int32))
+
+    labels, distances, margins = matcher.match(np.ones((3, 8)))
+
+    assert labels.tolist() == [-1, -1, -1]
+    assert np.isinf(distances).all() and margins.tolist() == [0.0, 0.0, 0.0]
+
+
+def test_roster_only_matches_its_students(recognizer, tmp_path):
+    roster = RosterMatcher(recognizer, write_roster(tmp_path, "001\n002\n"))
+
+    assert roster.identify(recognizer.queries) == ["001_Asha", "002_Ben", "Unknown"]
+
+
+def test_roster_with_nobody_registered(recognizer, tmp_path):
+    section = write_roster(tmp_path, "999\n")
+
+    assert RosterMatcher(recognizer, section).identify(recognizer.queries) == ["Unknown"] * 3
+
+    with_fallback = RosterMatcher(recognizer, section, fallback=True)
+    assert with_fallback.identify(recognizer.queries) == ["001_Asha", "002_Ben", "003_Chen"]
+    assert with_fallback.unexpected == {"001_Asha", "002_Ben", "003_Chen"}
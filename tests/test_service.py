@@ -0,0 +1,157 @@
+import json
+import time
+import base64
+import threading
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+import cv2
+import numpy as np
+import pytest
+from embedders import StubEmbedder
+from gallery import save_gallery
+from service import LiveSession, RecognitionService, ServiceHandler
+
+
+def pattern(seed):
+    """A random 'face' the stub embedder tells apart from other seeds"""
+    return np.random.default_rng(seed).integers(0, 255, (64, 64, 3)).astype(np.uint8)
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # Attendance files go to the temporary directory
+    (tmp_path / "attendance").mkdir()
+    gallery_path = str(tmp_path / "gallery.bin")
+    faces = [cv2.cvtColor(pattern(seed), cv2.COLOR_BGR2RGB) for seed in (1, 1, 2, 2)]
+    save_gallery(gallery_path, StubEmbedder().embeddings(faces), [0, 0, 1, 1], {"001_Asha": 0, "002_Ben": 1},
+                 metadata={"embedder": "stub"})
+    service = RecognitionService(gallery_path, embedder="stub", session_ttl=60.0)
+    yield service
+    service.close()
+
+
+def frame_folder(tmp_path, frames=3):
+    folder = tmp_path / "frames"
+    folder.mkdir()
+    for i in range(frames):
+        cv2.imwrite(str(folder / f"{i}.jpg"), np.zeros((120, 160, 3), dtype=np.uint8))
+    return str(folder)
+
+
+def wait_until_finished(service, session_id, timeout=10.0):
+    deadline = time.time() + timeout
+    while service.session(session_id).running and time.time() < deadline:
+        time.sleep(0.05)
+
+
+def test_finished_session_is_dropped_after_its_report(service, tmp_path):
+    session_id = service.start_session(source=frame_folder(tmp_path))["id"]
+    wait_until_finished(service, session_id)
+
+    report = service.report(session_id)
+
+    assert not report["running"] and report["frames"] >= 1
+    assert service.summaries() == []
+    with pytest.raises(KeyError):
+        service.session(session_id)
+
+
+def test_unreported_session_is_dropped_after_the_ttl(service, tmp_path):
+    session_id = service.start_session(source=frame_folder(tmp_path))["id"]
+    wait_until_finished(service, session_id)
+    assert [s["id"] for s in service.summaries()] == [session_id]
+
+    service.sessions[session_id].stopped -= 61.0
+
+    assert service.health()["sessions"] == 0
+    assert service.sessions == {}
+
+
+def test_running_session_is_kept_after_a_report(service, tmp_path):
+    session_id = service.start_session(source=frame_folder(tmp_path, frames=400))["id"]
+
+    assert service.report(session_id)["running"]
+    assert service.session(session_id).running
+
+    summary = service.stop_session(session_id)
+    assert not summary["running"]
+    assert service.summaries() == []
+
+
+@pytest.fixture
+def server(service):
+    ServiceHandler.service = service
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), ServiceHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+    ServiceHandler.service = None
+
+
+def request(url, payload=None):
+    """(status, JSON body) of a GET, or a POST when there is a payload"""
+    data = None if payload is None else json.dumps(payload).encode()
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, data=data), timeout=10) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def encoded(img):
+    return base64.b64encode(cv2.imencode(".png", img)[1].tobytes()).decode()
+
+
+def test_identify_over_http(server):
+    status, body = request(server + "/identify", {"images": [encoded(pattern(2)), encoded(pattern(1))]})
+
+    assert status == 200 and body["faces"] == 2
+    assert [faces[0]["label"] for faces in body["results"]] == ["002_Ben", "001_Asha"]
+    assert body["results"][0][0]["box"] == [0, 0, 64, 64]
+
+
+@pytest.mark.parametrize("image", ["not base64!", base64.b64encode(b"").decode(),
+                                   base64.b64encode(b"plain text, not a picture").decode(), 42])
+def test_undecodable_image_is_a_bad_request(server, image):
+    status, body = request(server + "/identify", {"images": [image]})
+
+    assert status == 400 and "decode" in body["error"]
+
+
+def test_health_and_unknown_routes(server):
+    status, body = request(server + "/health")
+    assert status == 200 and body["embedder"] == "stub" and body["classes"] == 2
+
+    assert request(server + "/nothing")[0] == 404
+    assert request(server + "/sessions/99")[0] == 404
+
+
+@pytest.mark.parametrize("options", [{"duration": "10s"}, {"queue_depth": "deep"}, {"duration": -1},
+                                     {"colour": "red"}])
+def test_bad_session_options_are_rejected_before_opening_the_source(server, service, options):
+    status, body = request(server + "/sessions", {"source": "does-not-exist", **options})
+
+    assert status == 400 and "does-not-exist" not in body["error"]
+    assert service.sessions == {}
+
+
+def test_session_over_http(server, tmp_path):
+    status, started = request(server + "/sessions", {"source": frame_folder(tmp_path), "duration": "30"})
+    assert status == 201 and started["running"]
+
+    status, stopped = request(server + f"/sessions/{started['id']}/stop", {})
+    assert status == 200 and not stopped["running"]
+    assert request(server + "/sessions")[1] == {"sessions": []}
+
+
+@pytest.mark.filterwarnings("ignore::pytest.PytestUnhandledThreadExceptionWarning")
+def test_session_threads_stop_when_the_run_loop_fails(service, tmp_path):
+    session = LiveSession(1, service.recognizer, service._ledger(None), source=frame_folder(tmp_path, frames=400),
+                          duration="10s")  # Unchecked, as before start_session converted it
+
+    session.start().thread.join(5)
+
+    assert not session.running and not session.pipeline.running
@@ -0,0 +1,43 @@
+import cv2
+import numpy as np
+from sources import ImageFolderSource, natural_key, open_source
+
+
+def write_frames(folder, names):
+    for i, name in enumerate(names):
+        cv2.imwrite(str(folder / name), np.full((8, 8, 3), i * 10, dtype=np.uint8))
+
+
+def test_natural_key():
+    names = ["10.jpg", "2.jpg", "1.jpg", "frame_11.png", "frame_9.png"]
+    assert sorted(names, key=natural_key) == ["1.jpg", "2.jpg", "10.jpg", "frame_9.png", "frame_11.png"]
+
+
+def test_image_folder_plays_unpadded_frames_in_order(tmp_path):
+    write_frames(tmp_path, ["1.jpg", "2.jpg", "10.jpg"])
+    (tmp_path / "notes.txt").write_text("not a frame")
+
+    source = open_source(str(tmp_path), fps=10.0)
+    assert isinstance(source, ImageFolderSource)
+
+    frames = []
+    while True:
+        ok, frame, ts = source.read()
+        if not ok:
+            break
+        frames.append((int(frame[0, 0, 0]), ts))
+    assert frames == [(0, 0.0), (10, 0.1), (20, 0.2)]
+
+
+def test_image_folder_stride_and_seek(tmp_path):
+    write_frames(tmp_path, [f"{i}.png" for i in range(1, 11)])
+
+    source = ImageFolderSource(str(tmp_path), stride=3, seek=0.2, fps=10.0)
+
+    stamps = []
+    while True:
+        ok, _, ts = source.read()
+        if not ok:
+            break
+        stamps.append(ts)
+    assert stamps == [0.2, 0.5, 0.8]
@@ -0,0 +1,68 @@
+import numpy as np
+from tracker import FaceTracker, iou_matrix
+
+
+def test_iou_matrix():
+    iou = iou_matrix([(0, 0, 10, 10)], [(0, 0, 10, 10), (5, 0, 10, 10), (20, 20, 5, 5)])
+    np.testing.assert_allclose(iou, [[1.0, 1 / 3, 0.0]], atol=1e-6)
+
+
+def test_moving_face_keeps_its_track():
+    tracker = FaceTracker()
+    first = tracker.update([(100, 100, 50, 50)])
+    second = tracker.update([(110, 105, 50, 50)])
+    # Barely overlapping, but the centre moved less than half a face width
+    third = tracker.update([(130, 105, 50, 50)])
+
+    assert first[0].id == second[0].id == third[0].id
+    assert third[0].box == (130, 105, 50, 50)
+
+
+def test_lost_track_is_dropped_after_max_missed():
+    tracker = FaceTracker(max_missed=2)
+    tracker.update([(0, 0, 50, 50)])
+    for _ in range(2):
+        assert tracker.update([]) == []
+    assert len(tracker.tracks) == 1
+    tracker.update([])
+    assert tracker.tracks == {}
+
+    assert tracker.update([(0, 0, 50, 50)])[0].id == 2
+
+
+def test_identity_needs_agreeing_votes():
+    tracker = FaceTracker(min_votes=2, min_share=0.6)
+    track = tracker.update([(0, 0, 50, 50)])[0]
+
+    assert tracker.add_vote(track.id, "001_Asha") is None
+    assert tracker.add_vote(track.id, "002_Ben") is None
+    assert tracker.add_vote(track.id, "001_Asha") == "001_Asha"  # 2 of 3 votes
+
+    strict = FaceTracker(min_votes=2, min_share=0.75)
+    track = strict.update([(0, 0, 50, 50)])[0]
+    for label in ("001_Asha", "002_Ben", "001_Asha"):
+        strict.add_vote(track.id, label)
+    assert track.identity is None
+
+
+def test_embedding_schedule():
+    tracker = FaceTracker(reverify_interval=5.0, pending_timeout=2.0)
+    track = tracker.update([(0, 0, 50, 50)])[0]
+    assert tracker.needs_embedding(track, now=0.0)
+
+    tracker.mark_pending(track, now=0.0)
+    assert not tracker.needs_embedding(track, now=1.0)
+    assert tracker.needs_embedding(track, now=2.0)  # The result never came back
+
+    for _ in range(2):
+        tracker.mark_pending(track, now=2.0)
+        tracker.add_vote(track.id, "001_Asha")
+    assert track.confident
+    assert not tracker.needs_embedding(track, now=6.0)
+    assert tracker.needs_embedding(track, now=7.0)
+    assert tracker.embeddings_requested == 3
+
+
+def test_vote_for_a_face_that_left_is_ignored():
+    tracker = FaceTracker()
+    assert tracker.add_vote(42, "001_Asha") is None
@@ -0,0 +1,110 @@
+import os
+import cv2
+import numpy as np
+import train_model as train_model_module
+from embedders import FACENET_INPUT_SIZE
+from gallery import GALLERY_FILE, load_gallery
+from train_model import (collect_samples, embed_samples, load_embedding_cache, prefetch_images,
+                         save_embedding_cache, train_model)
+
+
+class CountingEmbedder:
+    """Records the size of every embeddings() call"""
+    name = "counting"
+
+    def __init__(self):
+        self.calls = []
+
+    def embeddings(self, images):
+        self.calls.append(len(images))
+        return np.stack([np.full(4, img.mean(), dtype=np.float32) for img in images])
+
+
+def write_students(root, students=2, per_student=5):
+    for i in range(students):
+        folder = os.path.join(root, f"{i:03d}_Student{i}")
+        os.makedirs(folder)
+        for n in range(per_student):
+            cv2.imwrite(os.path.join(folder, f"{n}.jpg"), np.full((40, 40, 3), 10 * n + i, dtype=np.uint8))
+
+
+def test_embed_samples_batches_every_image(tmp_path):
+    write_students(str(tmp_path), students=2, per_student=5)
+    _, samples = collect_samples(str(tmp_path))
+    embedder = CountingEmbedder()
+
+    results = embed_samples(embedder, samples, batch_size=4, workers=2)
+
+    assert set(results) == {img_path for img_path, _ in samples}
+    assert embedder.calls == [4, 4, 2]
+
+
+def test_embed_samples_skips_unreadable_images(tmp_path):
+    write_students(str(tmp_path), students=1, per_student=2)
+    broken = tmp_path / "000_Student0" / "broken.jpg"
+    broken.write_bytes(b"not an image")
+    _, samples = collect_samples(str(tmp_path))
+
+    results = embed_samples(CountingEmbedder(), samples, batch_size=8, workers=1)
+
+    assert len(results) == 2
+    assert str(broken) not in results
+
+
+def test_collect_samples_keeps_known_ids(tmp_path):
+    for folder in ("001_Asha", "002_Ben", "003_Chen"):
+        os.makedirs(tmp_path / folder)
+    known = {"001_Asha": 7, "002_Ben": 3, "009_Gone": 9}
+
+    label_map, _ = collect_samples(str(tmp_path), known)
+
+    assert label_map == {"001_Asha": 7, "002_Ben": 3, "003_Chen": 10}
+
+
+def test_embedding_cache_round_trip(tmp_path):
+    path = str(tmp_path / "cache.npz")
+    cache = {"a.jpg": (10, 123, np.arange(4, dtype=np.float32))}
+
+    save_embedding_cache(cache, path, embedder="stub")
+
+    loaded = load_embedding_cache(path, embedder="stub")
+    assert loaded["a.jpg"][:2] == (10, 123)
+    np.testing.assert_array_equal(loaded["a.jpg"][2], cache["a.jpg"][2])
+    assert load_embedding_cache(path, embedder="keras") == {}
+
+
+def test_prefetch_images_keeps_input_order(tmp_path):
+    write_students(str(tmp_path), students=1, per_student=6)
+    paths = [img_path for img_path, _ in collect_samples(str(tmp_path))[1]]
+    paths.insert(2, str(tmp_path / "missing.jpg"))
+
+    decoded = list(prefetch_images(paths, workers=3, queue_depth=2))
+
+    assert [img_path for img_path, _, _ in decoded] == paths
+    assert decoded[2][1] is None and decoded[2][2] is not None
+    assert decoded[0][1].shape == (FACENET_INPUT_SIZE, FACENET_INPUT_SIZE, 3)
+
+
+def test_incremental_run_with_nothing_new_loads_no_model(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write_students(os.path.join(str(tmp_path), "student_images"), students=2, per_student=3)
+    train_model(embedder="stub", workers=1)
+
+    def fail(spec):
+        raise AssertionError(f"loaded the '{spec}' model")
+    monkeypatch.setattr(train_model_module, "create_embedder", fail)
+    train_model(embedder="stub", workers=1, incremental=True)
+
+    gallery = load_gallery(GALLERY_FILE)
+    assert len(gallery) == 6 and gallery.metadata["embedder"] == "stub"
+
+
+def test_calibration_is_skipped_for_a_single_student(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    write_students(os.path.join(str(tmp_path), "student_images"), students=1, per_student=3)
+
+    train_model(embedder="stub", workers=1, calibrate_far=0.01)
+
+    assert "Skipping calibration" in capsys.readouterr().out
+    gallery = load_gallery(GALLERY_FILE)
+    assert len(gallery) == 3 and "thresholds" not in gallery.metadata
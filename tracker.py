@@ -0,0 +1,146 @@
+import time
+from collections import Counter
+import numpy as np
+
+
+class Track:
+    """One face followed across frames"""
+
+    def __init__(self, track_id, box):
+        self.id = track_id
+        self.box = tuple(int(v) for v in box)  # (x, y, w, h)
+        self.missed = 0
+        self.votes = Counter()
+        self.identity = None       # confirmed label, "Unknown", or None while undecided
+        self.last_embedded = None  # time the last embedding was requested
+        self.pending = False       # an embedding is waiting in the batcher
+
+    @property
+    def confident(self):
+        return self.identity is not None
+
+
+def iou_matrix(boxes_a, boxes_b):
+    """Pairwise intersection-over-union of two (N, 4) / (M, 4) x,y,w,h arrays"""
+    a = np.asarray(boxes_a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(boxes_b, dtype=np.float32).reshape(-1, 4)
+    ax2, ay2 = a[:, 0] + a[:, 2], a[:, 1] + a[:, 3]
+    bx2, by2 = b[:, 0] + b[:, 2], b[:, 1] + b[:, 3]
+
+    iw = np.clip(np.minimum(ax2[:, None], bx2[None]) - np.maximum(a[:, None, 0], b[None, :, 0]), 0, None)
+    ih = np.clip(np.minimum(ay2[:, None], by2[None]) - np.maximum(a[:, None, 1], b[None, :, 1]), 0, None)
+    inter = iw * ih
+    union = (a[:, 2] * a[:, 3])[:, None] + (b[:, 2] * b[:, 3])[None] - inter
+    return inter / np.maximum(union, 1e-6)
+
+
+class FaceTracker:
+    """
+    IoU/centroid tracker for detected face boxes.
+
+    Each detection is matched to the track it overlaps most (or, when
+    overlap is low, whose centre is within half a face width). A track is
+    only embedded when it is new, has not reached a confident identity yet,
+    or is due for re-verification, and its identity is decided by voting
+    over all embeddings taken while it was tracked.
+    """
+
+    def __init__(self, iou_threshold=0.3, max_missed=10, min_votes=2, min_share=0.6,
+                 reverify_interval=5.0, pending_timeout=2.0):
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.min_votes = min_votes
+        self.min_share = min_share
+        self.reverify_interval = reverify_interval
+        self.pending_timeout = pending_timeout
+
+        self.tracks = {}
+        self.next_id = 1
+
+        # Counters for the end-of-session report
+        self.faces_seen = 0
+        self.embeddings_requested = 0
+
+    def update(self, boxes):
+        """Match this frame's boxes to tracks and return the live tracks"""
+        boxes = [tuple(int(v) for v in box) for box in boxes]
+        self.faces_seen += len(boxes)
+
+        track_ids = list(self.tracks)
+        matched_tracks, matched_boxes = set(), set()
+
+        if track_ids and boxes:
+            track_boxes = np.array([self.tracks[t].box for t in track_ids], dtype=np.float32)
+            det_boxes = np.array(boxes, dtype=np.float32)
+            scores = iou_matrix(track_boxes, det_boxes)
+
+            # Centroid fallback for fast movers whose boxes barely overlap
+            track_c = track_boxes[:, :2] + track_boxes[:, 2:] / 2
+            det_c = det_boxes[:, :2] + det_boxes[:, 2:] / 2
+            dist = np.linalg.norm(track_c[:, None] - det_c[None], axis=2)
+            near = dist < 0.5 * np.maximum(track_boxes[:, 2:3], det_boxes[None, :, 2])
+            scores = np.where((scores < self.iou_threshold) & near, self.iou_threshold, scores)
+
+            # Greedy assignment, best pairs first
+            for flat in np.argsort(-scores, axis=None):
+                ti, di = np.unravel_index(flat, scores.shape)
+                if scores[ti, di] < self.iou_threshold:
+                    break
+                if ti in matched_tracks or di in matched_boxes:
+                    continue
+                matched_tracks.add(ti)
+                matched_boxes.add(di)
+                track = self.tracks[track_ids[ti]]
+                track.box = boxes[di]
+                track.missed = 0
+
+        for ti, track_id in enumerate(track_ids):
+            if ti not in matched_tracks:
+                track = self.tracks[track_id]
+                track.missed += 1
+                if track.missed > self.max_missed:
+                    del self.tracks[track_id]
+
+        for di, box in enumerate(boxes):
+            if di not in matched_boxes:
+                self.tracks[self.next_id] = Track(self.next_id, box)
+                self.next_id += 1
+
+        return [track for track in self.tracks.values() if track.missed == 0]
+
+    def needs_embedding(self, track, now=None):
+        """True if the track is new, undecided, or due for re-verification"""
+        now = time.time() if now is None else now
+        if track.pending:
+            # A result that never came back (e.g. a failed batch) is retried
+            return now - track.last_embedded >= self.pending_timeout
+        if not track.confident:
+            return True
+        return now - track.last_embedded >= self.reverify_interval
+
+    def mark_pending(self, track, now=None):
+        """Record that an embedding was requested for this track"""
+        track.pending = True
+        track.last_embedded = time.time() if now is None else now
+        self.embeddings_requested += 1
+
+    def add_vote(self, track_id, label):
+        """Add one recognition result to a track and update its identity"""
+        track = self.tracks.get(track_id)
+        if track is None:
+            return None  # The face left before its embedding came back
+        track.pending = False
+        track.votes[label] += 1
+
+        winner, count = track.votes.most_common(1)[0]
+        total = sum(track.votes.values())
+        if count >= self.min_votes and count / total >= self.min_share:
+            track.identity = winner
+        elif track.identity is not None and track.identity != winner:
+            # Re-verification disagrees with the old identity; decide again
+            track.identity = None
+        return track.identity
+
+    @property
+    def embeddings_saved(self):
+        return self.faces_seen - self.embeddings_requested
@@ -1,70 +1,380 @@
 import os
+import time
+import queue
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import cv2
 import numpy as np
 from PIL import Image
 import json
-from sklearn.neighbors import KNeighborsClassifier
-from keras_facenet import FaceNet
+from embedders import FACENET_INPUT_SIZE, create_embedder, embedder_name
+from gallery import (GALLERY_FILE, LABEL_MAP_FILE, PROTOTYPES_FILE, save_gallery, open_gallery,
+                     update_metadata, compute_prototypes, evaluate_prototypes)
+from ivf import IVF_MIN_ROWS, IVFIndex, index_path, tune_nprobe
+from calibrate import calibrate, format_problem
 
-def train_model():
-    embedder = FaceNet()  # Load pretrained FaceNet model
+# Per-image embedding cache used by incremental training
+CACHE_FILE = "embedding_cache.npz"
 
-    faces, ids = [], []
-    label_map = {}
-    current_id = 0
+def load_label_map(path=LABEL_MAP_FILE):
+    """Load the existing {label_str -> int_id} map, or an empty one"""
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
 
-    if not os.path.exists('student_images'):
-        print("❌ 'student_images' folder not found. Please register students first.")
-        return
+def collect_samples(root='student_images', known_labels=None):
+    """
+    Walk the student folders and return (label_map, [(img_path, id_), ...]).
 
-    student_folders = os.listdir('student_images')
+    Labels already present in `known_labels` keep their integer ID, new
+    folders get IDs above the highest one in `known_labels`, and folders
+    that no longer exist are dropped from the map (so the ID of a deleted
+    folder can be given to a later one).
+    """
+    known_labels = known_labels or {}
+    label_map = {}
+    samples = []
+    current_id = max(known_labels.values(), default=-1) + 1
 
-    for folder in student_folders:
-        folder_path = os.path.join('student_images', folder)
+    for folder in sorted(os.listdir(root)):
+        folder_path = os.path.join(root, folder)
         if not os.path.isdir(folder_path):
             continue
 
         label = folder  # Example: '001_John'
-        if label not in label_map:
+        if label in known_labels:
+            label_map[label] = known_labels[label]
+        else:
             label_map[label] = current_id
             current_id += 1
 
         id_ = label_map[label]
 
-        for img_file in os.listdir(folder_path):
+        for img_file in sorted(os.listdir(folder_path)):
             img_path = os.path.join(folder_path, img_file)
+            if os.path.isfile(img_path):
+                samples.append((img_path, id_))
+
+    return label_map, samples
+
+def file_key(img_path):
+    """Cache key for an image file: (size in bytes, mtime in nanoseconds)"""
+    st = os.stat(img_path)
+    return st.st_size, st.st_mtime_ns
+
+def load_embedding_cache(path=CACHE_FILE, embedder="keras"):
+    """
+    Load the cache as {img_path: (size, mtime_ns, embedding)}; a cache
+    written by another embedder backend is ignored.
+    """
+    if not os.path.exists(path):
+        return {}
+    try:
+        data = np.load(path)
+        cached_by = str(data["embedder"]) if "embedder" in data else "keras"
+        if cached_by != embedder:
+            print(f"♻️ Embedding cache was built with '{cached_by}', re-embedding with '{embedder}'")
+            return {}
+        return {
+            str(p): (int(size), int(mtime), emb)
+            for p, size, mtime, emb in zip(data["paths"], data["sizes"],
+                                           data["mtimes"], data["embeddings"])
+        }
+    except Exception as e:
+        print(f"⚠️ Ignoring unreadable embedding cache '{path}': {e}")
+        return {}
+
+def save_embedding_cache(cache, path=CACHE_FILE, embedder="keras"):
+    """Write the {img_path: (size, mtime_ns, embedding)} cache to disk"""
+    paths = sorted(cache)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        np.savez(f,
+                 embedder=np.array(embedder),
+                 paths=np.array(paths, dtype=str),
+                 sizes=np.array([cache[p][0] for p in paths], dtype=np.int64),
+                 mtimes=np.array([cache[p][1] for p in paths], dtype=np.int64),
+                 embeddings=np.array([cache[p][2] for p in paths], dtype=np.float32).reshape(len(paths), -1))
+    os.replace(tmp, path)
+
+def load_image(img_path):
+    """Decode an image file into an RGB numpy array"""
+    img = Image.open(img_path).convert('RGB')
+    return np.array(img)
+
+def decode_image(img_path):
+    """
+    Decode and resize one image to the FaceNet input size.
+
+    Runs inside the decode pool; returns (img_path, img_np, error) so that
+    failures are reported by the consumer instead of killing the worker.
+    """
+    try:
+        img_np = load_image(img_path)
+        # Same resize FaceNet applies internally, done here off the model thread
+        img_np = cv2.resize(img_np, (FACENET_INPUT_SIZE, FACENET_INPUT_SIZE))
+        return img_path, img_np, None
+    except Exception as e:
+        return img_path, None, e
+
+def prefetch_images(img_paths, workers=4, queue_depth=64, use_processes=False):
+    """
+    Yield (img_path, img_np, error) in input order while a pool decodes ahead.
+
+    A feeder thread submits decode jobs and puts their futures into a queue
+    bounded by `queue_depth`, so at most that many decoded images wait for
+    the embedder while the model runs.
+    """
+    pool_cls = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+    pending = queue.Queue(maxsize=max(1, queue_depth))
+    done = object()
+
+    with pool_cls(max_workers=max(1, workers)) as pool:
+        def feed():
+            for img_path in img_paths:
+                pending.put(pool.submit(decode_image, img_path))
+            pending.put(done)
+
+        feeder = threading.Thread(target=feed, daemon=True)
+        feeder.start()
+
+        while True:
+            future = pending.get()
+            if future is done:
+                break
+            yield future.result()
+
+        feeder.join()
+
+def embed_batch(embedder, batch):
+    """Run one embeddings() call for a list of (img_path, img_np) pairs"""
+    images = [img_np for _, img_np in batch]
+    embeddings = embedder.embeddings(images)
+    if embeddings is None or len(embeddings) != len(batch):
+        print(f"❌ Embedding failed for a batch of {len(batch)} images, skipping it")
+        return {}
+    return {img_path: emb for (img_path, _), emb in zip(batch, embeddings)}
+
+def embed_samples(embedder, samples, batch_size=32, max_batch_mb=256,
+                  workers=4, queue_depth=64, use_processes=False):
+    """
+    Extract FaceNet embeddings for (img_path, id_) samples, returned as
+    {img_path: embedding}.
+
+    Images are decoded by a prefetching pool (see prefetch_images) and
+    grouped so that each embeddings() call gets at most `batch_size` images
+    and at most `max_batch_mb` of decoded pixels plus model input, instead
+    of one forward pass per image.
+    """
+    max_batch_bytes = max_batch_mb * 1024 * 1024
+    results = {}
+    batch, batch_bytes = [], 0
+
+    img_paths = [img_path for img_path, _ in samples]
+    for img_path, img_np, error in prefetch_images(img_paths, workers=workers,
+                                                   queue_depth=queue_depth,
+                                                   use_processes=use_processes):
+        if error is not None:
+            print(f"❌ Skipping '{img_path}': {error}")
+            continue
+
+        # The decoded crop plus its float32 copy in the embedder's input batch
+        img_bytes = img_np.nbytes + FACENET_INPUT_SIZE * FACENET_INPUT_SIZE * 3 * 4
+        if batch and (len(batch) >= batch_size or batch_bytes + img_bytes > max_batch_bytes):
+            results.update(embed_batch(embedder, batch))
+            batch, batch_bytes = [], 0
+
+        batch.append((img_path, img_np))
+        batch_bytes += img_bytes
 
-            if not os.path.isfile(img_path):
-                continue
+    if batch:
+        results.update(embed_batch(embedder, batch))
 
-            try:
-                img = Image.open(img_path).convert('RGB')
-                img_np = np.array(img)
-            except Exception as e:
-                print(f"❌ Skipping '{img_path}': {e}")
-                continue
+    return results
 
-            # Extract FaceNet embedding
-            embeddings = embedder.embeddings([img_np])  
-            if embeddings is not None:
-                faces.append(embeddings[0])
-                ids.append(id_)
+def save_prototypes(faces, ids, label_map, k, method="kmeans", dtype="float32", embedder="keras"):
+    """Write the k-prototypes-per-student gallery and report its trade-off"""
+    report = evaluate_prototypes(faces, ids, k, method=method)
+    proto_faces, proto_ids = compute_prototypes(faces, ids, k, method=method)
+
+    save_gallery(PROTOTYPES_FILE, proto_faces, proto_ids, label_map, dtype=dtype,
+                 metadata={"embedder": embedder,
+                           "prototypes_per_student": k,
+                           "prototype_method": method,
+                           "source_rows": len(faces),
+                           "evaluation": report})
+
+    print(f"🧩 Prototypes ({method}, k={k}): {len(faces)} → {len(proto_faces)} rows "
+          f"({len(faces) / max(len(proto_faces), 1):.1f}x smaller)")
+    print(f"   Held-out accuracy: full gallery {report['full_accuracy']:.1%} "
+          f"({report['full_rows']} rows) vs prototypes {report['prototype_accuracy']:.1%} "
+          f"({report['prototype_rows']} rows) on {report['queries']} queries")
+    print(f"   Saved in '{PROTOTYPES_FILE}' (use: python recognize.py --prototypes)")
+
+def save_index(gallery_path=GALLERY_FILE, mode="auto", n_lists=None, target_recall=0.99):
+    """
+    Build the IVF index next to the gallery (mode 'on', or 'auto' for
+    galleries of at least IVF_MIN_ROWS rows) and pick the smallest nprobe
+    that reaches `target_recall` against exact search. Otherwise remove
+    any index left from an earlier gallery.
+    """
+    gallery = open_gallery(gallery_path)
+    path = index_path(gallery_path)
+    if mode == "off" or (mode == "auto" and len(gallery) < IVF_MIN_ROWS):
+        if os.path.exists(path):
+            os.remove(path)
+        return
+
+    start = time.time()
+    embeddings = np.asarray(gallery.embeddings, dtype=np.float32)
+    index = IVFIndex.build(embeddings, gallery.labels, n_lists=n_lists)
+    index.nprobe, results = tune_nprobe(index, embeddings, target_recall)
+    index.save(path)
+
+    chosen = next(r for r in results if r["nprobe"] == index.nprobe)
+    print(f"🗂️ IVF index: {index.n_lists} lists, nprobe {index.nprobe} → recall@3 {chosen['recall']:.1%}, "
+          f"{chosen['ms_per_query']:.2f} ms/face vs {chosen['exact_ms_per_query']:.2f} ms exact "
+          f"(built in {time.time() - start:.1f}s, saved as '{path}')")
+
+def train_model(batch_size=32, max_batch_mb=256, incremental=False,
+                workers=4, queue_depth=64, use_processes=False, gallery_dtype="float32",
+                prototypes=0, prototype_method="kmeans", embedder="keras",
+                ivf="auto", ivf_lists=None, target_recall=0.99, calibrate_far=None):
+    """
+    Build the embedding gallery from 'student_images'.
+
+    With incremental=True, the existing label map and the per-image
+    embedding cache are reused: only new or changed images are embedded,
+    deleted images are dropped and existing label IDs never change.
+
+    With prototypes=k, a second gallery holding k prototypes per student
+    is written to PROTOTYPES_FILE, along with its accuracy/size trade-off.
+
+    `embedder` picks the embedding backend (see embedders.py); its name is
+    stored in the gallery so recognition can use a matching backend.
+
+    Large galleries also get an IVF index (see ivf.py and save_index).
+
+    With calibrate_far, the match thresholds are calibrated on the new
+    gallery for that false accept rate (see calibrate.py).
+    """
+    if not os.path.exists('student_images'):
+        print("❌ 'student_images' folder not found. Please register students first.")
+        return
+
+    known_labels = load_label_map() if incremental else {}
+    label_map, samples = collect_samples('student_images', known_labels)
+
+    # The model is only loaded when there is something to embed
+    name = embedder_name(embedder)
+    cache = load_embedding_cache(embedder=name) if incremental else {}
+    keys = {img_path: file_key(img_path) for img_path, _ in samples}
+    pending = [(img_path, id_) for img_path, id_ in samples
+               if img_path not in cache or cache[img_path][:2] != keys[img_path]]
+
+    new_embeddings = {}
+    if pending:
+        model = create_embedder(embedder)
+        start = time.time()
+        new_embeddings = embed_samples(model, pending, batch_size=batch_size, max_batch_mb=max_batch_mb,
+                                       workers=workers, queue_depth=queue_depth,
+                                       use_processes=use_processes)
+        elapsed = time.time() - start
+
+        print(f"⏱️ Embedded {len(new_embeddings)} images in {elapsed:.1f}s "
+              f"({len(new_embeddings) / max(elapsed, 1e-9):.1f} images/sec, batch size {batch_size}, "
+              f"{workers} decode workers)")
+
+    faces, ids = [], []
+    new_cache = {}
+    for img_path, id_ in samples:
+        if img_path in new_embeddings:
+            emb = new_embeddings[img_path]
+        elif img_path in cache and cache[img_path][:2] == keys[img_path]:
+            emb = cache[img_path][2]
+        else:
+            continue  # Failed to decode or embed
+        faces.append(emb)
+        ids.append(id_)
+        new_cache[img_path] = keys[img_path] + (emb,)
+
+    if incremental:
+        dropped = len(set(cache) - set(keys))
+        print(f"♻️ Reused {len(faces) - len(new_embeddings)} cached embeddings, "
+              f"embedded {len(new_embeddings)} new/changed, dropped {dropped} deleted")
 
     if len(faces) == 0:
         print("❌ No faces found to train. Please check your images.")
         return
 
-    # Train a classifier on embeddings (here we use KNN)
-    knn = KNeighborsClassifier(n_neighbors=3, metric='euclidean')
-    knn.fit(faces, ids)
-
     # Save embeddings and labels
-    np.save("faces_embeddings.npy", faces)
-    np.save("faces_labels.npy", ids)
+    save_gallery(GALLERY_FILE, faces, ids, label_map, dtype=gallery_dtype,
+                 metadata={"embedder": name})
+    save_index(GALLERY_FILE, ivf, ivf_lists, target_recall)
+    if calibrate_far is not None:
+        try:
+            thresholds, report = calibrate(GALLERY_FILE, far=calibrate_far)
+        except ValueError as e:
+            print(f"⚠️ Skipping calibration: {e}")
+        else:
+            if report["problem"]:
+                print("\n".join(format_problem(report)))
+            else:
+                update_metadata(GALLERY_FILE, thresholds=thresholds)
+                print(f"🎯 Calibrated threshold {thresholds['global']:.3f} "
+                      f"(false accepts {thresholds['far']:.1%})")
 
-    with open("label_map.json", "w") as f:
+    # label_map.json is kept next to the gallery so incremental runs and
+    # humans can read the label IDs without parsing the binary file
+    with open(LABEL_MAP_FILE + ".tmp", "w") as f:
         json.dump(label_map, f)
+    os.replace(LABEL_MAP_FILE + ".tmp", LABEL_MAP_FILE)
+
+    if prototypes > 0:
+        save_prototypes(faces, ids, label_map, prototypes, prototype_method, gallery_dtype, name)
+
+    save_embedding_cache(new_cache, embedder=name)
 
-    print("✅ Training complete. Embeddings saved as 'faces_embeddings.npy', labels as 'faces_labels.npy', and label map as 'label_map.json'")
+    print(f"✅ Training complete. {len(faces)} {name} embeddings saved in '{GALLERY_FILE}' ({gallery_dtype}) "
+          f"and label map as '{LABEL_MAP_FILE}'")
 
 if __name__ == "__main__":
-    train_model()
+    parser = argparse.ArgumentParser(description="Extract FaceNet embeddings for all registered students")
+    parser.add_argument("--batch-size", type=int, default=32,
+                        help="Maximum number of images per embeddings() call")
+    parser.add_argument("--max-batch-mb", type=int, default=256,
+                        help="Memory budget per batch in megabytes")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only embed new or changed images and keep existing label IDs")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4,
+                        help="Number of image decode workers")
+    parser.add_argument("--queue-depth", type=int, default=64,
+                        help="Maximum number of decoded images waiting for the embedder")
+    parser.add_argument("--use-processes", action="store_true",
+                        help="Decode in worker processes instead of threads")
+    parser.add_argument("--gallery-dtype", choices=["float32", "float16"], default="float32",
+                        help="Storage type of the embedding matrix in the gallery file")
+    parser.add_argument("--prototypes", type=int, default=0, metavar="K",
+                        help="Also write a gallery with K prototypes per student")
+    parser.add_argument("--prototype-method", choices=["kmeans", "medoids"], default="kmeans",
+                        help="Keep cluster centroids or the real sample closest to each")
+    parser.add_argument("--embedder", default="keras",
+                        help="Embedding backend: keras, tflite[:float16|dynamic|int8|path] or stub")
+    parser.add_argument("--ivf", choices=["auto", "on", "off"], default="auto",
+                        help=f"Build an approximate-search index (auto: galleries of {IVF_MIN_ROWS}+ rows)")
+    parser.add_argument("--ivf-lists", type=int, default=None,
+                        help="Number of IVF lists (default ~4*sqrt(rows))")
+    parser.add_argument("--target-recall", type=float, default=0.99,
+                        help="Recall@3 against exact search the IVF nprobe is tuned for")
+    parser.add_argument("--calibrate", type=float, nargs="?", const=0.01, default=None, metavar="FAR",
+                        help="Calibrate match thresholds for this false accept rate (default 0.01; see calibrate.py)")
+    args = parser.parse_args()
+    train_model(batch_size=args.batch_size, max_batch_mb=args.max_batch_mb,
+                incremental=args.incremental, workers=args.workers,
+                queue_depth=args.queue_depth, use_processes=args.use_processes,
+                gallery_dtype=args.gallery_dtype, prototypes=args.prototypes,
+                prototype_method=args.prototype_method, embedder=args.embedder,
+                ivf=args.ivf, ivf_lists=args.ivf_lists, target_recall=args.target_recall,
+                calibrate_far=args.calibrate)
@@ -0,0 +1,108 @@
+import os
+import glob
+import json
+import time
+import argparse
+import numpy as np
+from PIL import Image
+from embedders import create_embedder
+from sources import IMAGE_EXTENSIONS
+
+
+def load_faces(root="student_images", limit=None):
+    """Registered face crops (RGB) and the student each belongs to"""
+    paths = sorted(p for p in glob.glob(os.path.join(root, "*", "*")) if p.lower().endswith(IMAGE_EXTENSIONS))
+    faces, labels = [], []
+    for path in paths[:limit]:
+        try:
+            faces.append(np.array(Image.open(path).convert("RGB")))
+            labels.append(os.path.basename(os.path.dirname(path)))
+        except Exception as e:
+            print(f"⚠️ Skipping '{path}': {e}")
+    return faces, np.array(labels)
+
+
+def embed_all(embedder, faces, batch_size=32):
+    """Embed all faces in batches; returns (embeddings, images per second)"""
+    embedder.embeddings(faces[:1])  # Warm-up (graph building, tensor allocation)
+    start = time.perf_counter()
+    rows = [embedder.embeddings(faces[i:i + batch_size]) for i in range(0, len(faces), batch_size)]
+    elapsed = time.perf_counter() - start
+    return np.concatenate(rows).astype(np.float32), len(faces) / max(elapsed, 1e-9)
+
+
+def nearest_labels(queries, gallery, labels):
+    """Leave-one-out nearest neighbour label of each query row within the gallery"""
+    sims = queries @ gallery.T
+    np.fill_diagonal(sims, -np.inf)
+    return labels[np.argmax(sims, axis=1)]
+
+
+def compare(reference, candidate, labels):
+    """
+    Drift of candidate embeddings against the reference ones for the same
+    images: cosine similarity, euclidean distance, and how often the
+    leave-one-out nearest neighbour still gives the same student.
+    """
+    cosine = np.sum(reference * candidate, axis=1)
+    distance = np.linalg.norm(reference - candidate, axis=1)
+    ref_pred = nearest_labels(reference, reference, labels)
+    # Candidate queries against the reference gallery: the production case
+    # of a quantized model matching a gallery built with the full model
+    mixed_pred = nearest_labels(candidate, reference, labels)
+    return {
+        "cosine_mean": float(cosine.mean()), "cosine_min": float(cosine.min()),
+        "distance_mean": float(distance.mean()), "distance_max": float(distance.max()),
+        "rank1_agreement": float(np.mean(ref_pred == mixed_pred)),
+        "rank1_accuracy": float(np.mean(mixed_pred == labels)),
+    }
+
+
+def verify(reference="keras", candidates=("tflite:float16", "tflite:dynamic", "tflite:int8"),
+           root="student_images", limit=None, batch_size=32):
+    faces, labels = load_faces(root, limit)
+    if len(faces) < 2:
+        raise RuntimeError(f"Need at least two registered images in '{root}'")
+    print(f"🖼️ {len(faces)} registered images from '{root}'")
+
+    ref_embedder = create_embedder(reference)
+    ref, ref_speed = embed_all(ref_embedder, faces, batch_size)
+    results = [{"embedder": ref_embedder.name, "images_per_sec": ref_speed, "speedup": 1.0,
+                **compare(ref, ref, labels)}]
+
+    for spec in candidates:
+        try:
+            embedder = create_embedder(spec)
+        except Exception as e:
+            print(f"⚠️ Skipping '{spec}': {e}")
+            continue
+        emb, speed = embed_all(embedder, faces, batch_size)
+        if emb.shape != ref.shape:
+            print(f"⚠️ Skipping '{spec}': {emb.shape[1]}-d embeddings, reference is {ref.shape[1]}-d")
+            continue
+        results.append({"embedder": embedder.name, "images_per_sec": speed, "speedup": speed / ref_speed,
+                        **compare(ref, emb, labels)})
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure embedding drift and speed of embedder backends")
+    parser.add_argument("--reference", default="keras", help="Backend the gallery is built with")
+    parser.add_argument("--candidates", nargs="+", default=["tflite:float16", "tflite:dynamic", "tflite:int8"],
+                        help="Backends to compare against the reference")
+    parser.add_argument("--student-images", default="student_images", help="Folder of registered face images")
+    parser.add_argument("--limit", type=int, default=None, help="Use at most this many images")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--json", default=None, help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = verify(args.reference, args.candidates, args.student_images, args.limit, args.batch_size)
+    for r in results:
+        print(f"📏 {r['embedder']:<28} {r['images_per_sec']:7.1f} img/s ({r['speedup']:.2f}x)  "
+              f"cos mean {r['cosine_mean']:.4f} min {r['cosine_min']:.4f}  "
+              f"dist max {r['distance_max']:.3f}  rank-1 agreement {r['rank1_agreement']:.1%}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"✅ Results written to '{args.json}'")